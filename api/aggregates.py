@@ -0,0 +1,279 @@
+"""
+Rolling per-ticker sentiment, kept in time-bucketed ring buffers.
+
+Each tier is a ring of fixed-width time buckets (by default 1440 one-minute
+buckets and 720 one-hour buckets). A bucket holds, for each symbol mentioned
+during it, the headline count and confidence sum per sentiment class, so
+memory follows the symbols actually seen in each bucket rather than every
+symbol times every bucket. Recording a prediction adds to one bucket per
+tier, and a window query sums at most one ring, so both cost the same however
+many headlines have been seen.
+"""
+import glob
+import math
+import os
+import re
+import sys
+import threading
+import time
+
+import numpy as np
+
+WINDOW_PATTERN = re.compile(r'^(\d+)([smhd])$')
+WINDOW_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+# A bucket's per-symbol rows grow by this many at a time
+BLOCK_ROWS = 16
+
+
+def parse_window(window):
+    """Seconds in a window such as "15m", "1h" or "7d"; raises ValueError if malformed"""
+    match = WINDOW_PATTERN.match(window.strip().lower())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid window {window!r}, expected e.g. 15m, 1h or 7d")
+    return int(match.group(1)) * WINDOW_UNITS[match.group(2)]
+
+
+class RingTier:
+    """`slots` buckets of `resolution` seconds, shared by all symbols.
+
+    `stamps[i]` is the bucket number (timestamp // resolution) that slot i
+    currently holds. Each slot maps the symbol rows recorded in it to rows of
+    its own values array, which grows in blocks of BLOCK_ROWS. A slot is
+    emptied when a newer bucket claims it, so data older than
+    slots * resolution seconds falls away.
+    """
+
+    def __init__(self, resolution, slots, fields):
+        self.resolution = resolution
+        self.slots = slots
+        self.fields = fields
+        self.stamps = np.full(slots, -1, dtype=np.int64)
+        # Per slot: symbol row -> position in values, in insertion order
+        self.positions = [{} for _ in range(slots)]
+        self.values = [np.zeros((0, fields), dtype=np.float32) for _ in range(slots)]
+
+    @property
+    def span(self):
+        return self.resolution * self.slots
+
+    def add(self, slot, row, cls, confidence):
+        """Count one headline of class cls for a symbol row in slot"""
+        positions = self.positions[slot]
+        position = positions.get(row)
+        if position is None:
+            position = positions[row] = len(positions)
+            values = self.values[slot]
+            if position >= len(values):
+                grown = np.zeros((len(values) + BLOCK_ROWS, self.fields), dtype=np.float32)
+                grown[:len(values)] = values
+                self.values[slot] = grown
+        values = self.values[slot]
+        values[position, cls] += 1
+        values[position, self.fields // 2 + cls] += confidence
+
+    def symbol_totals(self, row, mask):
+        """Sums of one symbol row over the masked slots"""
+        totals = np.zeros(self.fields, dtype=np.float64)
+        for slot in np.flatnonzero(mask):
+            position = self.positions[slot].get(row)
+            if position is not None:
+                totals += self.values[slot][position]
+        return totals
+
+    def totals(self, rows, mask):
+        """(rows x fields) sums of every symbol row below rows over the masked slots"""
+        totals = np.zeros((rows, self.fields), dtype=np.float64)
+        for slot in np.flatnonzero(mask):
+            positions = self.positions[slot]
+            if positions:
+                symbol_rows = np.fromiter(positions, dtype=np.intp, count=len(positions))
+                # Rows are distinct within a slot, so fancy-indexed += adds each once
+                totals[symbol_rows] += self.values[slot][:len(positions)]
+        return totals
+
+    def nbytes(self):
+        return self.stamps.nbytes + sum(
+            values.nbytes + sys.getsizeof(positions) for values, positions in zip(self.values, self.positions)
+        )
+
+    def slot_for(self, timestamp, now):
+        """Slot for timestamp, claiming it if needed; None if it is older than the tier keeps"""
+        if timestamp <= now - self.span:
+            return None
+        bucket = int(timestamp // self.resolution)
+        slot = bucket % self.slots
+        stamp = self.stamps[slot]
+        if stamp > bucket:
+            return None
+        if stamp < bucket:
+            self.positions[slot] = {}
+            self.values[slot] = np.zeros((0, self.fields), dtype=np.float32)
+            self.stamps[slot] = bucket
+        return slot
+
+    def window_mask(self, now, seconds, offset=0):
+        """Slots covering the `seconds` before now - offset"""
+        newest = int((now - offset) // self.resolution)
+        buckets = math.ceil(seconds / self.resolution)
+        return (self.stamps > newest - buckets) & (self.stamps <= newest)
+
+
+class TickerAggregates:
+    """Per-symbol sentiment counts and confidence sums over rolling windows.
+
+    `record()` is called once per scored headline with the symbols it
+    mentions. Queries pick the finest tier whose span covers the window.
+    The score of a window is (positive - negative) / headlines, in [-1, 1];
+    the weighted score uses confidence sums instead of counts.
+    """
+
+    def __init__(self, classes=('Buy', 'Hold', 'Sell'), positive='Buy', negative='Sell',
+                 tiers=((60, 1440), (3600, 720))):
+        self.classes = list(classes)
+        self.class_index = {label: i for i, label in enumerate(self.classes)}
+        self.positive = self.class_index[positive]
+        self.negative = self.class_index[negative]
+        self.fields = 2 * len(self.classes)
+        self.tiers = [RingTier(resolution, slots, self.fields) for resolution, slots in sorted(tiers)]
+        self.symbols = {}
+        self.recorded = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    @property
+    def max_window(self):
+        return self.tiers[-1].span
+
+    def _row(self, symbol):
+        row = self.symbols.get(symbol)
+        if row is None:
+            row = self.symbols[symbol] = len(self.symbols)
+        return row
+
+    def record(self, symbols, sentiment, confidence, timestamp=None):
+        """Add one headline's prediction to each symbol it mentions"""
+        cls = self.class_index.get(sentiment)
+        if cls is None or not symbols:
+            return
+        now = time.time()
+        if timestamp is None:
+            timestamp = now
+        with self._lock:
+            rows = [self._row(symbol) for symbol in dict.fromkeys(symbols)]
+            kept = False
+            for tier in self.tiers:
+                slot = tier.slot_for(timestamp, now)
+                if slot is None:
+                    continue
+                kept = True
+                for row in rows:
+                    tier.add(slot, row, cls, confidence)
+            if kept:
+                self.recorded += 1
+            else:
+                self.dropped += 1
+
+    def _tier_for(self, seconds):
+        for tier in self.tiers:
+            if tier.span >= seconds:
+                return tier
+        raise ValueError(f"Window is longer than the {self.max_window // 3600}h kept")
+
+    def _summary(self, totals):
+        k = len(self.classes)
+        headlines = int(round(totals[:k].sum()))
+        summary = {
+            "headlines": headlines,
+            "counts": {label: int(round(totals[i])) for i, label in enumerate(self.classes)},
+            "mean_confidence": None,
+            "score": None,
+            "weighted_score": None
+        }
+        if headlines:
+            # Confidence sums are float32; round off the noise
+            summary["mean_confidence"] = round(float(totals[k:].sum() / headlines), 6)
+            summary["score"] = float((totals[self.positive] - totals[self.negative]) / headlines)
+            summary["weighted_score"] = round(float(
+                (totals[k + self.positive] - totals[k + self.negative]) / headlines
+            ), 6)
+        return summary
+
+    def sentiment(self, symbol, seconds, now=None):
+        """Sentiment summary of symbol over the last `seconds`, in whole buckets ending with the current one"""
+        now = time.time() if now is None else now
+        tier = self._tier_for(seconds)
+        with self._lock:
+            row = self.symbols.get(symbol)
+            if row is None:
+                totals = np.zeros(self.fields)
+            else:
+                totals = tier.symbol_totals(row, tier.window_mask(now, seconds))
+        summary = self._summary(totals)
+        summary["resolution_seconds"] = tier.resolution
+        return summary
+
+    def movers(self, seconds, limit=10, min_headlines=1, now=None):
+        """Symbols whose score changed most between the last window and the one before it"""
+        now = time.time() if now is None else now
+        tier = self._tier_for(2 * seconds)
+        with self._lock:
+            symbols = list(self.symbols)
+            current = tier.totals(len(symbols), tier.window_mask(now, seconds))
+            previous = tier.totals(len(symbols), tier.window_mask(now, seconds, offset=seconds))
+
+        k = len(self.classes)
+        current_n = current[:, :k].sum(axis=1)
+        previous_n = previous[:, :k].sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            current_score = np.where(current_n > 0, (current[:, self.positive] - current[:, self.negative]) / current_n, 0.0)
+            previous_score = np.where(previous_n > 0, (previous[:, self.positive] - previous[:, self.negative]) / previous_n, 0.0)
+        change = current_score - previous_score
+
+        eligible = np.flatnonzero(current_n >= min_headlines)
+        ranked = eligible[np.argsort(-np.abs(change[eligible]), kind='stable')][:limit]
+        return [
+            {
+                "symbol": symbols[i],
+                "change": float(change[i]),
+                "score": float(current_score[i]),
+                "previous_score": float(previous_score[i]) if previous_n[i] else None,
+                "headlines": int(round(current_n[i])),
+                "previous_headlines": int(round(previous_n[i]))
+            }
+            for i in ranked
+        ]
+
+    def stats(self):
+        return {
+            "symbols": len(self.symbols),
+            "recorded": self.recorded,
+            "dropped_too_old": self.dropped,
+            "tiers": [{"resolution_seconds": t.resolution, "slots": t.slots} for t in self.tiers],
+            "bytes": sum(t.nbytes() for t in self.tiers)
+        }
+
+
+def load_processed(aggregates, processed_dir):
+    """Record the scored rows of data/processed files (Parquet copies preferred); returns rows read"""
+    # Imported here so the API does not pay for pandas until history is loaded
+    import pandas as pd
+
+    rows = 0
+    for csv_path in sorted(glob.glob(os.path.join(processed_dir, 'processed_*.csv'))):
+        parquet_path = os.path.splitext(csv_path)[0] + '.parquet'
+        columns = ['timestamp', 'sentiment', 'confidence', 'stocks']
+        if os.path.exists(parquet_path):
+            df = pd.read_parquet(parquet_path, columns=columns)
+        else:
+            df = pd.read_csv(csv_path, usecols=columns)
+        df = df.dropna(subset=['sentiment', 'stocks'])
+        timestamps = pd.to_datetime(df['timestamp'], utc=True, errors='coerce')
+        valid = timestamps.notna()
+        df = df[valid]
+        seconds = (timestamps[valid] - pd.Timestamp(0, tz='UTC')).dt.total_seconds()
+        for timestamp, sentiment, confidence, stocks in zip(
+            seconds, df['sentiment'], df['confidence'], df['stocks']
+        ):
+            aggregates.record(str(stocks).split(), sentiment, float(confidence), timestamp)
+        rows += len(df)
+    return rows
@@ -0,0 +1,238 @@
+"""
+Versioned, pickle-free model artifacts.
+
+Each exported model lives in its own directory, model/<version>/:
+
+    manifest.json           format version, classes and vectorizer settings
+    terms.npy               sorted UTF-8 vocabulary; a term's position is its column
+    idf.npy                 idf weight per column
+    feature_log_prob.npy    (features x classes) log P(term | class)
+    class_log_prior.npy     log P(class)
+    metrics.json            evaluation metrics from training (optional)
+
+Models from online training (model_type "hashed_multinomial_nb") hash their
+n-grams into a fixed number of columns instead, so they have no terms.npy
+or idf.npy.
+
+model/LATEST holds the name of the version to serve. Old versions are
+removed with prune_versions (`train.py --keep N`). The arrays are plain
+.npy files, so they load with np.load(mmap_mode='r'): every worker maps the
+same page-cache pages, and loading never executes code from the files.
+
+Convert the pickled model in model/ with:
+
+    python -m api.artifacts model
+"""
+import json
+import os
+import pickle
+import shutil
+import sys
+import time
+
+import numpy as np
+
+from api.scorer import HashedScorer, SparseScorer
+
+ARTIFACT_FORMAT_VERSION = 1
+LATEST_FILE = 'LATEST'
+
+ARRAY_NAMES = {
+    'tfidf_multinomial_nb': ['terms', 'idf', 'feature_log_prob', 'class_log_prior'],
+    'hashed_multinomial_nb': ['feature_log_prob', 'class_log_prior']
+}
+
+
+def new_version():
+    """Version name for a model exported now"""
+    return time.strftime('%Y%m%d-%H%M%S')
+
+
+def write_latest(model_dir, version):
+    """Point model/LATEST at version, atomically"""
+    tmp_path = os.path.join(model_dir, LATEST_FILE + '.tmp')
+    with open(tmp_path, 'w') as f:
+        f.write(version + '\n')
+    os.replace(tmp_path, os.path.join(model_dir, LATEST_FILE))
+
+
+def read_latest(model_dir):
+    """Version named in model/LATEST, or None if there is none"""
+    try:
+        with open(os.path.join(model_dir, LATEST_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def write_metrics(version_dir, metrics):
+    if metrics is not None:
+        with open(os.path.join(version_dir, 'metrics.json'), 'w') as f:
+            json.dump(metrics, f, indent=2)
+
+
+def export_artifact(vectorizer, model, model_dir, version=None, metrics=None, make_latest=True):
+    """Write a fitted TfidfVectorizer + MultinomialNB as model/<version>/ and return its path"""
+    scorer = SparseScorer.from_sklearn(vectorizer, model)
+    version = version or new_version()
+    version_dir = os.path.join(model_dir, version)
+    os.makedirs(version_dir, exist_ok=True)
+
+    # Sort the vocabulary so terms can be binary searched, and reorder the columns to match
+    encoded = [(term.encode('utf-8'), column) for term, column in scorer.vocabulary.items()]
+    encoded.sort()
+    order = np.array([column for _, column in encoded], dtype=np.intp)
+    width = max(len(term) for term, _ in encoded) + 1
+    arrays = {
+        'terms': np.array([term for term, _ in encoded], dtype=f'S{width}'),
+        'idf': scorer.idf[order],
+        'feature_log_prob': np.ascontiguousarray(scorer.feature_log_prob[order]),
+        'class_log_prior': scorer.class_log_prior
+    }
+    for name in ARRAY_NAMES['tfidf_multinomial_nb']:
+        np.save(os.path.join(version_dir, f'{name}.npy'), arrays[name], allow_pickle=False)
+
+    manifest = {
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'model_version': version,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'model_type': 'tfidf_multinomial_nb',
+        'classes': [str(label) for label in scorer.classes],
+        'n_features': int(scorer.n_features),
+        'ngram_range': list(scorer.ngram_range),
+        'token_pattern': scorer.token_regex.pattern,
+        'lowercase': scorer.lowercase,
+        'norm': scorer.norm,
+        'sublinear_tf': scorer.sublinear_tf
+    }
+    with open(os.path.join(version_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    write_metrics(version_dir, metrics)
+
+    # Make sure what was written scores exactly like the sklearn pipeline
+    exported, _ = load_artifact(version_dir)
+    error = exported.max_abs_error(vectorizer, model)
+    if error > 1e-9:
+        raise ValueError(f"Exported artifact disagrees with sklearn (max error {error:.2e})")
+
+    if make_latest:
+        write_latest(model_dir, version)
+    return version_dir
+
+
+def export_hashed_artifact(feature_log_prob, class_log_prior, classes, vectorizer_params, model_dir,
+                           version=None, metrics=None, make_latest=True):
+    """Write a hashed-feature Naive Bayes model as model/<version>/ and return its path.
+
+    vectorizer_params are the HashingVectorizer settings the model was trained
+    with: ngram_range, token_pattern, lowercase and norm.
+    """
+    version = version or new_version()
+    version_dir = os.path.join(model_dir, version)
+    os.makedirs(version_dir, exist_ok=True)
+    arrays = {
+        'feature_log_prob': np.ascontiguousarray(feature_log_prob, dtype=np.float64),
+        'class_log_prior': np.asarray(class_log_prior, dtype=np.float64)
+    }
+    for name in ARRAY_NAMES['hashed_multinomial_nb']:
+        np.save(os.path.join(version_dir, f'{name}.npy'), arrays[name], allow_pickle=False)
+
+    manifest = {
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'model_version': version,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'model_type': 'hashed_multinomial_nb',
+        'classes': [str(label) for label in classes],
+        'n_features': int(arrays['feature_log_prob'].shape[0]),
+        'ngram_range': list(vectorizer_params['ngram_range']),
+        'token_pattern': vectorizer_params['token_pattern'],
+        'lowercase': vectorizer_params['lowercase'],
+        'norm': vectorizer_params['norm']
+    }
+    with open(os.path.join(version_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    write_metrics(version_dir, metrics)
+
+    if make_latest:
+        write_latest(model_dir, version)
+    return version_dir
+
+
+def load_artifact(version_dir, mmap_mode='r'):
+    """Load model/<version>/ as a SparseScorer (or HashedScorer) over memory-mapped arrays"""
+    with open(os.path.join(version_dir, 'manifest.json')) as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format: {manifest.get('format_version')}")
+
+    model_type = manifest.get('model_type', 'tfidf_multinomial_nb')
+    if model_type not in ARRAY_NAMES:
+        raise ValueError(f"Unsupported model type: {model_type}")
+
+    arrays = {
+        name: np.load(os.path.join(version_dir, f'{name}.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+        for name in ARRAY_NAMES[model_type]
+    }
+    if model_type == 'hashed_multinomial_nb':
+        scorer = HashedScorer(
+            feature_log_prob=arrays['feature_log_prob'],
+            class_log_prior=np.array(arrays['class_log_prior']),
+            classes=np.array(manifest['classes']),
+            ngram_range=manifest['ngram_range'],
+            token_pattern=manifest['token_pattern'],
+            lowercase=manifest['lowercase'],
+            norm=manifest['norm']
+        )
+        return scorer, manifest
+
+    scorer = SparseScorer(
+        idf=arrays['idf'],
+        feature_log_prob=arrays['feature_log_prob'],
+        class_log_prior=np.array(arrays['class_log_prior']),
+        classes=np.array(manifest['classes']),
+        terms=arrays['terms'],
+        ngram_range=manifest['ngram_range'],
+        token_pattern=manifest['token_pattern'],
+        lowercase=manifest['lowercase'],
+        norm=manifest['norm'],
+        sublinear_tf=manifest['sublinear_tf']
+    )
+    return scorer, manifest
+
+
+def load_latest_artifact(model_dir):
+    """Load the version named in model/LATEST; raises FileNotFoundError if there is none"""
+    version = read_latest(model_dir)
+    if version is None:
+        raise FileNotFoundError(f"No {LATEST_FILE} file in {model_dir}")
+    return load_artifact(os.path.join(model_dir, version))
+
+
+def prune_versions(model_dir, keep):
+    """Delete all but the `keep` newest versions in model_dir, never the one in LATEST; returns the removed names"""
+    latest = read_latest(model_dir)
+    versions = [
+        name for name in os.listdir(model_dir)
+        if os.path.isfile(os.path.join(model_dir, name, 'manifest.json'))
+    ]
+    # Newest first, by export time
+    versions.sort(key=lambda name: os.path.getmtime(os.path.join(model_dir, name, 'manifest.json')), reverse=True)
+    removed = [name for name in versions[max(0, keep):] if name != latest]
+    for name in removed:
+        shutil.rmtree(os.path.join(model_dir, name))
+    return removed
+
+
+if __name__ == '__main__':
+    # Export the pickled vectorizer and model in the given model directory
+    model_dir = sys.argv[1] if len(sys.argv) > 1 else 'model'
+    with open(os.path.join(model_dir, 'vectorizer.pkl'), 'rb') as f:
+        vectorizer = pickle.load(f)
+    with open(os.path.join(model_dir, 'model.pkl'), 'rb') as f:
+        model = pickle.load(f)
+    metrics = None
+    metrics_path = os.path.join(model_dir, 'metrics.json')
+    if os.path.exists(metrics_path):
+        with open(metrics_path) as f:
+            metrics = json.load(f)
+    print(f"Exported {export_artifact(vectorizer, model, model_dir, metrics=metrics)}")
@@ -0,0 +1,108 @@
+import asyncio
+import bisect
+import inspect
+import time
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512]
+WAIT_MS_BUCKETS = [0.5, 1, 2, 5, 10, 20, 50, 100]
+
+
+def _histogram(buckets):
+    return {"buckets": buckets, "counts": [0] * (len(buckets) + 1)}
+
+
+def _observe(histogram, value):
+    histogram["counts"][bisect.bisect_left(histogram["buckets"], value)] += 1
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-item requests into batched calls.
+
+    `submit()` queues an item and waits for its result. The queue is flushed
+    `window` seconds after the first item arrives, or as soon as it holds
+    `max_batch_size` items; `process_batch` then receives the list of items
+    and must return one result per item, in order. It may be a plain or an
+    async function.
+    """
+
+    def __init__(self, process_batch, window=0.002, max_batch_size=64):
+        self.process_batch = process_batch
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._pending = []
+        self._flush_handle = None
+        # Keep references to running batches so they are not garbage collected
+        self._running = set()
+
+        self.batches = 0
+        self.items = 0
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.batch_sizes = _histogram(BATCH_SIZE_BUCKETS)
+        self.wait_ms = _histogram(WAIT_MS_BUCKETS)
+
+    async def submit(self, item):
+        """Queue item for the next batch and return its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, time.perf_counter()))
+        self.max_queue_depth = max(self.max_queue_depth, len(self._pending))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            task = asyncio.ensure_future(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch):
+        started = time.perf_counter()
+        for _, _, enqueued_at in batch:
+            wait = started - enqueued_at
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            _observe(self.wait_ms, wait * 1000)
+        self.batches += 1
+        self.items += len(batch)
+        _observe(self.batch_sizes, len(batch))
+
+        try:
+            results = self.process_batch([item for item, _, _ in batch])
+            if inspect.isawaitable(results):
+                results = await results
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            # The caller may have gone away (e.g. client disconnected)
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch_size": self.max_batch_size,
+            "queue_depth": len(self._pending),
+            "max_queue_depth": self.max_queue_depth,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "batch_size_histogram": self.batch_sizes,
+            "mean_wait_ms": self.total_wait / self.items * 1000 if self.items else 0.0,
+            "max_wait_ms": self.max_wait * 1000,
+            "wait_ms_histogram": self.wait_ms
+        }
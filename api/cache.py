@@ -0,0 +1,246 @@
+import asyncio
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+def approx_sizeof(obj):
+    """Approximate memory footprint in bytes of a JSON-like object"""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += approx_sizeof(key) + approx_sizeof(value)
+    elif isinstance(obj, (list, tuple)):
+        for item in obj:
+            size += approx_sizeof(item)
+    return size
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with an optional TTL and memory cap.
+
+    Entries older than `ttl` seconds are treated as misses and dropped.
+    When the cache holds more than `max_entries` entries, or more than
+    `max_bytes` as measured by `sizeof`, least recently used entries are
+    evicted.
+    """
+
+    def __init__(self, max_entries=1024, ttl=None, max_bytes=None, sizeof=approx_sizeof):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, stored_at, size = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                self.bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[2]
+            self._data[key] = (value, time.monotonic(), size)
+            self.bytes += size
+            while self._data and (
+                len(self._data) > self.max_entries
+                or (self.max_bytes is not None and self.bytes > self.max_bytes)
+            ):
+                _, (_, _, evicted_size) = self._data.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        stats = {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+        if self.max_bytes is not None:
+            stats["bytes"] = self.bytes
+            stats["max_bytes"] = self.max_bytes
+        return stats
+
+
+class ExplanationCache:
+    """Two-tier explanation cache: an in-process LRU in front of SQLite.
+
+    Memory misses fall through to the on-disk store, and disk hits are
+    promoted back into memory. The store is opened by `open()`, not on
+    construction, and holds at most `max_disk_entries` rows, dropping the
+    oldest first. Pass `path=None` to keep the cache in memory only.
+
+    `aget` and `aset` run the disk work in a worker thread so async
+    handlers do not block the event loop on SQLite.
+    """
+
+    def __init__(self, path=None, max_entries=2048, ttl=86400.0, max_disk_entries=100000):
+        self.ttl = ttl
+        self.memory = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self.disk_expirations = 0
+        self.disk_evictions = 0
+        self._disk_entries = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def open(self):
+        """Open the on-disk store; does nothing without a path or when already open"""
+        if not self.path or self._conn is not None:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS explanations ("
+            "key TEXT PRIMARY KEY, explanation TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS explanations_created_at ON explanations (created_at)")
+        with self._lock:
+            # Drop anything that expired while the server was down
+            if self.ttl is not None:
+                cursor = conn.execute(
+                    "DELETE FROM explanations WHERE created_at < ?", (time.time() - self.ttl,)
+                )
+                self.disk_expirations += cursor.rowcount
+            self._conn = conn
+            self._evict_oldest()
+            conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _evict_oldest(self):
+        """Trim the store to `max_disk_entries` rows; call with the lock held"""
+        self._disk_entries = self._conn.execute("SELECT COUNT(*) FROM explanations").fetchone()[0]
+        if self.max_disk_entries is None or self._disk_entries <= self.max_disk_entries:
+            return
+        cursor = self._conn.execute(
+            "DELETE FROM explanations WHERE key IN "
+            "(SELECT key FROM explanations ORDER BY created_at LIMIT ?)",
+            (self._disk_entries - self.max_disk_entries,)
+        )
+        self.disk_evictions += cursor.rowcount
+        self._disk_entries -= cursor.rowcount
+
+    def _disk_get(self, key):
+        with self._lock:
+            if self._conn is None:
+                return None
+            row = self._conn.execute(
+                "SELECT explanation, created_at FROM explanations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.disk_misses += 1
+                return None
+            explanation, created_at = row
+            if self.ttl is not None and time.time() - created_at > self.ttl:
+                self._conn.execute("DELETE FROM explanations WHERE key = ?", (key,))
+                self._conn.commit()
+                self._disk_entries -= 1
+                self.disk_expirations += 1
+                self.disk_misses += 1
+                return None
+            self.disk_hits += 1
+
+        self.memory.set(key, explanation)
+        return explanation
+
+    def _disk_set(self, key, explanation):
+        with self._lock:
+            if self._conn is None:
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO explanations (key, explanation, created_at) VALUES (?, ?, ?)",
+                (key, explanation, time.time())
+            )
+            # Counts a replaced key twice, which only makes the next trim recount early
+            self._disk_entries += 1
+            if self.max_disk_entries is not None and self._disk_entries > self.max_disk_entries:
+                self._evict_oldest()
+            self._conn.commit()
+
+    def get(self, key):
+        explanation = self.memory.get(key)
+        if explanation is not None or self._conn is None:
+            return explanation
+        return self._disk_get(key)
+
+    def set(self, key, explanation):
+        self.memory.set(key, explanation)
+        if self._conn is not None:
+            self._disk_set(key, explanation)
+
+    async def aget(self, key):
+        explanation = self.memory.get(key)
+        if explanation is not None or self._conn is None:
+            return explanation
+        return await asyncio.to_thread(self._disk_get, key)
+
+    async def aset(self, key, explanation):
+        self.memory.set(key, explanation)
+        if self._conn is not None:
+            await asyncio.to_thread(self._disk_set, key, explanation)
+
+    def stats(self):
+        stats = {"memory": self.memory.stats()}
+        with self._lock:
+            if self._conn is None:
+                return stats
+            entries = self._conn.execute("SELECT COUNT(*) FROM explanations").fetchone()[0]
+        lookups = self.disk_hits + self.disk_misses
+        stats["disk"] = {
+            "path": self.path,
+            "entries": entries,
+            "max_entries": self.max_disk_entries,
+            "hits": self.disk_hits,
+            "misses": self.disk_misses,
+            "hit_rate": self.disk_hits / lookups if lookups else 0.0,
+            "evictions": self.disk_evictions,
+            "expirations": self.disk_expirations
+        }
+        return stats
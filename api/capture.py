@@ -0,0 +1,205 @@
+"""
+Request capture for replaying production traffic (see replay.py).
+
+CaptureMiddleware samples requests to the captured paths and copies their
+bodies as the application reads them. Once the response is sent it hands a
+small dict to RequestCapture, whose background thread serializes entries to
+JSON lines. The request path only pays for the copy and a queue put. Files
+rotate at `max_bytes`, and only the newest `max_files` are kept:
+
+    data/capture/requests-20261017-101500.jsonl
+
+Each line holds one request:
+
+    {"ts": 1792232100.123, "method": "POST", "path": "/predict",
+     "query": "explain=none", "content_type": "application/json",
+     "accept": "*/*", "body": "{\"text\": \"...\"}", "body_truncated": false,
+     "status": 200, "duration_ms": 1.84, "first_byte_ms": 1.79,
+     "response_bytes": 212, "sample_rate": 0.1}
+
+`sample_rate` is the share of requests captured when the entry was written,
+so replay.py can estimate the production rate from the sampled entries.
+
+Bodies longer than `max_body_bytes` are cut off and marked truncated. When
+the writer falls behind and the queue is full, entries are dropped and
+counted rather than slowing requests down.
+"""
+import glob
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+
+class RequestCapture:
+    """Appends captured request entries to rotating JSONL files from a background thread"""
+
+    def __init__(self, directory, sample_rate=1.0, max_bytes=64 * 1024 * 1024, max_files=10,
+                 max_body_bytes=256 * 1024, queue_size=10000, prefix='requests'):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.max_body_bytes = max_body_bytes
+        self.prefix = prefix
+        self.captured = 0
+        self.dropped = 0
+        self.written = 0
+        self.files = 0
+        self.path = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._file = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0
+
+    def sampled(self):
+        """Whether to capture the next request"""
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def record(self, entry):
+        """Queue an entry for the writer; dropped (and counted) if the queue is full"""
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(entry)
+            self.captured += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self._thread = threading.Thread(target=self._run, name="request-capture", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            entries = [self._queue.get()]
+            # Write whatever else is waiting in one go, then flush
+            while len(entries) < 1000:
+                try:
+                    entries.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in entries
+            entries = [entry for entry in entries if entry is not None]
+            if entries:
+                self._write(''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries))
+                self.written += len(entries)
+            if stop:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                return
+
+    def _write(self, lines):
+        if self._file is None or self._file.tell() >= self.max_bytes:
+            self._rotate()
+        self._file.write(lines)
+        self._file.flush()
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+        name = f"{self.prefix}-{time.strftime('%Y%m%d-%H%M%S')}"
+        path = os.path.join(self.directory, f"{name}.jsonl")
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(self.directory, f"{name}-{suffix}.jsonl")
+            suffix += 1
+        self._file = open(path, 'a', encoding='utf-8')
+        self.path = path
+        self.files += 1
+        # Oldest first
+        existing = sorted(glob.glob(os.path.join(self.directory, f"{self.prefix}-*.jsonl")), key=os.path.getmtime)
+        for old_path in existing[:max(0, len(existing) - self.max_files)]:
+            if old_path != path:
+                os.remove(old_path)
+
+    def close(self):
+        """Write out queued entries and stop the writer"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "captured": self.captured,
+            "dropped": self.dropped,
+            "written": self.written,
+            "queued": self._queue.qsize(),
+            "files": self.files,
+            "path": self.path
+        }
+
+
+class CaptureMiddleware:
+    """ASGI middleware sampling requests whose path starts with one of `paths` into a RequestCapture"""
+
+    def __init__(self, app, capture, paths=('/predict',)):
+        self.app = app
+        self.capture = capture
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope, receive, send):
+        capture = self.capture
+        if (scope["type"] != "http" or not capture.enabled
+                or not scope["path"].startswith(self.paths) or not capture.sampled()):
+            await self.app(scope, receive, send)
+            return
+
+        body = bytearray()
+        truncated = False
+        response = {"status": 500, "first_byte": None, "bytes": 0}
+        started = time.perf_counter()
+
+        async def receive_and_copy():
+            nonlocal truncated
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                room = capture.max_body_bytes - len(body)
+                if len(chunk) > room:
+                    truncated = True
+                body.extend(chunk[:max(0, room)])
+            return message
+
+        async def send_and_measure(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["first_byte"] = time.perf_counter()
+            elif message["type"] == "http.response.body":
+                response["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_and_copy, send_and_measure)
+        finally:
+            finished = time.perf_counter()
+            headers = dict(scope["headers"])
+            capture.record({
+                "ts": time.time() - (finished - started),
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": scope["query_string"].decode('latin-1'),
+                "content_type": headers.get(b"content-type", b"").decode('latin-1'),
+                "accept": headers.get(b"accept", b"").decode('latin-1'),
+                "body": body.decode('utf-8', errors='replace'),
+                "body_truncated": truncated,
+                "status": response["status"],
+                "duration_ms": round((finished - started) * 1000, 3),
+                "first_byte_ms": round((response["first_byte"] - started) * 1000, 3)
+                if response["first_byte"] is not None else None,
+                "response_bytes": response["bytes"],
+                "sample_rate": capture.sample_rate
+            })
@@ -0,0 +1,103 @@
+"""
+Compact batch responses for high-volume clients (/predict/batch?format=compact).
+
+Class labels and ticker metadata are sent once, in header tables, and each
+scored text is a row of indices plus float32 probabilities:
+
+    {
+      "format": "compact",
+      "model_version": "20261017-015101",
+      "count": 2,
+      "classes": ["Buy", "Hold", "Sell"],
+      "stocks": [{"symbol": "AAPL", "name": "Apple Inc.", ...}],
+      "columns": ["index", "sentiment", "probabilities", "stocks"],
+      "rows": [[0, 2, [0.21, 0.18, 0.61], [0]], [2, 0, [0.45, 0.31, 0.24], []]]
+    }
+
+`index` is the text's position in the request (empty texts are skipped),
+`sentiment` indexes `classes`, `probabilities` follow the order of `classes`
+and `stocks` indexes the stocks table. Confidence is the largest
+probability. With explanations, "explanations" holds one string (or null)
+per row.
+
+The body is msgpack when the client accepts it, and JSON otherwise,
+encoded with orjson when installed. Both are optional dependencies.
+"""
+import json
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_TYPE = 'application/json'
+MSGPACK_TYPES = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+COLUMNS = ["index", "sentiment", "probabilities", "stocks"]
+
+
+def compact_results(positions, payloads, classes, model_version, explanations=None):
+    """The compact response for scored payloads, at `positions` in the request"""
+    classes = [str(label) for label in classes]
+    class_index = {label: i for i, label in enumerate(classes)}
+    probabilities = np.empty((len(payloads), len(classes)), dtype=np.float32)
+    stocks, stock_index = [], {}
+    rows = []
+    for i, (position, payload) in enumerate(zip(positions, payloads)):
+        probabilities[i] = [payload["probabilities"][label] for label in classes]
+        references = []
+        for stock in payload["stocks"]:
+            reference = stock_index.get(stock["symbol"])
+            if reference is None:
+                reference = stock_index[stock["symbol"]] = len(stocks)
+                stocks.append(stock)
+            references.append(reference)
+        rows.append([position, class_index[payload["sentiment"]], probabilities[i], references])
+
+    body = {
+        "format": "compact",
+        "model_version": model_version,
+        "count": len(rows),
+        "classes": classes,
+        "stocks": stocks,
+        "columns": COLUMNS,
+        "rows": rows
+    }
+    if explanations is not None:
+        body["explanations"] = explanations
+    return body
+
+
+def media_types():
+    """Media types compact responses can be encoded in here"""
+    return [JSON_TYPE] + ([MSGPACK_TYPES[0]] if msgpack is not None else [])
+
+
+def negotiate(accept):
+    """Media type to encode a compact response in for an Accept header, or None if none is available"""
+    accepted = {part.split(';')[0].strip().lower() for part in (accept or '').split(',')}
+    if msgpack is not None and accepted & set(MSGPACK_TYPES):
+        return MSGPACK_TYPES[0]
+    if not accepted - {''} or accepted & {JSON_TYPE, 'application/*', '*/*'}:
+        return JSON_TYPE
+    return None
+
+
+def _float32_list(array):
+    # str() of a float32 is its shortest round-tripping form, e.g. 0.61 rather than 0.6100000143051147
+    return [float(str(value)) for value in array]
+
+
+def encode(body, media_type):
+    """Serialize a compact_results() body as media_type"""
+    if media_type != JSON_TYPE:
+        return msgpack.packb(body, default=lambda array: array.tolist(), use_single_float=True)
+    if orjson is not None:
+        return orjson.dumps(body, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(body, default=_float32_list, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
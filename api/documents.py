@@ -0,0 +1,206 @@
+"""
+Long documents (title + article body) for a model trained on headlines.
+
+Article bodies carry publisher boilerplate ("Reuters, the news and media
+division of Thomson Reuters, ...") that repeats in every article of a
+source, skews the prediction and costs vectorization time. Documents are
+prepared in one pass over their sentences:
+
+    - BoilerplateFilter drops sentences that already appeared in at least
+      `min_documents` earlier documents of the same source. It learns while
+      it filters, so the first few copies of a new boilerplate sentence get
+      through; learned fingerprints can be saved and loaded.
+    - Reading stops once `max_tokens` tokens are kept, so the cost of
+      preparing and scoring a document is bounded however long it is.
+    - score_sentences optionally scores each kept sentence on its own and
+      averages the probabilities, weighted by sentence length, into one
+      document-level prediction.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+
+from api.text import clean_text
+
+# Sentence ends: ., ! or ? (optionally followed by a closing quote or bracket), whitespace,
+# then something that can start a sentence
+SENTENCE_BOUNDARY = re.compile(r'(?:(?<=[.!?])|(?<=[.!?]["\'”’)\]]))\s+(?=["\'“‘(\[]?[A-Z0-9])')
+WORD_PATTERN = re.compile(r'\w+')
+# Shorter sentences ("Read more.") are never treated as boilerplate
+MIN_SENTENCE_WORDS = 4
+
+
+def iter_sentences(text):
+    """Sentences of text, lazily, so callers can stop early on long documents"""
+    start = 0
+    for match in SENTENCE_BOUNDARY.finditer(text):
+        sentence = text[start:match.start()].strip()
+        if sentence:
+            yield sentence
+        start = match.end()
+    sentence = text[start:].strip()
+    if sentence:
+        yield sentence
+
+
+def sentence_fingerprint(sentence):
+    """64-bit fingerprint of a sentence's lower-cased words, or None if it is too short to judge"""
+    words = WORD_PATTERN.findall(sentence.lower())
+    if len(words) < MIN_SENTENCE_WORDS:
+        return None
+    return hashlib.blake2b(' '.join(words).encode('utf-8'), digest_size=8).hexdigest()
+
+
+class BoilerplateFilter:
+    """Per-source fingerprints of sentences repeated across documents.
+
+    Thread-safe. For each source it counts how many documents each sentence
+    fingerprint appeared in; at `min_documents` the fingerprint becomes
+    boilerplate and is dropped from later documents. Counts are pruned to
+    those seen more than once when a source tracks over `max_sentences`
+    fingerprints, and at most `max_sources` sources are learned separately
+    (later ones share one anonymous source, see `learns_separately`).
+    """
+
+    def __init__(self, min_documents=3, max_sentences=100000, max_sources=1000):
+        self.min_documents = min_documents
+        self.max_sentences = max_sentences
+        self.max_sources = max_sources
+        # source -> (Counter of fingerprint -> documents, set of boilerplate fingerprints)
+        self.sources = {}
+        self.documents = 0
+        self.removed = 0
+        self._lock = threading.Lock()
+
+    def _source(self, source):
+        state = self.sources.get(source or '')
+        if state is None:
+            if len(self.sources) >= self.max_sources:
+                source = ''
+            state = self.sources.setdefault(source or '', (Counter(), set()))
+        return state
+
+    def learns_separately(self, source):
+        """Whether documents of source would be learned under its own name, not the shared anonymous source"""
+        return bool(source) and (source in self.sources or len(self.sources) < self.max_sources)
+
+    def is_boilerplate(self, source, fingerprint):
+        state = self.sources.get(source or '')
+        return state is not None and fingerprint in state[1]
+
+    def learn(self, source, fingerprints, removed=0):
+        """Count one document's (distinct) sentence fingerprints and the boilerplate removed from it"""
+        with self._lock:
+            self.removed += removed
+            counts, boilerplate = self._source(source)
+            for fingerprint in fingerprints:
+                if fingerprint in boilerplate:
+                    continue
+                counts[fingerprint] += 1
+                if counts[fingerprint] >= self.min_documents:
+                    boilerplate.add(fingerprint)
+                    del counts[fingerprint]
+            if len(counts) > self.max_sentences:
+                for fingerprint in [f for f, n in counts.items() if n < 2]:
+                    del counts[fingerprint]
+            self.documents += 1
+
+    def count(self, removed=0):
+        """Count a document filtered without learning from it"""
+        with self._lock:
+            self.removed += removed
+            self.documents += 1
+
+    def save(self, path):
+        with self._lock:
+            state = {
+                "min_documents": self.min_documents,
+                "sources": {
+                    source: {"boilerplate": sorted(boilerplate), "counts": dict(counts)}
+                    for source, (counts, boilerplate) in self.sources.items()
+                }
+            }
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(temp_path, path)
+
+    def load(self, path):
+        """Add the fingerprints saved at path; returns the number of boilerplate sentences loaded"""
+        with open(path) as f:
+            state = json.load(f)
+        loaded = 0
+        with self._lock:
+            for source, saved in state.get("sources", {}).items():
+                counts, boilerplate = self._source(source)
+                boilerplate.update(saved.get("boilerplate", []))
+                counts.update(saved.get("counts", {}))
+                loaded += len(saved.get("boilerplate", []))
+        return loaded
+
+    def stats(self):
+        return {
+            "sources": len(self.sources),
+            "boilerplate_sentences": sum(len(boilerplate) for _, boilerplate in self.sources.values()),
+            "documents": self.documents,
+            "removed_sentences": self.removed,
+            "min_documents": self.min_documents
+        }
+
+
+def prepare_document(text, boilerplate=None, source=None, max_tokens=None, learn=True):
+    """Sentences of text to score, without boilerplate and cut off after max_tokens tokens.
+
+    Returns the kept sentences and a summary: kept sentences and tokens,
+    dropped boilerplate sentences, and whether the text was truncated.
+    """
+    sentences = []
+    fingerprints = set()
+    tokens = 0
+    removed = 0
+    truncated = False
+    for sentence in iter_sentences(text):
+        if max_tokens is not None and tokens >= max_tokens:
+            truncated = True
+            break
+        fingerprint = sentence_fingerprint(sentence) if boilerplate is not None else None
+        if fingerprint is not None:
+            if boilerplate.is_boilerplate(source, fingerprint):
+                removed += 1
+                continue
+            fingerprints.add(fingerprint)
+        words = sentence.split()
+        if max_tokens is not None and tokens + len(words) > max_tokens:
+            words = words[:max_tokens - tokens]
+            sentence = ' '.join(words)
+            truncated = True
+        sentences.append(sentence)
+        tokens += len(words)
+
+    if boilerplate is not None:
+        if learn:
+            boilerplate.learn(source, fingerprints, removed)
+        else:
+            boilerplate.count(removed)
+    return sentences, {
+        "sentences": len(sentences),
+        "tokens": tokens,
+        "boilerplate_sentences": removed,
+        "truncated": truncated
+    }
+
+
+def score_sentences(scorer, sentences):
+    """Document class probabilities: each sentence scored alone, averaged with weights by its token count"""
+    if not sentences:
+        return scorer.predict_proba([''])[0]
+    cleaned = [clean_text(sentence) for sentence in sentences]
+    probabilities = scorer.predict_proba(cleaned)
+    weights = [max(1, len(sentence.split())) for sentence in cleaned]
+    return np.average(probabilities, axis=0, weights=weights)
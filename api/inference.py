@@ -0,0 +1,212 @@
+"""
+Scoring off the event loop.
+
+`score_payloads` is the CPU-bound part of a prediction: cleaning, the
+sparse transform and matrix product, and ticker detection. InferencePool
+runs it in one of three modes:
+
+    none      on the event loop, as a plain function call
+    thread    in a thread pool, so the event loop keeps serving other requests
+    process   in a process pool; each worker loads a model version once from
+              its memory-mapped artifact and keeps it for later calls
+
+Small scoring calls stay on the event loop in every mode, since handing them
+to a pool costs more than scoring them. Larger ones are split into shards
+scored in parallel and merged back in order.
+"""
+import asyncio
+import csv
+import math
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from api.artifacts import load_artifact
+from api.text import clean_text
+from api.tickers import TickerIndex
+
+EXECUTOR_MODES = ('none', 'thread', 'process')
+# Model versions each worker process keeps loaded (the active one and the one before it)
+WORKER_MODEL_VERSIONS = 2
+
+
+def load_ticker_index(tickers_path):
+    """TickerIndex from the tickers CSV, or an empty one if it is missing"""
+    try:
+        with open(tickers_path, newline='', encoding='utf-8') as f:
+            return TickerIndex(list(csv.DictReader(f)))
+    except FileNotFoundError:
+        return TickerIndex([])
+
+
+def score_payloads(texts, scorer, ticker_index):
+    """Score texts as one matrix and detect stocks.
+
+    Returns the cleaned texts, one prediction payload per text, and the
+    seconds spent in each stage.
+    """
+    timings = {}
+    started = time.perf_counter()
+    cleaned = [clean_text(text) for text in texts]
+    timings["clean_text"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    features = scorer.transform(cleaned)
+    timings["vectorize"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batch_probabilities = scorer.predict_proba_transformed(features)
+    timings["predict"] = time.perf_counter() - started
+    batch_predictions = scorer.classes[batch_probabilities.argmax(axis=1)]
+
+    started = time.perf_counter()
+    batch_stocks = [ticker_index.detect(text) for text in texts]
+    timings["detect_stocks"] = time.perf_counter() - started
+
+    payloads = []
+    for prediction, probabilities, stocks in zip(batch_predictions, batch_probabilities, batch_stocks):
+        payloads.append({
+            "sentiment": str(prediction),
+            "confidence": float(max(probabilities)),
+            "probabilities": {
+                label: float(prob)
+                for label, prob in zip(scorer.classes, probabilities)
+            },
+            "stocks": stocks
+        })
+    return cleaned, payloads, timings
+
+
+# Set in each worker process by init_worker
+worker_ticker_index = None
+worker_scorers = OrderedDict()
+
+
+def init_worker(tickers_path):
+    """Build the ticker index once per worker process"""
+    global worker_ticker_index
+    worker_ticker_index = load_ticker_index(tickers_path)
+
+
+def score_shard(version_dir, texts):
+    """score_payloads in a worker process, loading the model version on first use"""
+    scorer = worker_scorers.get(version_dir)
+    if scorer is None:
+        scorer, _ = load_artifact(version_dir)
+        worker_scorers[version_dir] = scorer
+        while len(worker_scorers) > WORKER_MODEL_VERSIONS:
+            worker_scorers.popitem(last=False)
+    else:
+        worker_scorers.move_to_end(version_dir)
+    return score_payloads(texts, scorer, worker_ticker_index)
+
+
+class InferencePool:
+    """Runs score_payloads inline, in a thread pool or in a process pool.
+
+    Scoring calls with fewer than `min_texts` texts run inline. Larger ones
+    are split into at most `workers` shards of at least `shard_size` texts.
+    In process mode, models without an exported artifact (the pickled
+    fallback) are scored in a thread instead, since workers load models from
+    their version directory.
+    """
+
+    def __init__(self, mode, ticker_index, tickers_path, workers=None, min_texts=32, shard_size=256):
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(f"Unknown executor mode {mode!r}, expected one of {', '.join(EXECUTOR_MODES)}")
+        self.mode = mode
+        self.ticker_index = ticker_index
+        self.tickers_path = tickers_path
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.min_texts = min_texts
+        self.shard_size = shard_size
+        self._threads = None
+        self._processes = None
+        self.inline_calls = 0
+        self.offloaded_calls = 0
+        self.shards = 0
+
+    def _thread_pool(self):
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        return self._threads
+
+    def _process_pool(self):
+        if self._processes is None:
+            # Imported here: multiprocessing is slow to import and only process mode needs it
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # spawn rather than fork: the server process has running threads and an event loop
+            self._processes = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker,
+                initargs=(self.tickers_path,)
+            )
+        return self._processes
+
+    def start(self, model):
+        """Start the process pool's workers and load model in each, so the first request does not wait"""
+        if self.mode != 'process' or model is None or model.version_dir is None:
+            return []
+        pool = self._process_pool()
+        return [pool.submit(score_shard, model.version_dir, ["warm up"]) for _ in range(self.workers)]
+
+    def _shards(self, texts):
+        count = min(self.workers, max(1, len(texts) // self.shard_size))
+        size = math.ceil(len(texts) / count)
+        return [texts[i:i + size] for i in range(0, len(texts), size)]
+
+    async def score(self, texts, model):
+        """Returns the cleaned texts, payloads in order, and the stage timings of each shard"""
+        if self.mode == 'none' or len(texts) < self.min_texts:
+            self.inline_calls += 1
+            cleaned, payloads, timings = score_payloads(texts, model.scorer, self.ticker_index)
+            return cleaned, payloads, [timings]
+
+        loop = asyncio.get_running_loop()
+        shards = self._shards(texts)
+        if self.mode == 'process' and model.version_dir is not None:
+            futures = [
+                loop.run_in_executor(self._process_pool(), score_shard, model.version_dir, shard)
+                for shard in shards
+            ]
+        else:
+            futures = [
+                loop.run_in_executor(self._thread_pool(), score_payloads, shard, model.scorer, self.ticker_index)
+                for shard in shards
+            ]
+        self.offloaded_calls += 1
+        self.shards += len(shards)
+
+        cleaned, payloads, timings = [], [], []
+        for shard_cleaned, shard_payloads, shard_timings in await asyncio.gather(*futures):
+            cleaned.extend(shard_cleaned)
+            payloads.extend(shard_payloads)
+            timings.append(shard_timings)
+        return cleaned, payloads, timings
+
+    async def run(self, fn, items):
+        """fn(items) on the event loop, or in the thread pool if items is large (and the mode is not none)"""
+        if self.mode == 'none' or len(items) < self.min_texts:
+            return fn(items)
+        return await asyncio.get_running_loop().run_in_executor(self._thread_pool(), fn, items)
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "min_texts": self.min_texts,
+            "shard_size": self.shard_size,
+            "inline_calls": self.inline_calls,
+            "offloaded_calls": self.offloaded_calls,
+            "shards": self.shards
+        }
+
+    def shutdown(self):
+        if self._threads is not None:
+            self._threads.shutdown(wait=False, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
@@ -1,31 +1,188 @@
-from fastapi import FastAPI
+import time
+
+# Startup timing (see api/startup.py) starts before the framework and library imports
+STARTUP_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from functools import partial
+import asyncio
+import hashlib
 import pickle
-import re
 import os
 import json
-import pandas as pd
-from groq import Groq
+import secrets
 from dotenv import load_dotenv
+from api.aggregates import TickerAggregates, load_processed, parse_window
+from api.artifacts import read_latest, write_latest
+from api.batcher import MicroBatcher
+from api.cache import ExplanationCache, LRUCache
+from api.capture import CaptureMiddleware, RequestCapture
+from api.circuit_breaker import CircuitBreaker
+from api.compact import compact_results, encode, media_types, negotiate
+from api.documents import BoilerplateFilter, prepare_document, score_sentences
+from api.inference import InferencePool, load_ticker_index
+from api.neardup import NearDuplicateIndex, band_keys, band_keys_many
+from api.registry import ModelRegistry
+from api.scorer import SklearnScorer, SparseScorer
+from api.startup import StartupTimer
+from api.telemetry import RequestMetricsMiddleware, SamplingProfiler, Telemetry
+from api.text import clean_text
+from api.tickers import TickerIndex
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI()
+startup = StartupTimer(STARTUP_STARTED)
+
+# Seconds between checks of model/LATEST for a new version; 0 disables the watcher
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "5"))
+# Required in the X-Admin-Token header of admin endpoints; if unset they only accept local clients
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN") or None
+
+# The model, tickers and scored-headline history are loaded by the lifespan hook, not
+# at import. With STARTUP_BACKGROUND=1 they load in a worker thread while the server
+# already accepts requests; /health reports "ready" once the model and tickers are in.
+STARTUP_BACKGROUND = os.getenv("STARTUP_BACKGROUND", "0") == "1"
+
+@asynccontextmanager
+async def lifespan(app):
+    if not STARTUP_BACKGROUND:
+        load_resources()
+    
+    async def background():
+        if STARTUP_BACKGROUND:
+            try:
+                await asyncio.to_thread(load_resources)
+            except Exception as e:
+                startup.error = f"{type(e).__name__}: {e}"
+                print(f"Startup failed: {startup.error}")
+                return
+        # Started after the first load, so it does not load the same version again
+        if MODEL_WATCH_INTERVAL > 0:
+            await model_registry.watch(MODEL_WATCH_INTERVAL)
+    
+    task = asyncio.create_task(background())
+    yield
+    task.cancel()
+    inference_pool.shutdown()
+    request_capture.close()
+    explanation_cache.close()
+
+app = FastAPI(lifespan=lifespan)
+
+# Request, stage, cache and Groq metrics, exported at /metrics/prometheus
+telemetry = Telemetry(prefix="stock_sentiment_")
+telemetry.describe("http_requests_total", "counter", "HTTP requests by method, route and status code")
+telemetry.describe("http_requests_in_flight", "gauge", "HTTP requests currently being handled")
+telemetry.describe("http_request_duration_seconds", "histogram", "HTTP request duration by route")
+telemetry.describe("stage_duration_seconds", "histogram",
+                   "Time spent in each prediction stage per scoring call (groq includes waiting for a slot)")
+telemetry.describe("score_batch_size", "histogram", "Texts scored per scoring call",
+                   buckets=[1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096])
+telemetry.describe("document_sentences", "histogram", "Sentences scored per /predict?sentences=true document",
+                   buckets=[1, 2, 4, 8, 16, 32, 64, 128, 256])
+telemetry.describe("groq_requests_total", "counter", "Explanation lookups by outcome")
+telemetry.describe("groq_circuit_open", "gauge", "1 while the Groq circuit breaker is not closed")
+telemetry.describe("cache_hits_total", "counter", "Cache hits by cache")
+telemetry.describe("cache_misses_total", "counter", "Cache misses by cache")
+telemetry.describe("cache_evictions_total", "counter", "Cache evictions by cache")
+telemetry.describe("cache_entries", "gauge", "Entries held by cache")
+telemetry.describe("cache_hit_ratio", "gauge", "Hits / lookups by cache since startup")
+telemetry.describe("batcher_queue_depth", "gauge", "/predict requests waiting for the next micro-batch")
+telemetry.describe("batcher_batch_size", "histogram", "/predict requests per micro-batch")
+telemetry.describe("batcher_wait_milliseconds", "histogram", "Time /predict requests waited for their micro-batch")
+telemetry.describe("model_info", "gauge", "The active model version")
+telemetry.describe("startup_seconds", "gauge", "Seconds spent in each startup phase")
+app.add_middleware(RequestMetricsMiddleware, telemetry=telemetry)
+
+# Opt-in traffic capture for replay.py: CAPTURE_SAMPLE_RATE (0 = off, 1 = every request)
+# of the requests to CAPTURE_PATHS are appended to rotating JSONL files in CAPTURE_DIR
+# by a background writer (see api/capture.py)
+request_capture = RequestCapture(
+    os.getenv("CAPTURE_DIR") or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'capture'),
+    sample_rate=float(os.getenv("CAPTURE_SAMPLE_RATE", "0")),
+    max_bytes=int(float(os.getenv("CAPTURE_MAX_MB", "64")) * 1024 * 1024),
+    max_files=int(os.getenv("CAPTURE_MAX_FILES", "10")),
+    max_body_bytes=int(os.getenv("CAPTURE_MAX_BODY_KB", "256")) * 1024
+)
+if request_capture.enabled:
+    app.add_middleware(
+        CaptureMiddleware,
+        capture=request_capture,
+        paths=[path.strip() for path in os.getenv("CAPTURE_PATHS", "/predict").split(',') if path.strip()]
+    )
 
-# Initialize Groq client (optional - only if API key is provided)
+# Sampling profiler, switched on and off through /admin/profiler
+profiler = SamplingProfiler()
+
+# Groq request settings
+# GROQ_BASE_URL can point at a local stand-in server for testing
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "10"))
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "8"))
+
+# Groq client (optional - only if API key is provided). The SDK is imported when the
+# client is first needed: at startup after the model is loaded, not at import.
 groq_api_key = os.getenv("GROQ_API_KEY")
+groq_enabled = bool(groq_api_key) and groq_api_key != "your_groq_api_key_here"
 groq_client = None
-if groq_api_key and groq_api_key != "your_groq_api_key_here":
-    try:
-        groq_client = Groq(api_key=groq_api_key)
-        print("Groq client initialized successfully")
-    except Exception as e:
-        print(f"Groq client initialization failed: {e}")
-else:
-    print("Groq API key not found. Explanations will be disabled.")
+if not groq_enabled:
+    print("Groq API key not found. LLM explanations will be disabled.")
+
+def get_groq_client():
+    """The Groq client, created on first use; None if no API key is set or it cannot be created"""
+    global groq_client, groq_enabled
+    if groq_client is None and groq_enabled:
+        try:
+            from groq import AsyncGroq
+            
+            groq_client = AsyncGroq(
+                api_key=groq_api_key,
+                base_url=GROQ_BASE_URL,
+                timeout=GROQ_TIMEOUT,
+                max_retries=0
+            )
+            print("Groq client initialized successfully")
+        except Exception as e:
+            print(f"Groq client initialization failed: {e}")
+            groq_enabled = False
+    return groq_client
+
+# Bound the number of concurrent Groq calls and stop calling it while it is failing
+groq_semaphore = asyncio.Semaphore(GROQ_MAX_CONCURRENCY)
+groq_breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv("GROQ_BREAKER_THRESHOLD", "5")),
+    reset_timeout=float(os.getenv("GROQ_BREAKER_COOLDOWN", "30"))
+)
+
+# How predictions are explained unless a request asks otherwise (the explain query parameter):
+# "llm" asks Groq, "local" lists the n-grams that weighed most for the predicted class, "none" skips it
+EXPLANATION_MODES = ("local", "llm", "none")
+EXPLANATION_MODE = os.getenv("EXPLANATION_MODE") or ("llm" if groq_enabled else "local")
+if EXPLANATION_MODE not in EXPLANATION_MODES:
+    raise ValueError(f"EXPLANATION_MODE must be one of {', '.join(EXPLANATION_MODES)}")
+EXPLANATION_TOP_TERMS = int(os.getenv("EXPLANATION_TOP_TERMS", "5"))
+EXPLAIN_QUERY = Query(None, pattern="^(local|llm|none)$")
+
+# Cache explanations in memory and on disk so repeated headlines skip the LLM
+# Set EXPLANATION_CACHE_PATH to an empty string to keep the cache in memory only
+explanation_cache_path = os.getenv(
+    "EXPLANATION_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'cache', 'explanations.sqlite3')
+)
+EXPLANATION_CACHE_CONFIDENCE_STEP = float(os.getenv("EXPLANATION_CACHE_CONFIDENCE_STEP", "0.1"))
+explanation_cache = ExplanationCache(
+    path=explanation_cache_path or None,
+    max_entries=int(os.getenv("EXPLANATION_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("EXPLANATION_CACHE_TTL", "86400")),
+    max_disk_entries=int(os.getenv("EXPLANATION_CACHE_DISK_SIZE", "100000"))
+)
 
 # Allow frontend to access API
 app.add_middleware(
@@ -36,161 +193,195 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Cache full prediction payloads (sentiment, probabilities, stocks) for repeated headlines
+prediction_cache = LRUCache(
+    max_entries=int(os.getenv("PREDICTION_CACHE_SIZE", "10000")),
+    max_bytes=int(float(os.getenv("PREDICTION_CACHE_MAX_MB", "64")) * 1024 * 1024)
+)
+
+# Near duplicates of recently scored headlines (the same story syndicated with small
+# wording changes) reuse the first one's sentiment and probabilities when the changed
+# words are outside the model's vocabulary (see near_duplicate_payload). Each entry
+# takes about 1 KB; NEAR_DUPLICATE_CACHE_SIZE=0 disables the lookup.
+NEAR_DUPLICATE_CACHE_SIZE = int(os.getenv("NEAR_DUPLICATE_CACHE_SIZE", "50000"))
+near_duplicates = None
+if NEAR_DUPLICATE_CACHE_SIZE > 0:
+    near_duplicates = NearDuplicateIndex(
+        max_entries=NEAR_DUPLICATE_CACHE_SIZE,
+        ttl=float(os.getenv("NEAR_DUPLICATE_TTL", "86400")) or None,
+        min_similarity=float(os.getenv("NEAR_DUPLICATE_MIN_SIMILARITY", "0.85"))
+    )
+
 # Load model and vectorizer
-model_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'model')
+model_path = os.getenv("MODEL_DIR") or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'model')
 vectorizer_path = os.path.join(model_path, 'vectorizer.pkl')
 model_file_path = os.path.join(model_path, 'model.pkl')
 
-try:
+def compile_scorer(vectorizer, model):
+    """Compile the sklearn pipeline into a SparseScorer if it reproduces sklearn's output"""
+    try:
+        compiled = SparseScorer.from_sklearn(vectorizer, model)
+        error = compiled.max_abs_error(vectorizer, model)
+    except (ValueError, AttributeError) as e:
+        print(f"Fast scorer unavailable, using sklearn: {e}")
+        return None
+    if error > 1e-9:
+        print(f"Fast scorer disagrees with sklearn (max error {error:.2e}), using sklearn")
+        return None
+    return compiled
+
+def load_pickled_model():
+    """Load model/vectorizer.pkl and model/model.pkl, returning (scorer, version)"""
     with open(vectorizer_path, 'rb') as f:
-        vectorizer = pickle.load(f)
+        vectorizer_bytes = f.read()
     with open(model_file_path, 'rb') as f:
-        model = pickle.load(f)
-    print("Model loaded successfully")
-except FileNotFoundError:
-    print("Model files not found! Please run train.py first.")
-    vectorizer = None
-    model = None
-
-# Load stock tickers
+        model_bytes = f.read()
+    
+    vectorizer = pickle.loads(vectorizer_bytes)
+    model = pickle.loads(model_bytes)
+    # The version is derived from the artifacts so cache keys change with the model
+    version = hashlib.sha256(vectorizer_bytes + model_bytes).hexdigest()[:12]
+    return compile_scorer(vectorizer, model) or SklearnScorer(vectorizer, model), version
+
+def on_model_swap(previous, model):
+    """Drop predictions made by the previous model"""
+    if previous is not None:
+        prediction_cache.clear()
+
+# The active model is model_registry.active: a SparseScorer over the memory-mapped
+# artifact named in model/LATEST, or the pickled sklearn objects when no artifact
+# has been exported yet. Requests hold on to the model they started with, so a
+# reload swaps it without affecting requests in flight.
+model_registry = ModelRegistry(model_path, fallback=load_pickled_model, on_swap=on_model_swap)
+
+def load_model():
+    try:
+        model_registry.load()
+        print(f"Model loaded successfully (version {model_registry.active.version})")
+    except FileNotFoundError:
+        print("Model files not found! Please run train.py first.")
+
+# Stock tickers and the precompiled lookup index used by detect_stocks, read at startup
 tickers_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'tickers', 'tickers.csv')
-tickers_df = None
-try:
-    tickers_df = pd.read_csv(tickers_path)
-    print(f"Loaded {len(tickers_df)} stock tickers")
-except FileNotFoundError:
-    print("Tickers file not found. Stock detection will be disabled.")
-    tickers_df = pd.DataFrame()
-
-def clean_text(text):
-    """Clean input text"""
-    text = str(text).lower()
-    return re.sub(r'[^a-zA-Z0-9\s]', '', text)
+ticker_index = TickerIndex([])
+
+def load_tickers():
+    global ticker_index
+    if not os.path.exists(tickers_path):
+        print("Tickers file not found. Stock detection will be disabled.")
+        return
+    ticker_index = load_ticker_index(tickers_path)
+    inference_pool.ticker_index = ticker_index
+    print(f"Loaded {len(ticker_index)} stock tickers")
 
 def detect_stocks(text):
     """Detect stock tickers and company names in text"""
-    if tickers_df is None or tickers_df.empty:
-        return []
-    
-    detected_stocks = []
-    text_upper = text.upper()
-    text_lower = text.lower()
-    found_tickers = set()
-    
-    # Pattern 1: Tickers in parentheses: (AAPL), (TSLA)
-    parentheses_pattern = r'\(([A-Z]{2,5})\)'
-    matches = re.findall(parentheses_pattern, text_upper)
-    for ticker in matches:
-        if ticker in tickers_df['symbol'].values and ticker not in found_tickers:
-            found_tickers.add(ticker)
-            stock_info = tickers_df[tickers_df['symbol'] == ticker].iloc[0]
-            detected_stocks.append({
-                'symbol': ticker,
-                'name': stock_info['name'],
-                'exchange': stock_info['exchange'],
-                'sector': stock_info.get('sector', 'N/A')
-            })
-    
-    # Pattern 2: Standalone tickers (more restrictive - only if near stock-related keywords)
-    stock_keywords = ['STOCK', 'SHARES', 'EQUITY', 'TRADING', 'MARKET', 'PRICE', 'SHARE', 'EQUITIES']
-    standalone_pattern = r'\b([A-Z]{2,5})\b'
-    matches = re.findall(standalone_pattern, text_upper)
-    
-    for ticker in matches:
-        # Skip if already found or too short
-        if ticker in found_tickers or len(ticker) < 2:
-            continue
-        
-        # Filter out common words
-        common_words = {'THE', 'AND', 'FOR', 'ARE', 'BUT', 'NOT', 'YOU', 'ALL', 'CAN', 'HER', 'WAS', 'ONE', 'OUR', 'OUT', 'DAY', 'GET', 'HAS', 'HIM', 'HIS', 'HOW', 'ITS', 'MAY', 'NEW', 'NOW', 'OLD', 'SEE', 'TWO', 'WHO', 'WAY', 'USE', 'MAN', 'YEAR', 'YOUR', 'FROM', 'THAT', 'WITH', 'THIS', 'THEY', 'HAVE', 'WILL', 'WHAT', 'WHEN', 'WHERE', 'WHICH', 'THERE', 'THESE', 'THEIR', 'WOULD', 'COULD', 'SHOULD', 'INTO', 'UPON', 'OVER', 'UNDER', 'ABOUT', 'AFTER', 'BEFORE', 'BETWEEN', 'DURING', 'SINCE', 'UNTIL', 'WHILE', 'THROUGH', 'AGAINST', 'AMONG', 'THROUGHOUT', 'DESPITE', 'TOWARD', 'TOWARDS'}
-        
-        if ticker in common_words:
-            continue
-        
-        # Check if it's a known ticker AND appears near stock-related context
-        if ticker in tickers_df['symbol'].values:
-            # Check if ticker appears near stock-related keywords (within 20 characters)
-            ticker_pos = text_upper.find(ticker)
-            if ticker_pos != -1:
-                context_start = max(0, ticker_pos - 20)
-                context_end = min(len(text_upper), ticker_pos + len(ticker) + 20)
-                context = text_upper[context_start:context_end]
-                
-                # If near stock keywords, it's likely a ticker reference
-                if any(keyword in context for keyword in stock_keywords):
-                    stock_info = tickers_df[tickers_df['symbol'] == ticker].iloc[0]
-                    detected_stocks.append({
-                        'symbol': ticker,
-                        'name': stock_info['name'],
-                        'exchange': stock_info['exchange'],
-                        'sector': stock_info.get('sector', 'N/A')
-                    })
-                    found_tickers.add(ticker)
-    
-    # Pattern 3: Detect company names (e.g., "Apple" -> AAPL)
-    for _, row in tickers_df.iterrows():
-        if row['symbol'] in found_tickers:
-            continue  # Already detected via ticker
-        
-        company_name = row['name']
-        company_lower = company_name.lower()
-        
-        # Check for full company name
-        if company_lower in text_lower:
-            detected_stocks.append({
-                'symbol': row['symbol'],
-                'name': company_name,
-                'exchange': row['exchange'],
-                'sector': row.get('sector', 'N/A')
-            })
-            found_tickers.add(row['symbol'])
-            continue
-        
-        # Check for base company name (first word, if it's substantial)
-        # e.g., "Apple" from "Apple Inc."
-        name_parts = company_lower.split()
-        if len(name_parts) > 0:
-            base_name = name_parts[0]
-            # Remove any trailing punctuation
-            base_name = base_name.rstrip('.,!?;:')
-            
-            # Only match if base name is substantial (4+ chars) to avoid false matches
-            if len(base_name) >= 4:
-                # Use word boundary to match whole words only (avoid matching "Apple" in "Pineapple")
-                base_name_pattern = r'\b' + re.escape(base_name) + r'\b'
-                if re.search(base_name_pattern, text_lower):
-                    base_name_pos = text_lower.find(base_name)
-                    if base_name_pos != -1:
-                        # Check context around the company name (wider window)
-                        context_start = max(0, base_name_pos - 50)
-                        context_end = min(len(text_lower), base_name_pos + len(base_name) + 50)
-                        context = text_lower[context_start:context_end]
-                        
-                        # Stock-related keywords in context (expanded list)
-                        stock_context_words = [
-                            'stock', 'stocks', 'shares', 'equity', 'equities', 'trading', 'market', 
-                            'price', 'share', 'company', 'corporation', 'inc', 'corp', 'ltd', 
-                            'earnings', 'revenue', 'profit', 'quarter', 'financial', 'investor', 
-                            'ceo', 'executive', 'leadership', 'shake-up', 'shakeup', 'departure',
-                            'departures', 'exit', 'exits', 'resign', 'resigns', 'resignation',
-                            'board', 'director', 'officer', 'management', 'business', 'firm'
-                        ]
-                        
-                        # Check if any stock-related word appears in context
-                        if any(word in context for word in stock_context_words):
-                            detected_stocks.append({
-                                'symbol': row['symbol'],
-                                'name': company_name,
-                                'exchange': row['exchange'],
-                                'sector': row.get('sector', 'N/A')
-                            })
-                            found_tickers.add(row['symbol'])
-    
-    return detected_stocks
+    return ticker_index.detect(text)
+
+# Where scoring runs: INFERENCE_EXECUTOR=none (on the event loop), thread (default)
+# or process (a pool of INFERENCE_WORKERS processes, default one per core, each
+# loading the model once). Calls with fewer than INFERENCE_MIN_TEXTS texts stay
+# on the event loop; larger ones are split into shards of INFERENCE_SHARD_SIZE+.
+inference_pool = InferencePool(
+    os.getenv("INFERENCE_EXECUTOR", "thread"),
+    ticker_index,
+    tickers_path,
+    workers=int(os.getenv("INFERENCE_WORKERS", "0")) or None,
+    min_texts=int(os.getenv("INFERENCE_MIN_TEXTS", "32")),
+    shard_size=int(os.getenv("INFERENCE_SHARD_SIZE", "256"))
+)
+
+# Rolling per-ticker sentiment, updated as headlines are scored: AGGREGATE_MINUTES
+# one-minute buckets and AGGREGATE_HOURS one-hour buckets per symbol. Scored files
+# in AGGREGATE_HISTORY_DIR (default data/processed, empty to skip) are loaded at startup.
+ticker_aggregates = TickerAggregates(tiers=(
+    (60, int(os.getenv("AGGREGATE_MINUTES", "1440"))),
+    (3600, int(os.getenv("AGGREGATE_HOURS", "720")))
+))
+AGGREGATE_HISTORY_DIR = os.getenv(
+    "AGGREGATE_HISTORY_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'processed')
+)
+
+def load_history():
+    try:
+        history_rows = load_processed(ticker_aggregates, AGGREGATE_HISTORY_DIR)
+        print(f"Loaded {history_rows} scored headlines into ticker aggregates "
+              f"({ticker_aggregates.dropped} older than the {ticker_aggregates.max_window // 3600}h kept)")
+    except Exception as e:
+        print(f"Could not load scored headlines from {AGGREGATE_HISTORY_DIR}: {e}")
+
+# Long documents (/predict?document=true): boilerplate sentences are dropped using the
+# fingerprints saved by score_collected.py in BOILERPLATE_PATH, and at most
+# DOCUMENT_MAX_TOKENS tokens are scored. Requests are not learned from unless
+# BOILERPLATE_LEARN is set, since any client could otherwise teach the filter to drop
+# sentences from other requests; even then only documents with a named source are learned.
+DOCUMENT_MAX_TOKENS = int(os.getenv("DOCUMENT_MAX_TOKENS", "512"))
+BOILERPLATE_PATH = os.getenv(
+    "BOILERPLATE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'cache', 'boilerplate.json')
+)
+boilerplate_filter = BoilerplateFilter(min_documents=int(os.getenv("BOILERPLATE_MIN_DOCUMENTS", "3")))
+BOILERPLATE_LEARN = os.getenv("BOILERPLATE_LEARN", "false").lower() in ("1", "true", "yes")
+
+def load_boilerplate():
+    if not BOILERPLATE_PATH or not os.path.exists(BOILERPLATE_PATH):
+        return
+    try:
+        loaded = boilerplate_filter.load(BOILERPLATE_PATH)
+        print(f"Loaded {loaded} boilerplate sentences from {BOILERPLATE_PATH}")
+    except (OSError, ValueError) as e:
+        print(f"Could not load boilerplate fingerprints from {BOILERPLATE_PATH}: {e}")
+
+def load_resources():
+    """Load everything requests need, timing each phase; the service is ready after the tickers"""
+    with startup.phase("model"):
+        load_model()
+    with startup.phase("tickers"):
+        load_tickers()
+    with startup.phase("boilerplate"):
+        load_boilerplate()
+    with startup.phase("explanation_cache"):
+        explanation_cache.open()
+    inference_pool.start(model_registry.active)
+    startup.mark_ready()
+    # Not needed to answer requests, so loaded after the service is ready
+    if groq_enabled:
+        with startup.phase("groq"):
+            get_groq_client()
+    if AGGREGATE_HISTORY_DIR:
+        with startup.phase("history"):
+            load_history()
+
+def model_unavailable_message():
+    if not startup.ready and startup.error is None:
+        return "Model is still loading. Please try again shortly."
+    return "Model not loaded. Please train the model first."
+
+def explanation_cache_key(text: str, sentiment: str, confidence: float, detected_stocks: List[dict] = None):
+    """Build the explanation cache key from the normalized headline, label, confidence bucket and tickers"""
+    normalized = ' '.join(clean_text(text).split())
+    confidence_bucket = int(confidence / EXPLANATION_CACHE_CONFIDENCE_STEP)
+    symbols = ','.join(sorted(s['symbol'] for s in detected_stocks or []))
+    raw_key = f"{sentiment}|{confidence_bucket}|{symbols}|{normalized}"
+    return hashlib.sha256(raw_key.encode('utf-8')).hexdigest()
 
 async def generate_explanation(text: str, sentiment: str, confidence: float, detected_stocks: List[dict] = None):
     """Generate explanation using Groq API"""
-    if groq_client is None:
+    # Serve repeated headlines from the cache without calling the LLM
+    cache_key = explanation_cache_key(text, sentiment, confidence, detected_stocks)
+    cached = await explanation_cache.aget(cache_key)
+    if cached is not None:
+        telemetry.inc("groq_requests_total", outcome="cached")
+        return cached
+    
+    client = get_groq_client()
+    if client is None:
+        return None
+    
+    # Skip explanations while the upstream is failing
+    if not groq_breaker.allow():
+        telemetry.inc("groq_requests_total", outcome="circuit_open")
         return None
     
     # Build prompt with stock information if available
@@ -222,55 +413,334 @@ Headline: "{text}"
 
 Provide a brief, clear explanation (2-3 sentences) focusing on key words or phrases that indicate {sentiment} sentiment. Be specific about what in the headline suggests this sentiment."""
     
+    # One deadline covers both waiting for a slot and the call itself
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + GROQ_TIMEOUT
     try:
-        chat_completion = groq_client.chat.completions.create(
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            model="llama-3.1-8b-instant",
-            max_tokens=150,
-            temperature=0.7
-        )
-        return chat_completion.choices[0].message.content
+        with telemetry.time("stage_duration_seconds", stage="groq"):
+            try:
+                await asyncio.wait_for(groq_semaphore.acquire(), timeout=GROQ_TIMEOUT)
+            except asyncio.TimeoutError:
+                # Too many explanations in flight, which says nothing about the upstream
+                groq_breaker.release_trial()
+                telemetry.inc("groq_requests_total", outcome="skipped")
+                return None
+            try:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    groq_breaker.release_trial()
+                    telemetry.inc("groq_requests_total", outcome="skipped")
+                    return None
+                chat_completion = await asyncio.wait_for(
+                    client.chat.completions.create(
+                        messages=[
+                            {"role": "user", "content": prompt}
+                        ],
+                        model="llama-3.1-8b-instant",
+                        max_tokens=150,
+                        temperature=0.7
+                    ),
+                    timeout=remaining
+                )
+            finally:
+                groq_semaphore.release()
+        groq_breaker.record_success()
+        telemetry.inc("groq_requests_total", outcome="success")
+        explanation = chat_completion.choices[0].message.content
+        if explanation:
+            await explanation_cache.aset(cache_key, explanation)
+        return explanation
+    except asyncio.CancelledError:
+        # Not a sign of upstream health either way, but a half-open trial must not stay taken
+        groq_breaker.release_trial()
+        raise
+    except asyncio.TimeoutError:
+        print(f"Explanation request timed out after {GROQ_TIMEOUT}s")
+        groq_breaker.record_failure()
+        telemetry.inc("groq_requests_total", outcome="timeout")
+        return None
     except Exception as e:
         print(f"Error generating explanation: {e}")
+        groq_breaker.record_failure()
+        telemetry.inc("groq_requests_total", outcome="error")
+        return None
+
+def local_explanation(text: str, payload, model):
+    """Explain text's prediction from the model itself: the n-grams that favoured the predicted class and the tickers
+    
+    Returns the explanation text and a list of {"term", "weight"}, where weight is
+    the term's share of the log-odds of the predicted class over the runner-up.
+    """
+    with telemetry.time("stage_duration_seconds", stage="explain_local"):
+        class_index = list(model.scorer.classes).index(payload["sentiment"])
+        terms = model.scorer.top_terms(clean_text(text), class_index, EXPLANATION_TOP_TERMS)
+    
+    sentiment = payload["sentiment"]
+    summary = f"Classified as {sentiment} with {payload['confidence']*100:.1f}% confidence."
+    if terms:
+        listed = ', '.join(f'"{term}" ({weight:+.2f})' for term, weight in terms)
+        summary += f" Words pointing to {sentiment}: {listed}."
+    else:
+        summary += f" No words in the headline point strongly to {sentiment}."
+    if payload["stocks"]:
+        stock_names = ', '.join(f"{s['name']} ({s['symbol']})" for s in payload["stocks"])
+        summary += f" Mentions {stock_names}."
+    return summary, [{"term": term, "weight": round(weight, 4)} for term, weight in terms]
+
+async def explain_payload(text: str, payload, model, mode):
+    """Explanation fields to add to text's result for the given explanation mode
+    
+    text is the request's own text: a cached payload may have been scored for a
+    differently spelled headline with the same cleaned text.
+    """
+    if mode == "local":
+        explanation, terms = local_explanation(text, payload, model)
+        return {"explanation": explanation, "explanation_terms": terms, "explanation_mode": "local"}
+    if mode == "llm":
+        explanation = await generate_explanation(
+            text, payload["sentiment"], payload["confidence"], payload["stocks"]
+        )
+        if explanation:
+            return {"explanation": explanation, "explanation_mode": "llm"}
+    return {}
+
+async def score_uncached(texts: List[str], model, keys=None):
+    """Score texts as one matrix with model, detect stocks, and cache the prediction payloads
+
+    keys are the texts' near-duplicate index keys (see api/neardup.py), if already computed.
+    """
+    telemetry.observe("score_batch_size", len(texts))
+    cleaned, payloads, shard_timings = await inference_pool.score(texts, model)
+    startup.prediction_served()
+    for timings in shard_timings:
+        for stage, seconds in timings.items():
+            telemetry.observe("stage_duration_seconds", seconds, stage=stage)
+    
+    if keys is None:
+        keys = [None] * len(texts)
+    for text, cleaned_text, payload, text_keys in zip(texts, cleaned, payloads, keys):
+        # The text the payload was first scored for
+        payload["text"] = text
+        prediction_cache.set((model.version, cleaned_text), payload)
+        if near_duplicates is not None:
+            near_duplicates.add(cleaned_text, text_keys)
+        if payload["stocks"]:
+            ticker_aggregates.record(
+                [stock["symbol"] for stock in payload["stocks"]], payload["sentiment"], payload["confidence"]
+            )
+    return payloads
+
+def near_duplicate_payload(text: str, cleaned_text: str, model, keys=None):
+    """A payload for text reusing the prediction of a recently scored near duplicate, or None
+    
+    Only the sentiment and probabilities are reused, and only when the two texts
+    differ in words outside the model's vocabulary, so the model would score them
+    the same. Stocks are detected in text itself, and the result is cached and
+    counted in the ticker aggregates like a scored one.
+    """
+    match = near_duplicates.get(cleaned_text, keys)
+    if match is None:
         return None
+    cached = prediction_cache.get((model.version, match))
+    if cached is None or not model.scorer.same_features(match, cleaned_text):
+        return None
+    payload = {
+        "sentiment": cached["sentiment"],
+        "confidence": cached["confidence"],
+        "probabilities": dict(cached["probabilities"]),
+        "stocks": detect_stocks(text),
+        "text": text
+    }
+    prediction_cache.set((model.version, cleaned_text), payload)
+    if payload["stocks"]:
+        ticker_aggregates.record(
+            [stock["symbol"] for stock in payload["stocks"]], payload["sentiment"], payload["confidence"]
+        )
+    return payload
+
+async def score_texts(texts: List[str], model):
+    """Predict sentiment and detect stocks for each text, reusing cached payloads"""
+    cleaned = [clean_text(text) for text in texts]
+    payloads = [prediction_cache.get((model.version, cleaned_text)) for cleaned_text in cleaned]
+    
+    missing = [i for i, payload in enumerate(payloads) if payload is None]
+    keys = None
+    if missing and near_duplicates is not None:
+        key_rows, valid = await inference_pool.run(band_keys_many, [cleaned[i] for i in missing])
+        keys = [tuple(row.tolist()) if ok else None for row, ok in zip(key_rows, valid)]
+        for i, text_keys in zip(missing, keys):
+            payloads[i] = near_duplicate_payload(texts[i], cleaned[i], model, text_keys)
+        keys = [text_keys for i, text_keys in zip(missing, keys) if payloads[i] is None]
+        missing = [i for i in missing if payloads[i] is None]
+    
+    # Score only the texts that were not cached, as one matrix
+    if missing:
+        for i, payload in zip(missing, await score_uncached([texts[i] for i in missing], model, keys)):
+            payloads[i] = payload
+    
+    return payloads
+
+async def score_document(sentences: List[str], model):
+    """Payload for a document scored sentence by sentence (see api/documents.py)
+    
+    Not cached: the result depends on every sentence, and documents rarely repeat.
+    """
+    text = ' '.join(sentences)
+    with telemetry.time("stage_duration_seconds", stage="score_sentences"):
+        probabilities = await inference_pool.run(partial(score_sentences, model.scorer), sentences)
+    startup.prediction_served()
+    telemetry.observe("document_sentences", len(sentences))
+    payload = {
+        "sentiment": str(model.scorer.classes[probabilities.argmax()]),
+        "confidence": float(probabilities.max()),
+        "probabilities": {label: float(prob) for label, prob in zip(model.scorer.classes, probabilities)},
+        "stocks": detect_stocks(text),
+        "text": text
+    }
+    if payload["stocks"]:
+        ticker_aggregates.record(
+            [stock["symbol"] for stock in payload["stocks"]], payload["sentiment"], payload["confidence"]
+        )
+    return payload
+
+async def score_submitted(items):
+    """Score batched (text, model, near-duplicate keys) items, one matrix per model version"""
+    payloads = [None] * len(items)
+    by_model = {}
+    for i, (_, model, _) in enumerate(items):
+        by_model.setdefault(id(model), (model, []))[1].append(i)
+    for model, indices in by_model.values():
+        scored = await score_uncached(
+            [items[i][0] for i in indices], model, [items[i][2] for i in indices]
+        )
+        for i, payload in zip(indices, scored):
+            payloads[i] = payload
+    return payloads
+
+# Coalesce concurrent single-text /predict calls into one matrix inference
+# Set PREDICT_BATCH_WINDOW_MS=0 to score each request on its own
+PREDICT_BATCH_WINDOW_MS = float(os.getenv("PREDICT_BATCH_WINDOW_MS", "2"))
+predict_batcher = MicroBatcher(
+    score_submitted,
+    window=PREDICT_BATCH_WINDOW_MS / 1000,
+    max_batch_size=int(os.getenv("PREDICT_MAX_BATCH_SIZE", "64"))
+)
+
+async def build_batch_results(texts: List[str], model, explain: str = "none"):
+    """Score non-empty texts with model and build their batch result objects, in order
+    
+    explain is an explanation mode (see EXPLANATION_MODES).
+    """
+    results = []
+    explanation_tasks = []
+    
+    for text, payload in zip(texts, await score_texts(texts, model)):
+        prediction = payload["sentiment"]
+        confidence = payload["confidence"]
+        detected_stocks = payload["stocks"]
+        
+        # Explanations are requested concurrently once the whole batch is scored
+        if explain != "none":
+            explanation_tasks.append(explain_payload(text, payload, model, explain))
+        
+        result = {
+            "text": text,
+            "sentiment": prediction,
+            "confidence": confidence,
+            "probabilities": dict(payload["probabilities"])
+        }
+        
+        if detected_stocks:
+            result["stocks"] = detected_stocks
+            
+            # Add buy recommendation if sentiment is Buy
+            if prediction == "Buy":
+                result["buy_recommendation"] = {
+                    "recommended": True,
+                    "stocks": detected_stocks,
+                    "reason": f"Positive sentiment detected for {', '.join([s['symbol'] for s in detected_stocks])}"
+                }
+        
+        results.append(result)
+    
+    if explain != "none":
+        for result, fields in zip(results, await asyncio.gather(*explanation_tasks)):
+            result.update(fields)
+    
+    return results
 
 class TextInput(BaseModel):
     text: str
+    # Publisher of a long document, whose boilerplate sentences are filtered separately
+    source: Optional[str] = Field(None, max_length=128)
 
 class BatchInput(BaseModel):
     texts: List[str]
 
+class PageInput(BaseModel):
+    headlines: List[str]
+    # Identifies the client's page view; omitted on the first call, and a new one is returned
+    session: Optional[str] = Field(None, max_length=128)
+
 @app.post("/predict")
-async def predict(input: TextInput):
-    """Predict sentiment for given text"""
-    if model is None or vectorizer is None:
+async def predict(
+    input: TextInput,
+    explain: str = EXPLAIN_QUERY,
+    document: bool = False,
+    sentences: bool = False
+):
+    """Predict sentiment for given text
+    
+    explain picks how the prediction is explained: "llm" (Groq), "local" (the
+    model's top n-grams, no network call) or "none"; EXPLANATION_MODE by default.
+    
+    document=true treats the text as an article: boilerplate sentences of its
+    source are dropped and only the first DOCUMENT_MAX_TOKENS tokens are scored.
+    sentences=true (implies document) scores each sentence and averages them.
+    """
+    model = model_registry.active
+    if model is None:
         return {
-            "error": "Model not loaded. Please train the model first.",
+            "error": model_unavailable_message(),
             "sentiment": None,
             "confidence": 0
         }
     
-    cleaned = clean_text(input.text)
-    text_tfidf = vectorizer.transform([cleaned])
-    prediction = model.predict(text_tfidf)[0]
-    probabilities = model.predict_proba(text_tfidf)[0]
-    confidence = max(probabilities)
+    text = input.text
+    document_stats = None
+    if document or sentences:
+        with telemetry.time("stage_duration_seconds", stage="prepare_document"):
+            learn = BOILERPLATE_LEARN and boilerplate_filter.learns_separately(input.source)
+            kept, document_stats = prepare_document(
+                input.text, boilerplate_filter, input.source, DOCUMENT_MAX_TOKENS, learn=learn
+            )
+        text = ' '.join(kept)
     
-    # Detect stocks in the text FIRST (before generating explanation)
-    detected_stocks = detect_stocks(input.text)
+    if sentences:
+        payload = await score_document(kept, model)
+    else:
+        cleaned_text = clean_text(text)
+        payload = prediction_cache.get((model.version, cleaned_text))
+        keys = None
+        if payload is None and near_duplicates is not None:
+            keys = band_keys(cleaned_text)
+            payload = near_duplicate_payload(text, cleaned_text, model, keys)
+        if payload is None:
+            if PREDICT_BATCH_WINDOW_MS > 0:
+                payload = await predict_batcher.submit((text, model, keys))
+            else:
+                payload = (await score_uncached([text], model, [keys]))[0]
+    prediction = payload["sentiment"]
+    confidence = payload["confidence"]
+    detected_stocks = payload["stocks"]
     
-    # Generate explanation using Groq (if available) - now with stock information
-    explanation = await generate_explanation(input.text, prediction, confidence, detected_stocks)
+    explanation = await explain_payload(text, payload, model, explain or EXPLANATION_MODE)
     
     response = {
         "sentiment": prediction,
-        "confidence": float(confidence),
-        "probabilities": {
-            label: float(prob) 
-            for label, prob in zip(model.classes_, probabilities)
-        }
+        "confidence": confidence,
+        "probabilities": dict(payload["probabilities"]),
+        "model_version": model.version
     }
     
     if detected_stocks:
@@ -284,70 +754,289 @@ async def predict(input: TextInput):
                 "reason": f"Positive sentiment detected for {', '.join([s['symbol'] for s in detected_stocks])}. Consider buying these stocks."
             }
     
-    if explanation:
-        response["explanation"] = explanation
+    if document_stats is not None:
+        response["document"] = document_stats
+    
+    response.update(explanation)
     
     return response
 
+async def compact_batch(texts: List[str], model, explain: str, media_type: str):
+    """/predict/batch?format=compact: class labels and stocks in header tables, one row per text (see api/compact.py)"""
+    positions = [i for i, text in enumerate(texts) if text and text.strip()]
+    payloads = await score_texts([texts[i] for i in positions], model) if positions else []
+    explanations = None
+    if explain != "none":
+        explained = await asyncio.gather(*(
+            explain_payload(texts[i], payload, model, explain) for i, payload in zip(positions, payloads)
+        ))
+        explanations = [fields.get("explanation") for fields in explained]
+    body = compact_results(positions, payloads, model.scorer.classes, model.version, explanations)
+    with telemetry.time("stage_duration_seconds", stage="encode_compact"):
+        content = encode(body, media_type)
+    return Response(content, media_type=media_type)
+
 @app.post("/predict/batch")
-async def predict_batch(input: BatchInput):
-    """Predict sentiment for multiple texts at once"""
-    if model is None or vectorizer is None:
+async def predict_batch(
+    input: BatchInput,
+    request: Request,
+    explain: str = Query("none", pattern="^(local|llm|none)$"),
+    format: str = Query("full", pattern="^(full|compact)$")
+):
+    """Predict sentiment for multiple texts at once
+    
+    Explanations are skipped unless explain is "local" or "llm", since a batch
+    client rarely reads one per text.
+    
+    format=compact returns a smaller response for large batches, as msgpack if
+    the Accept header asks for it and as JSON otherwise.
+    """
+    model = model_registry.active
+    if model is None:
         return {
-            "error": "Model not loaded. Please train the model first.",
+            "error": model_unavailable_message(),
             "count": 0,
             "results": []
         }
     
-    results = []
+    if format == "compact":
+        media_type = negotiate(request.headers.get("accept"))
+        if media_type is None:
+            return JSONResponse(
+                status_code=406,
+                content={"error": f"Compact responses are available as {', '.join(media_types())}"}
+            )
+        return await compact_batch(input.texts, model, explain, media_type)
     
-    for text in input.texts:
-        if not text or not text.strip():
-            continue
-            
-        cleaned = clean_text(text)
-        text_tfidf = vectorizer.transform([cleaned])
-        prediction = model.predict(text_tfidf)[0]
-        probabilities = model.predict_proba(text_tfidf)[0]
-        confidence = max(probabilities)
-        
-        # Detect stocks in the text FIRST (before generating explanation)
-        detected_stocks = detect_stocks(text)
-        
-        # Generate explanation (optional - can skip for batch to speed up) - now with stock information
-        explanation = await generate_explanation(text, prediction, confidence, detected_stocks)
-        
-        result = {
-            "text": text,
-            "sentiment": prediction,
-            "confidence": float(confidence),
-            "probabilities": {
-                label: float(prob) 
-                for label, prob in zip(model.classes_, probabilities)
-            }
+    # Skip empty texts; the rest are scored together as one matrix
+    texts = [text for text in input.texts if text and text.strip()]
+    if not texts:
+        return {
+            "count": 0,
+            "results": []
         }
-        
-        if detected_stocks:
-            result["stocks"] = detected_stocks
-            
-            # Add buy recommendation if sentiment is Buy
-            if prediction == "Buy":
-                result["buy_recommendation"] = {
-                    "recommended": True,
-                    "stocks": detected_stocks,
-                    "reason": f"Positive sentiment detected for {', '.join([s['symbol'] for s in detected_stocks])}"
-                }
-        
-        if explanation:
-            result["explanation"] = explanation
-        
-        results.append(result)
+    
+    results = await build_batch_results(texts, model, explain=explain)
     
     return {
         "count": len(results),
+        "model_version": model.version,
         "results": results
     }
 
+# Headlines each /predict/page session has already been given, dropped after PAGE_SESSION_TTL idle seconds
+PAGE_MAX_HEADLINES = int(os.getenv("PAGE_MAX_HEADLINES", "1000"))
+PAGE_SESSION_MAX_HEADLINES = int(os.getenv("PAGE_SESSION_MAX_HEADLINES", "5000"))
+page_sessions = LRUCache(
+    max_entries=int(os.getenv("PAGE_SESSION_LIMIT", "10000")),
+    ttl=float(os.getenv("PAGE_SESSION_TTL", "1800"))
+)
+
+def page_key(text: str):
+    """Key a headline is matched by in a page session: a 64-bit hash of its cleaned text"""
+    digest = hashlib.blake2b(' '.join(clean_text(text).split()).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+@app.post("/predict/page")
+async def predict_page(input: PageInput, explain: str = Query("none", pattern="^(local|llm|none)$")):
+    """Score all candidate headlines of a page at once, returning only those new to the session
+    
+    Headlines are matched by their cleaned text, so one that was already returned
+    to the session (or appears twice in the request) is counted in already_seen
+    instead of being scored again. Each result carries the `key` of its cleaned
+    text, and `seen` lists the already-seen headlines with the key of the result
+    they share, so a client can match them up however their raw text differs.
+    The response carries the session to send next time.
+    """
+    model = model_registry.active
+    if model is None:
+        return {
+            "error": model_unavailable_message(),
+            "count": 0,
+            "results": []
+        }
+    if len(input.headlines) > PAGE_MAX_HEADLINES:
+        return JSONResponse(
+            status_code=400,
+            content={"error": f"At most {PAGE_MAX_HEADLINES} headlines per request"}
+        )
+    
+    session = input.session or secrets.token_urlsafe(16)
+    seen = page_sessions.get(session)
+    if seen is None:
+        seen = OrderedDict()
+    
+    texts, keys = [], []
+    seen_texts = []
+    for text in input.headlines:
+        if not text or not text.strip():
+            continue
+        key = page_key(text)
+        if key in seen:
+            seen_texts.append({"text": text, "key": f"{key:016x}"})
+            continue
+        seen[key] = None
+        texts.append(text)
+        keys.append(key)
+    
+    try:
+        results = await build_batch_results(texts, model, explain=explain) if texts else []
+    except BaseException:
+        # Not returned to the client, so not seen either
+        for key in keys:
+            seen.pop(key, None)
+        raise
+    while len(seen) > PAGE_SESSION_MAX_HEADLINES:
+        seen.popitem(last=False)
+    page_sessions.set(session, seen)
+    for result, key in zip(results, keys):
+        result["key"] = f"{key:016x}"
+    
+    return {
+        "session": session,
+        "count": len(results),
+        "already_seen": len(seen_texts),
+        "model_version": model.version,
+        "results": results,
+        "seen": seen_texts
+    }
+
+# Longest input line /predict/stream buffers before giving up on it
+STREAM_MAX_LINE_BYTES = int(os.getenv("STREAM_MAX_LINE_BYTES", str(64 * 1024)))
+
+def parse_stream_line(line: str):
+    """Return (text, id) for an NDJSON object, JSON string or plain text line
+    
+    A line that starts like JSON but does not parse ('"Big Short" investor ...')
+    is plain text.
+    """
+    stripped = line.strip()
+    if stripped.startswith('{') or stripped.startswith('"'):
+        try:
+            record = json.loads(stripped)
+        except ValueError:
+            return stripped, None
+        if isinstance(record, str):
+            return record, None
+        if isinstance(record, dict):
+            return record.get("text"), record.get("id")
+    return stripped, None
+
+async def iter_stream_lines(stream):
+    """Yield (line number, line) from a byte stream, buffering at most one line
+    
+    Lines longer than STREAM_MAX_LINE_BYTES bytes (UTF-8 encoded, as received)
+    are yielded as None and skipped.
+    """
+    # A newline byte never occurs inside a multi-byte UTF-8 character, so lines
+    # are split on bytes and decoded whole
+    buffer = b''
+    line_number = 0
+    skipping = False
+    async for data in stream:
+        buffer += data
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            if skipping:
+                # Rest of an oversized line
+                skipping = False
+                continue
+            line_number += 1
+            if len(line) > STREAM_MAX_LINE_BYTES:
+                yield line_number, None
+            else:
+                yield line_number, line.decode('utf-8', errors='replace')
+        if not skipping and len(buffer) > STREAM_MAX_LINE_BYTES:
+            line_number += 1
+            yield line_number, None
+            skipping = True
+        if skipping:
+            buffer = b''
+    if buffer.strip() and not skipping:
+        yield line_number + 1, buffer.decode('utf-8', errors='replace')
+
+class RequestStreamingResponse(StreamingResponse):
+    """StreamingResponse whose body generator reads the request body itself
+    
+    StreamingResponse normally listens on `receive` for a disconnect while it
+    streams, which would steal the request body chunks from the generator.
+    Here the generator is the only reader; request.stream() raises
+    ClientDisconnect if the client goes away.
+    """
+    
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+@app.post("/predict/stream")
+async def predict_stream(
+    request: Request,
+    chunk_size: int = Query(500, ge=1, le=10000),
+    explain: str = Query("none", pattern="^(local|llm|none|true|false)$")
+):
+    """Score newline-delimited input and stream NDJSON results as each chunk finishes
+    
+    Each input line is a JSON object with "text" (and an optional "id" that is
+    echoed back), a JSON string, or plain text. Input is read only as fast as
+    results are sent, so memory stays bounded on both sides. Explanations are
+    skipped unless explain is "local" or "llm" ("true" means "llm").
+    """
+    explain = {"true": "llm", "false": "none"}.get(explain, explain)
+    if model_registry.active is None:
+        return {
+            "error": model_unavailable_message(),
+            "count": 0,
+            "results": []
+        }
+    
+    async def score_chunk(chunk):
+        # Each chunk uses the model active when it is scored
+        model = model_registry.active
+        texts = [text for _, _, text, error in chunk if error is None]
+        results = iter(await build_batch_results(texts, model, explain=explain) if texts else [])
+        lines = []
+        # Error lines are written in input order, among the results of their chunk
+        for line_number, record_id, _, error in chunk:
+            if error is not None:
+                error_line = {"line": line_number, "error": error}
+                if record_id is not None:
+                    error_line["id"] = record_id
+                lines.append(json.dumps(error_line) + '\n')
+                continue
+            result = next(results)
+            result["line"] = line_number
+            result["model_version"] = model.version
+            if record_id is not None:
+                result["id"] = record_id
+            lines.append(json.dumps(result) + '\n')
+        return ''.join(lines)
+    
+    async def generate():
+        chunk = []
+        async for line_number, line in iter_stream_lines(request.stream()):
+            if line is None:
+                chunk.append((line_number, None, None, "Line too long"))
+            else:
+                text, record_id = parse_stream_line(line)
+                if text is None or (isinstance(text, str) and not text.strip()):
+                    # Skip empty lines, like /predict/batch skips empty texts, but a record with
+                    # an id gets an error line so the client can tell it was not scored
+                    if record_id is not None:
+                        chunk.append((line_number, record_id, None, "Missing text"))
+                    continue
+                if not isinstance(text, str):
+                    chunk.append((line_number, record_id, None, "text must be a string"))
+                    continue
+                chunk.append((line_number, record_id, text, None))
+            if len(chunk) >= chunk_size:
+                yield await score_chunk(chunk)
+                chunk = []
+        if chunk:
+            yield await score_chunk(chunk)
+    
+    return RequestStreamingResponse(generate(), media_type="application/x-ndjson")
+
 @app.get("/")
 def root():
     return {
@@ -356,37 +1045,218 @@ def root():
         "endpoints": {
             "predict": "/predict (POST)",
             "predict_batch": "/predict/batch (POST)",
+            "predict_stream": "/predict/stream (POST, NDJSON)",
+            "predict_page": "/predict/page (POST)",
             "metrics": "/metrics (GET)",
+            "prometheus": "/metrics/prometheus (GET)",
+            "cache_stats": "/cache/stats (GET)",
+            "batcher_stats": "/batcher/stats (GET)",
+            "ticker_sentiment": "/tickers/{symbol}/sentiment?window=1h (GET)",
+            "ticker_movers": "/tickers/movers?window=1h (GET)",
+            "models": "/models (GET)",
+            "reload_model": "/admin/reload (POST)",
             "health": "/health (GET)"
         }
     }
 
 @app.get("/health")
 def health():
+    model = model_registry.active
     return {
-        "status": "healthy",
-        "model_loaded": model is not None and vectorizer is not None
+        "status": "healthy" if startup.ready else "starting",
+        "ready": startup.ready,
+        "model_loaded": model is not None,
+        "model_version": model.version if model is not None else None,
+        "explanations": {
+            "enabled": groq_enabled,
+            "circuit": groq_breaker.stats()
+        },
+        "inference": inference_pool.stats(),
+        "startup": startup.stats(),
+        "capture": request_capture.stats()
     }
 
+@app.get("/cache/stats")
+def cache_stats():
+    """Get hit/miss/eviction counters for the response caches"""
+    return {
+        "predictions": prediction_cache.stats(),
+        "near_duplicates": near_duplicates.stats() if near_duplicates is not None else None,
+        "explanations": explanation_cache.stats(),
+        "page_sessions": page_sessions.stats(),
+        "boilerplate": {**boilerplate_filter.stats(), "learning": BOILERPLATE_LEARN}
+    }
+
+@app.get("/batcher/stats")
+def batcher_stats():
+    """Get queue depth, batch size and wait time metrics for /predict coalescing"""
+    return predict_batcher.stats()
+
+@app.get("/tickers/movers")
+def ticker_movers(
+    window: str = "1h",
+    limit: int = Query(10, ge=1, le=100),
+    min_headlines: int = Query(1, ge=1)
+):
+    """Get the tickers whose sentiment score changed most from the previous window to this one"""
+    try:
+        seconds = parse_window(window)
+        movers = ticker_aggregates.movers(seconds, limit=limit, min_headlines=min_headlines)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return {"window": window, "window_seconds": seconds, "movers": movers}
+
+@app.get("/tickers/{symbol}/sentiment")
+def ticker_sentiment(symbol: str, window: str = "1h"):
+    """Get headline counts, mean confidence and sentiment score for a ticker over a rolling window"""
+    try:
+        seconds = parse_window(window)
+        summary = ticker_aggregates.sentiment(symbol.upper(), seconds)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return {"symbol": symbol.upper(), "window": window, "window_seconds": seconds, **summary}
+
+@app.get("/models")
+def list_models():
+    """Get the active model version and the versions available to load"""
+    return model_registry.stats()
+
+def admin_error(request: Request):
+    """Return an error response if the caller may not use admin endpoints, else None"""
+    if ADMIN_TOKEN is not None:
+        if request.headers.get("x-admin-token") != ADMIN_TOKEN:
+            return JSONResponse(status_code=403, content={"error": "Invalid or missing X-Admin-Token header"})
+    elif request.client is None or request.client.host not in ("127.0.0.1", "::1", "localhost"):
+        return JSONResponse(status_code=403, content={"error": "Set ADMIN_TOKEN to use admin endpoints remotely"})
+    return None
+
+@app.post("/admin/reload")
+async def reload_model(request: Request, version: str = None):
+    """Load a model version (default: the one in model/LATEST) and swap it in
+    
+    Passing a version also points model/LATEST at it, e.g. to roll back.
+    The new version is loaded and warmed up in a worker thread while the
+    current one keeps serving; requests already running finish on it.
+    """
+    error = admin_error(request)
+    if error is not None:
+        return error
+    
+    previous = model_registry.active
+    try:
+        model = await asyncio.to_thread(model_registry.load, version)
+    except Exception as e:
+        return JSONResponse(status_code=400, content={
+            "error": f"Error loading model: {str(e)}",
+            "model_version": previous.version if previous is not None else None
+        })
+    # Point LATEST at an explicitly requested version, so the file watchers of
+    # other workers follow and this one does not switch back
+    if version is not None and read_latest(model_path) != model.version:
+        write_latest(model_path, model.version)
+    print(f"Model reloaded (version {model.version})")
+    return {
+        "status": "reloaded",
+        "previous_version": previous.version if previous is not None else None,
+        "model_version": model.version
+    }
+
+def cache_metrics(name, stats):
+    telemetry.set("cache_hits_total", stats["hits"], cache=name)
+    telemetry.set("cache_misses_total", stats["misses"], cache=name)
+    telemetry.set("cache_entries", stats["entries"], cache=name)
+    telemetry.set("cache_hit_ratio", stats["hit_rate"], cache=name)
+    if "evictions" in stats:
+        telemetry.set("cache_evictions_total", stats["evictions"], cache=name)
+
+@app.get("/metrics/prometheus")
+def prometheus_metrics():
+    """Get request, stage latency, batching, cache and Groq metrics in Prometheus text format"""
+    cache_metrics("predictions", prediction_cache.stats())
+    if near_duplicates is not None:
+        cache_metrics("near_duplicates", near_duplicates.stats())
+    explanation_stats = explanation_cache.stats()
+    cache_metrics("explanations_memory", explanation_stats["memory"])
+    if explanation_stats.get("disk"):
+        cache_metrics("explanations_disk", explanation_stats["disk"])
+
+    batcher = predict_batcher.stats()
+    telemetry.set("batcher_queue_depth", batcher["queue_depth"])
+    telemetry.set_histogram(
+        "batcher_batch_size", batcher["batch_size_histogram"]["buckets"],
+        batcher["batch_size_histogram"]["counts"], batcher["items"], batcher["batches"]
+    )
+    telemetry.set_histogram(
+        "batcher_wait_milliseconds", batcher["wait_ms_histogram"]["buckets"],
+        batcher["wait_ms_histogram"]["counts"], batcher["mean_wait_ms"] * batcher["items"], batcher["items"]
+    )
+
+    telemetry.set("groq_circuit_open", 0 if groq_breaker.stats()["state"] == "closed" else 1)
+    for phase, seconds in list(startup.phases.items()):
+        telemetry.set("startup_seconds", seconds, phase=phase)
+    model = model_registry.active
+    if model is not None:
+        telemetry.set("model_info", 1, version=model.version)
+
+    return PlainTextResponse(telemetry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.post("/admin/profiler/start")
+def start_profiler(
+    request: Request,
+    interval_ms: float = Query(5, ge=1, le=1000),
+    duration_s: float = Query(60, gt=0, le=3600)
+):
+    """Start sampling the stacks of all threads every interval_ms, for at most duration_s"""
+    error = admin_error(request)
+    if error is not None:
+        return error
+    if not profiler.start(interval=interval_ms / 1000, duration=duration_s):
+        return JSONResponse(status_code=409, content={"error": "The profiler is already running"})
+    return {"status": "started", "interval_ms": interval_ms, "duration_s": duration_s}
+
+@app.post("/admin/profiler/stop")
+def stop_profiler(request: Request):
+    """Stop the profiler and return a summary of the profile"""
+    error = admin_error(request)
+    if error is not None:
+        return error
+    profiler.stop()
+    return profiler.stats()
+
+@app.get("/admin/profiler")
+def get_profile(request: Request, format: str = Query("json", pattern="^(json|folded)$")):
+    """Get the current profile: a summary, or folded stacks for flame graph tools"""
+    error = admin_error(request)
+    if error is not None:
+        return error
+    if format == "folded":
+        return PlainTextResponse(profiler.folded())
+    return profiler.stats()
+
 @app.get("/metrics")
 def get_metrics():
     """Get model performance metrics from saved metrics file"""
-    if model is None or vectorizer is None:
+    model = model_registry.active
+    if model is None:
         return {
-            "error": "Model not loaded. Please train the model first.",
+            "error": model_unavailable_message(),
             "status": "error"
         }
     
     # Try to load metrics from JSON file
-    metrics_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'model', 'metrics.json')
+    metrics_path = os.path.join(model_path, 'metrics.json')
     
     try:
-        if os.path.exists(metrics_path):
+        # Prefer the metrics saved with the active version
+        metrics = model.metrics()
+        if metrics is None and os.path.exists(metrics_path):
             with open(metrics_path, 'r') as f:
                 metrics = json.load(f)
+        if metrics is not None:
             return {
                 "status": "success",
                 "source": "saved_file",
+                "model_version": model.version,
                 **metrics
             }
         else:
@@ -401,3 +1271,5 @@ def get_metrics():
             "status": "error"
         }
 
+# Everything above runs when the module is imported
+startup.record("import", startup.elapsed())
@@ -0,0 +1,238 @@
+"""
+Near-duplicate detection for cleaned headlines.
+
+Texts are compared by the Jaccard similarity of their word pairs. An added
+source name, a dropped word or different punctuation keeps a headline above
+the default 0.85, while a one-word edit inside a typical headline ("shares
+rise" / "shares fall") does not.
+
+To find candidates without comparing against every stored text, each text
+gets a MinHash signature of `bands * rows` values, and the index keeps one
+bucket per band of `rows` values (LSH). Two texts land in the same bucket
+of some band with probability 1 - (1 - J^rows)^bands: about 0.997 at
+J = 0.85 and 0.06 at J = 0.3 with the defaults. Candidates are confirmed
+with their exact Jaccard similarity.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+
+# Texts with fewer words are only matched exactly
+MIN_WORDS = 4
+BANDS = 8
+ROWS = 4
+
+# Fixed seed, so signatures are the same in every process and run
+_rng = np.random.default_rng(20240611)
+# Multiply-add-shift hash functions, one per signature value
+_MULTIPLIERS = _rng.integers(1, 2 ** 63, BANDS * ROWS, dtype=np.uint64) | np.uint64(1)
+_OFFSETS = _rng.integers(0, 2 ** 63, BANDS * ROWS, dtype=np.uint64)
+# Combine a band's values into one bucket key
+_BAND_MIXERS = _rng.integers(1, 2 ** 63, ROWS, dtype=np.uint64) | np.uint64(1)
+
+
+@lru_cache(maxsize=1 << 18)
+def _shingle_hash(shingle):
+    # 32 bits, stable across processes, unlike hash()
+    return int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=4).digest(), 'little')
+
+
+def _shingles(words):
+    """Word pairs (the word itself for one-word texts)"""
+    return {a + ' ' + b for a, b in zip(words, words[1:])} or set(words)
+
+
+def jaccard(a, b):
+    shingles_a, shingles_b = _shingles(a.split()), _shingles(b.split())
+    if not shingles_a and not shingles_b:
+        return 1.0
+    return len(shingles_a & shingles_b) / len(shingles_a | shingles_b)
+
+
+def _band_keys(signatures):
+    """(texts x BANDS) bucket keys from (texts x BANDS*ROWS) signatures"""
+    with np.errstate(over='ignore'):
+        return (signatures.reshape(-1, BANDS, ROWS) * _BAND_MIXERS).sum(axis=2, dtype=np.uint64)
+
+
+def _signatures(hashes):
+    """MinHash values of each shingle hash, (shingles x BANDS*ROWS)"""
+    with np.errstate(over='ignore'):
+        return (np.asarray(hashes, dtype=np.uint64)[:, np.newaxis] * _MULTIPLIERS + _OFFSETS) >> np.uint64(32)
+
+
+def band_keys(text):
+    """LSH bucket keys of a cleaned text, or None if it has fewer than MIN_WORDS words"""
+    words = text.split()
+    if len(words) < MIN_WORDS:
+        return None
+    signature = _signatures([_shingle_hash(s) for s in _shingles(words)]).min(axis=0)
+    return tuple(_band_keys(signature[np.newaxis])[0].tolist())
+
+
+def band_keys_many(texts, chunk_size=10000):
+    """band_keys of each text as a (texts x BANDS) array, and a mask of the texts long enough to have them"""
+    keys = np.zeros((len(texts), BANDS), dtype=np.uint64)
+    valid = np.zeros(len(texts), dtype=bool)
+    for start in range(0, len(texts), chunk_size):
+        rows, offsets, hashes = [], [], []
+        for i, text in enumerate(texts[start:start + chunk_size], start):
+            words = text.split()
+            if len(words) < MIN_WORDS:
+                continue
+            rows.append(i)
+            offsets.append(len(hashes))
+            hashes.extend(_shingle_hash(s) for s in _shingles(words))
+        if not rows:
+            continue
+        signatures = np.minimum.reduceat(_signatures(hashes), offsets, axis=0)
+        keys[rows] = _band_keys(signatures)
+        valid[rows] = True
+    return keys, valid
+
+
+class NearDuplicateIndex:
+    """Recently seen cleaned texts, found again by near-duplicate lookups.
+
+    Thread-safe. Holds at most `max_entries` texts and forgets texts added
+    more than `ttl` seconds ago; both drop the oldest entries first. `get()`
+    returns the stored text most similar to the query, if its word-pair
+    Jaccard similarity is at least `min_similarity`.
+    """
+
+    def __init__(self, max_entries=100000, ttl=None, min_similarity=0.85):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.min_similarity = min_similarity
+        # text -> (band keys, added_at), oldest first
+        self._entries = OrderedDict()
+        # One dict per band: bucket key -> text, or a list of texts if several share it
+        self._buckets = [{} for _ in range(BANDS)]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _remove_oldest(self):
+        text, (keys, _) = self._entries.popitem(last=False)
+        for buckets, key in zip(self._buckets, keys):
+            bucket = buckets[key]
+            if isinstance(bucket, str):
+                del buckets[key]
+                continue
+            bucket.remove(text)
+            if len(bucket) == 1:
+                buckets[key] = bucket[0]
+
+    def _expire(self):
+        if self.ttl is None:
+            return
+        cutoff = time.monotonic() - self.ttl
+        while self._entries and next(iter(self._entries.values()))[1] < cutoff:
+            self._remove_oldest()
+            self.expirations += 1
+
+    def _find(self, text, keys):
+        if text in self._entries:
+            return text
+        best, best_similarity = None, self.min_similarity
+        seen = set()
+        for buckets, key in zip(self._buckets, keys):
+            bucket = buckets.get(key, ())
+            for candidate in (bucket,) if isinstance(bucket, str) else bucket:
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                similarity = jaccard(candidate, text)
+                if similarity >= best_similarity:
+                    best, best_similarity = candidate, similarity
+        return best
+
+    def get(self, text, keys=None):
+        """The stored text most similar to text, or None if none is similar enough"""
+        if keys is None:
+            keys = band_keys(text)
+        if keys is None:
+            return None
+        with self._lock:
+            self._expire()
+            match = self._find(text, keys)
+            if match is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return match
+
+    def add(self, text, keys=None):
+        if keys is None:
+            keys = band_keys(text)
+        if keys is None:
+            return
+        with self._lock:
+            if text in self._entries:
+                self._entries[text] = (keys, time.monotonic())
+                self._entries.move_to_end(text)
+                return
+            self._entries[text] = (keys, time.monotonic())
+            for buckets, key in zip(self._buckets, keys):
+                # Most buckets hold a single text; only allocate a list when they do not
+                bucket = buckets.get(key)
+                if bucket is None:
+                    buckets[key] = text
+                elif isinstance(bucket, str):
+                    buckets[key] = [bucket, text]
+                else:
+                    bucket.append(text)
+            self._expire()
+            while self.max_entries is not None and len(self._entries) > self.max_entries:
+                self._remove_oldest()
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for buckets in self._buckets:
+                buckets.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "min_similarity": self.min_similarity
+        }
+
+
+def near_duplicate_mask(texts, min_similarity=0.85):
+    """Boolean mask keeping the first text of each group of near duplicates, in order"""
+    index = NearDuplicateIndex(max_entries=None, min_similarity=min_similarity)
+    keep = np.ones(len(texts), dtype=bool)
+    keys, valid = band_keys_many(texts)
+
+    # Near duplicates almost always share a bucket, so only texts sharing one need the index
+    candidates = np.zeros(len(texts), dtype=bool)
+    for band in range(BANDS):
+        _, inverse, counts = np.unique(keys[:, band], return_inverse=True, return_counts=True)
+        candidates |= counts[inverse] > 1
+    candidates &= valid
+
+    for i in np.flatnonzero(candidates):
+        row_keys = tuple(keys[i].tolist())
+        if index.get(texts[i], row_keys) is not None:
+            keep[i] = False
+        else:
+            index.add(texts[i], row_keys)
+    return keep
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import os
+import threading
+import time
+
+from api.artifacts import LATEST_FILE, load_artifact, read_latest
+from api.scorer import PROBE_TEXTS
+
+
+class LoadedModel:
+    """A loaded model version: its scorer plus what it was loaded from.
+
+    Never modified after loading. Requests take a reference to the active
+    LoadedModel once and use it until they finish, so a reload never changes
+    the model under a request that is already running.
+    """
+
+    def __init__(self, scorer, version, manifest=None, version_dir=None):
+        self.scorer = scorer
+        self.version = version
+        self.manifest = manifest or {}
+        self.version_dir = version_dir
+        self.loaded_at = time.time()
+
+    def metrics(self):
+        """Metrics saved with this version, or None"""
+        if self.version_dir is None:
+            return None
+        metrics_path = os.path.join(self.version_dir, 'metrics.json')
+        if not os.path.exists(metrics_path):
+            return None
+        with open(metrics_path) as f:
+            return json.load(f)
+
+    def info(self):
+        return {
+            "version": self.version,
+            "model_type": self.manifest.get("model_type", "sklearn_pickle"),
+            "created_at": self.manifest.get("created_at"),
+            "loaded_at": time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.loaded_at))
+        }
+
+
+class ModelRegistry:
+    """Versioned models in model/<version>/ with atomic in-process swaps.
+
+    `active` is replaced with a single assignment once the new version is
+    fully loaded and warmed up, so readers see either the old or the new
+    model, never a partial one. `fallback` is called to load a model when
+    no version has been exported yet; it returns (scorer, version).
+    """
+
+    def __init__(self, model_dir, fallback=None, on_swap=None):
+        self.model_dir = model_dir
+        self.fallback = fallback
+        self.on_swap = on_swap
+        self.active = None
+        self.reloads = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    def versions(self):
+        """Exported versions in model_dir, oldest first"""
+        try:
+            names = os.listdir(self.model_dir)
+        except FileNotFoundError:
+            return []
+        return sorted(
+            name for name in names
+            if os.path.isfile(os.path.join(self.model_dir, name, 'manifest.json'))
+        )
+
+    def _load(self, version):
+        if version is None:
+            version = read_latest(self.model_dir)
+        if version is None:
+            if self.fallback is None:
+                raise FileNotFoundError(f"No {LATEST_FILE} file in {self.model_dir}")
+            scorer, fallback_version = self.fallback()
+            return LoadedModel(scorer, fallback_version)
+
+        version_dir = os.path.join(self.model_dir, version)
+        if os.path.basename(os.path.normpath(version_dir)) != version or not os.path.isdir(version_dir):
+            raise FileNotFoundError(f"Unknown model version: {version}")
+        scorer, manifest = load_artifact(version_dir)
+        return LoadedModel(scorer, manifest.get('model_version', version), manifest, version_dir)
+
+    def load(self, version=None):
+        """Load version (default: the one in LATEST), warm it up and make it active
+
+        Returns the new LoadedModel. On failure the active model is kept and
+        the exception is raised.
+        """
+        with self._lock:
+            try:
+                model = self._load(version)
+                # Touch the memory-mapped arrays and code paths before serving traffic
+                model.scorer.predict_proba(PROBE_TEXTS)
+                model.scorer.predict_proba_one(PROBE_TEXTS[0])
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                raise
+            previous = self.active
+            self.active = model
+            if previous is not None:
+                self.reloads += 1
+            self.last_error = None
+        if self.on_swap is not None:
+            self.on_swap(previous, model)
+        return model
+
+    def latest_changed(self):
+        """Whether LATEST names a different version than the active one"""
+        latest = read_latest(self.model_dir)
+        return latest is not None and (self.active is None or latest != self.active.version)
+
+    async def watch(self, interval):
+        """Poll LATEST every `interval` seconds and load new versions in a worker thread"""
+        failed_version = None
+        while True:
+            await asyncio.sleep(interval)
+            latest = read_latest(self.model_dir)
+            # Retry a version that failed to load only once LATEST changes again
+            if latest == failed_version or not self.latest_changed():
+                continue
+            try:
+                model = await asyncio.to_thread(self.load, latest)
+                print(f"Model reloaded (version {model.version})")
+                failed_version = None
+            except Exception as e:
+                print(f"Model reload failed, keeping the active model: {e}")
+                failed_version = latest
+
+    def stats(self):
+        return {
+            "active": self.active.info() if self.active is not None else None,
+            "latest": read_latest(self.model_dir),
+            "available": self.versions(),
+            "reloads": self.reloads,
+            "last_error": self.last_error
+        }
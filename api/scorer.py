@@ -0,0 +1,326 @@
+import re
+
+import numpy as np
+
+# Headlines used to check the compiled scorer against the sklearn pipeline
+PROBE_TEXTS = [
+    "stock prices surge as company reports record profits",
+    "company faces regulatory investigation and potential fines",
+    "market remains stable with no significant changes expected",
+    "apple aapl shares fall after ceo resigns",
+    "",
+    "zzzz qqqq"
+]
+
+
+def rank_terms(grams, weights, log_prob, class_index, limit):
+    """(term, contribution) pairs of the features that most favour class_index, largest first.
+
+    A feature's contribution is its weight times the gap between its log
+    probability under class_index and under the strongest other class, i.e.
+    its share of the log-odds margin of that class over the runner-up.
+    Only features with a positive contribution are returned.
+    """
+    if len(grams) == 0 or log_prob.shape[1] < 2:
+        return []
+    others = np.delete(log_prob, class_index, axis=1).max(axis=1)
+    contributions = weights * (log_prob[:, class_index] - others)
+    order = np.argsort(-contributions, kind='stable')[:limit]
+    return [(grams[i], float(contributions[i])) for i in order if contributions[i] > 0]
+
+
+class SparseScorer:
+    """TF-IDF + Multinomial Naive Bayes inference on flat NumPy arrays.
+
+    Holds the vocabulary, the idf vector, the (features x classes)
+    log-probability matrix and the class log priors. Scoring a headline is
+    one tokenization pass plus a small matrix product, without going
+    through sklearn's transform and predict machinery.
+
+    The vocabulary is either a dict of term -> column, or `terms`: a sorted
+    bytes array of UTF-8 encoded terms where a term's position is its
+    column, with a dtype one byte wider than the longest term. The sorted
+    table can be memory-mapped straight from disk.
+    """
+
+    def __init__(self, idf, feature_log_prob, class_log_prior, classes, vocabulary=None,
+                 terms=None, ngram_range=(1, 1), token_pattern=r"(?u)\b\w\w+\b",
+                 lowercase=True, norm='l2', sublinear_tf=False):
+        if vocabulary is None and terms is None:
+            raise ValueError("Either vocabulary or terms is required")
+        self.vocabulary = vocabulary
+        self.terms = terms
+        self.idf = idf
+        # (features x classes), so a headline's rows can be gathered directly
+        self.feature_log_prob = feature_log_prob
+        self.class_log_prior = class_log_prior
+        self.classes = classes
+        self.ngram_range = tuple(ngram_range)
+        self.token_regex = re.compile(token_pattern)
+        self.lowercase = lowercase
+        self.norm = norm
+        self.sublinear_tf = sublinear_tf
+
+    @classmethod
+    def from_sklearn(cls, vectorizer, model):
+        """Compile a fitted TfidfVectorizer and MultinomialNB, or raise ValueError if unsupported"""
+        if type(model).__name__ != 'MultinomialNB':
+            raise ValueError(f"Unsupported model type: {type(model).__name__}")
+        params = vectorizer.get_params()
+        if params['analyzer'] != 'word' or params['preprocessor'] is not None \
+                or params['tokenizer'] is not None or params['stop_words'] is not None \
+                or params['strip_accents'] is not None or params['binary']:
+            raise ValueError("Unsupported vectorizer configuration")
+        if params['norm'] not in ('l1', 'l2', None):
+            raise ValueError(f"Unsupported norm: {params['norm']}")
+
+        n_features = len(vectorizer.vocabulary_)
+        idf = vectorizer.idf_ if params['use_idf'] else np.ones(n_features)
+        return cls(
+            idf=np.asarray(idf, dtype=np.float64),
+            feature_log_prob=np.ascontiguousarray(model.feature_log_prob_.T, dtype=np.float64),
+            class_log_prior=np.asarray(model.class_log_prior_, dtype=np.float64),
+            classes=np.asarray(model.classes_),
+            vocabulary=dict(vectorizer.vocabulary_),
+            ngram_range=params['ngram_range'],
+            token_pattern=params['token_pattern'],
+            lowercase=params['lowercase'],
+            norm=params['norm'],
+            sublinear_tf=params['sublinear_tf']
+        )
+
+    @property
+    def n_features(self):
+        return self.feature_log_prob.shape[0]
+
+    def _ngrams(self, text):
+        """Word n-grams of text, in the same order as sklearn's word analyzer"""
+        if self.lowercase:
+            text = text.lower()
+        tokens = self.token_regex.findall(text)
+        min_n, max_n = self.ngram_range
+        if max_n == 1:
+            return tokens
+        grams = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), max_n + 1):
+            grams.extend(' '.join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return grams
+
+    def _lookup_terms(self, grams):
+        """Columns of grams in the sorted terms table, and a mask of the grams that were found"""
+        # The table is one byte wider than its longest term, so a longer gram gets
+        # truncated to a key that cannot equal any term
+        keys = np.array([gram.encode('utf-8') for gram in grams], dtype=self.terms.dtype)
+        positions = np.searchsorted(self.terms, keys)
+        positions[positions == len(self.terms)] = 0
+        found = self.terms[positions] == keys
+        return positions, found
+
+    def _term_counts(self, text):
+        """Feature columns and term frequencies for the n-grams of text in the vocabulary"""
+        grams = self._ngrams(text)
+        if self.vocabulary is not None:
+            counts = {}
+            vocabulary = self.vocabulary
+            for gram in grams:
+                column = vocabulary.get(gram)
+                if column is not None:
+                    counts[column] = counts.get(column, 0) + 1
+            columns = np.fromiter(counts.keys(), dtype=np.intp, count=len(counts))
+            tf = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+            return columns, tf
+        positions, found = self._lookup_terms(grams)
+        columns, tf = np.unique(positions[found], return_counts=True)
+        return columns, tf.astype(np.float64)
+
+    def _batch_term_counts(self, texts):
+        """Document ids, feature columns and term frequencies for a list of texts"""
+        if self.vocabulary is not None:
+            doc_ids, columns, tf = [], [], []
+            for doc_id, text in enumerate(texts):
+                doc_columns, doc_tf = self._term_counts(text)
+                doc_ids.extend([doc_id] * len(doc_columns))
+                columns.extend(doc_columns)
+                tf.extend(doc_tf)
+            return (np.asarray(doc_ids, dtype=np.intp), np.asarray(columns, dtype=np.intp),
+                    np.asarray(tf, dtype=np.float64))
+
+        # One lookup for the whole batch, then count (document, column) pairs
+        grams, gram_docs = [], []
+        for doc_id, text in enumerate(texts):
+            doc_grams = self._ngrams(text)
+            grams.extend(doc_grams)
+            gram_docs.extend([doc_id] * len(doc_grams))
+        positions, found = self._lookup_terms(grams)
+        gram_docs = np.asarray(gram_docs, dtype=np.intp)
+        pairs = gram_docs[found] * self.n_features + positions[found]
+        pairs, tf = np.unique(pairs, return_counts=True)
+        return pairs // self.n_features, pairs % self.n_features, tf.astype(np.float64)
+
+    def _weights(self, columns, tf, doc_ids=None, n_docs=1):
+        """TF-IDF weights with per-document normalization"""
+        if self.sublinear_tf:
+            tf = np.log(tf) + 1
+        weights = tf * self.idf[columns]
+        if self.norm is not None:
+            values = weights * weights if self.norm == 'l2' else np.abs(weights)
+            if doc_ids is None:
+                totals = values.sum()
+            else:
+                totals = np.bincount(doc_ids, weights=values, minlength=n_docs)[doc_ids]
+            if self.norm == 'l2':
+                totals = np.sqrt(totals)
+            weights = weights / totals
+        return weights
+
+    def _proba(self, jll):
+        """Normalize joint log likelihoods into class probabilities"""
+        jll = jll - jll.max(axis=-1, keepdims=True)
+        proba = np.exp(jll)
+        return proba / proba.sum(axis=-1, keepdims=True)
+
+    def same_features(self, a, b):
+        """Whether two cleaned headlines have the same vocabulary n-gram counts, and so the same scores"""
+        columns_a, tf_a = self._term_counts(a)
+        columns_b, tf_b = self._term_counts(b)
+        order_a, order_b = np.argsort(columns_a), np.argsort(columns_b)
+        return np.array_equal(columns_a[order_a], columns_b[order_b]) and np.array_equal(tf_a[order_a], tf_b[order_b])
+
+    def top_terms(self, text, class_index, limit=5):
+        """The n-grams of a cleaned headline that most favour class_index (see rank_terms)"""
+        grams = self._ngrams(text)
+        if not grams:
+            return []
+        if self.vocabulary is not None:
+            vocabulary = self.vocabulary
+            positions = np.fromiter((vocabulary.get(gram, -1) for gram in grams), dtype=np.intp, count=len(grams))
+            found = positions >= 0
+        else:
+            positions, found = self._lookup_terms(grams)
+        grams = [gram for gram, ok in zip(grams, found) if ok]
+        columns, first, tf = np.unique(positions[found], return_index=True, return_counts=True)
+        if len(columns) == 0:
+            return []
+        weights = self._weights(columns, tf.astype(np.float64))
+        return rank_terms([grams[i] for i in first], weights, self.feature_log_prob[columns], class_index, limit)
+
+    def predict_proba_one(self, text):
+        """Class probabilities for a single cleaned headline"""
+        columns, tf = self._term_counts(text)
+        if len(columns) == 0:
+            return self._proba(np.array(self.class_log_prior))
+        weights = self._weights(columns, tf)
+        return self._proba(self.class_log_prior + weights @ self.feature_log_prob[columns])
+
+    def transform(self, texts):
+        """Weighted features of cleaned headlines, as (doc_ids, columns, weights, n_docs)"""
+        n_docs = len(texts)
+        if n_docs == 1:
+            columns, tf = self._term_counts(texts[0])
+            doc_ids = np.zeros(len(columns), dtype=np.intp)
+        else:
+            doc_ids, columns, tf = self._batch_term_counts(texts)
+        if len(columns) == 0:
+            return doc_ids, columns, tf, n_docs
+        # A single document is normalized as a whole, without the bincount
+        weights = self._weights(columns, tf, doc_ids if n_docs > 1 else None, n_docs)
+        return doc_ids, columns, weights, n_docs
+
+    def predict_proba_transformed(self, features):
+        """Class probabilities, as an (n x classes) array, for the output of transform()"""
+        doc_ids, columns, weights, n_docs = features
+        jll = np.tile(self.class_log_prior, (n_docs, 1))
+        if n_docs == 1:
+            if len(columns):
+                jll[0] += weights @ self.feature_log_prob[columns]
+        elif len(columns):
+            contributions = weights[:, np.newaxis] * self.feature_log_prob[columns]
+            for k in range(jll.shape[1]):
+                jll[:, k] += np.bincount(doc_ids, weights=contributions[:, k], minlength=n_docs)
+        return self._proba(jll)
+
+    def predict_proba(self, texts):
+        """Class probabilities for a list of cleaned headlines, as an (n x classes) array"""
+        return self.predict_proba_transformed(self.transform(texts))
+
+    def max_abs_error(self, vectorizer, model, texts=PROBE_TEXTS):
+        """Largest probability difference against the sklearn pipeline on texts"""
+        expected = model.predict_proba(vectorizer.transform(texts))
+        single = np.vstack([self.predict_proba_one(text) for text in texts])
+        batch = self.predict_proba(texts)
+        return float(max(np.abs(single - expected).max(), np.abs(batch - expected).max()))
+
+
+class HashedScorer(SparseScorer):
+    """Multinomial Naive Bayes over hashed n-gram counts.
+
+    Columns come from hashing each n-gram with MurmurHash3, exactly like
+    sklearn's HashingVectorizer with alternate_sign=False, so there is no
+    vocabulary to store and new terms never change the feature space.
+    This is the model written by online training (see online_training.py).
+    """
+
+    def __init__(self, feature_log_prob, class_log_prior, classes, ngram_range=(1, 1),
+                 token_pattern=r"(?u)\b\w\w+\b", lowercase=True, norm=None):
+        from sklearn.utils import murmurhash3_32
+
+        self._murmurhash = murmurhash3_32
+        self.vocabulary = None
+        self.terms = None
+        self.idf = np.ones(feature_log_prob.shape[0])
+        self.feature_log_prob = feature_log_prob
+        self.class_log_prior = class_log_prior
+        self.classes = classes
+        self.ngram_range = tuple(ngram_range)
+        self.token_regex = re.compile(token_pattern)
+        self.lowercase = lowercase
+        self.norm = norm
+        self.sublinear_tf = False
+
+    def _lookup_terms(self, grams):
+        """Hashed columns of grams; every gram has one"""
+        murmurhash = self._murmurhash
+        hashes = np.fromiter((murmurhash(gram, positive=False) for gram in grams),
+                             dtype=np.int64, count=len(grams))
+        positions = np.abs(hashes) % self.n_features
+        return positions, np.ones(len(grams), dtype=bool)
+
+
+class SklearnScorer:
+    """Fallback scorer that runs the pickled sklearn vectorizer and model directly"""
+
+    def __init__(self, vectorizer, model):
+        self.vectorizer = vectorizer
+        self.model = model
+        self.classes = model.classes_
+
+    def predict_proba_one(self, text):
+        return self.model.predict_proba(self.vectorizer.transform([text]))[0]
+
+    def transform(self, texts):
+        return self.vectorizer.transform(texts)
+
+    def predict_proba_transformed(self, features):
+        return self.model.predict_proba(features)
+
+    def predict_proba(self, texts):
+        return self.model.predict_proba(self.vectorizer.transform(texts))
+
+    def same_features(self, a, b):
+        features = self.vectorizer.transform([a, b]).tocsr()
+        return (features[0] != features[1]).nnz == 0
+
+    def top_terms(self, text, class_index, limit=5):
+        if not hasattr(self.model, 'feature_log_prob_') or not hasattr(self.vectorizer, 'vocabulary_'):
+            return []
+        features = self.vectorizer.transform([text]).tocsr()
+        if features.nnz == 0:
+            return []
+        names = {}
+        for gram in self.vectorizer.build_analyzer()(text):
+            names.setdefault(self.vectorizer.vocabulary_.get(gram), gram)
+        columns = features.indices
+        return rank_terms(
+            [names[column] for column in columns], features.data,
+            self.model.feature_log_prob_[:, columns].T, class_index, limit
+        )
@@ -0,0 +1,60 @@
+"""
+Startup phase timing and readiness for the API process.
+
+The clock starts when api/main.py begins importing, so "import" covers the
+framework and library imports, and every later phase (model, tickers, ...)
+is measured from the lifespan hook that runs it. Readiness is set once the
+model and tickers are loaded, which may happen in the background while the
+server already answers /health.
+"""
+import time
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    """Seconds spent in each startup phase, readiness, and the time to the first prediction"""
+
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self.phases = {}
+        self.ready = False
+        self.ready_after = None
+        self.first_prediction_after = None
+        self.error = None
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def record(self, name, seconds):
+        self.phases[name] = seconds
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - started
+
+    def summary(self):
+        return ', '.join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.phases.items())
+
+    def mark_ready(self):
+        self.ready = True
+        self.ready_after = self.elapsed()
+        print(f"Startup: ready after {self.ready_after:.2f}s ({self.summary()})")
+
+    def prediction_served(self):
+        """Record the first prediction; later calls do nothing"""
+        if self.first_prediction_after is None:
+            self.first_prediction_after = self.elapsed()
+            print(f"Startup: first prediction {self.first_prediction_after:.2f}s after import")
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "ready_after_s": self.ready_after,
+            "first_prediction_after_s": self.first_prediction_after,
+            "phases_s": dict(self.phases),
+            "error": self.error
+        }
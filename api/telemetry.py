@@ -0,0 +1,241 @@
+"""
+Lightweight request and stage metrics, exported in Prometheus text format,
+plus a sampling profiler that can be switched on at runtime.
+
+Metrics are plain counters, gauges and fixed-bucket histograms updated from
+the event loop; recording one is a dict lookup and a few additions.
+"""
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Seconds, from 50us (one headline through the scorer) up to slow Groq calls
+LATENCY_BUCKETS = [0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Timer:
+    """Context manager that observes its elapsed seconds in a histogram"""
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Telemetry:
+    """Named counters, gauges and histograms with labels.
+
+    Metrics are declared once with `describe()`; samples are keyed by their
+    sorted label pairs. `render()` returns the Prometheus text exposition.
+    """
+
+    def __init__(self, prefix=''):
+        self.prefix = prefix
+        self._metrics = {}
+
+    def describe(self, name, kind, help_text, buckets=None):
+        self._metrics[name] = {"kind": kind, "help": help_text, "buckets": buckets, "samples": {}}
+
+    def _samples(self, name):
+        return self._metrics[name]["samples"]
+
+    def inc(self, name, amount=1, **labels):
+        samples = self._samples(name)
+        key = tuple(sorted(labels.items()))
+        samples[key] = samples.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        self._samples(name)[tuple(sorted(labels.items()))] = value
+
+    def histogram(self, name, **labels):
+        """The histogram for name and labels, created on first use"""
+        metric = self._metrics[name]
+        key = tuple(sorted(labels.items()))
+        histogram = metric["samples"].get(key)
+        if histogram is None:
+            histogram = metric["samples"][key] = Histogram(metric["buckets"] or LATENCY_BUCKETS)
+        return histogram
+
+    def observe(self, name, value, **labels):
+        self.histogram(name, **labels).observe(value)
+
+    def time(self, name, **labels):
+        """`with telemetry.time(name, **labels):` observes the block's duration in seconds"""
+        return Timer(self.histogram(name, **labels))
+
+    def set_histogram(self, name, buckets, counts, total, count, **labels):
+        """Replace a histogram with counts kept elsewhere (one per bucket, plus overflow)"""
+        histogram = Histogram(buckets)
+        histogram.counts = list(counts)
+        histogram.sum = total
+        histogram.count = count
+        self._samples(name)[tuple(sorted(labels.items()))] = histogram
+
+    def render(self):
+        lines = []
+        for name, metric in self._metrics.items():
+            full_name = self.prefix + name
+            lines.append(f"# HELP {full_name} {metric['help']}")
+            lines.append(f"# TYPE {full_name} {metric['kind']}")
+            for labels, value in list(metric["samples"].items()):
+                if metric["kind"] != "histogram":
+                    lines.append(f"{full_name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(value.buckets + [float('inf')], value.counts):
+                    cumulative += count
+                    bucket_labels = _format_labels(labels, ('le', _format_value(bound)))
+                    lines.append(f"{full_name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{full_name}_sum{_format_labels(labels)} {_format_value(float(value.sum))}")
+                lines.append(f"{full_name}_count{_format_labels(labels)} {value.count}")
+        return '\n'.join(lines) + '\n'
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware counting HTTP requests by route and status, with an in-flight gauge and durations"""
+
+    def __init__(self, app, telemetry):
+        self.app = app
+        self.telemetry = telemetry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        telemetry = self.telemetry
+        telemetry.inc("http_requests_in_flight", 1)
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Label by route template (set during routing), not the raw path, to bound cardinality
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            telemetry.inc("http_requests_in_flight", -1)
+            telemetry.inc("http_requests_total", method=scope["method"], route=route, status=str(status["code"]))
+            telemetry.observe("http_request_duration_seconds", time.perf_counter() - started, route=route)
+
+
+class SamplingProfiler:
+    """Periodically samples the stacks of all threads into folded-stack counts.
+
+    Output is in the "folded" format (`frame;frame;frame count` per line)
+    read by flamegraph.pl and speedscope. Sampling runs in a background
+    thread and stops by itself after `duration` seconds.
+    """
+
+    def __init__(self):
+        self.samples = Counter()
+        self.sample_count = 0
+        self.interval = None
+        self.started_at = None
+        self.stopped_at = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=0.005, duration=60):
+        """Start a new profile; returns False if one is already running"""
+        if self.running:
+            return False
+        self.samples = Counter()
+        self.sample_count = 0
+        self.interval = interval
+        self.started_at = time.time()
+        self.stopped_at = None
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(duration,), name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        if self.running:
+            self._stop.set()
+            self._thread.join()
+
+    def _run(self, duration):
+        own_id = threading.get_ident()
+        names = {}
+        deadline = time.perf_counter() + duration
+        while not self._stop.wait(self.interval) and time.perf_counter() < deadline:
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < 128:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[';'.join(reversed(stack))] += 1
+            self.sample_count += 1
+        self.stopped_at = time.time()
+
+    def folded(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def stats(self, top=20):
+        """Profile status and the functions most often on top of a stack"""
+        leaves = Counter()
+        for stack, count in list(self.samples.items()):
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        end = self.stopped_at or time.time()
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000 if self.interval else None,
+            "duration_s": end - self.started_at if self.started_at else 0.0,
+            "samples": self.sample_count,
+            "top_functions": [{"frame": frame, "samples": count} for frame, count in leaves.most_common(top)]
+        }
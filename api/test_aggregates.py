@@ -0,0 +1,76 @@
+import random
+import time
+
+import pytest
+
+from api.aggregates import TickerAggregates, parse_window
+
+# Records older than a tier's span, measured from the real clock, are dropped
+NOW = time.time()
+
+
+@pytest.fixture(scope='module')
+def records():
+    rng = random.Random(7)
+    symbols = [f"S{i}" for i in range(300)]
+    return [
+        (rng.sample(symbols, rng.randint(1, 3)), rng.choice(['Buy', 'Hold', 'Sell']),
+         rng.random(), NOW - rng.uniform(0, 3 * 86400))
+        for _ in range(5000)
+    ]
+
+
+def reference_counts(records, symbol, start, end):
+    counts = {'Buy': 0, 'Hold': 0, 'Sell': 0}
+    for symbols, sentiment, _, timestamp in records:
+        if symbol in symbols and start < timestamp <= end:
+            counts[sentiment] += 1
+    return counts
+
+
+def bucket_start(now, seconds, resolution):
+    """Start of the whole buckets a window of seconds ending at now covers"""
+    newest = int(now // resolution)
+    return (newest - -(-seconds // resolution) + 1) * resolution
+
+
+def test_window_counts_match_records(records):
+    aggregates = TickerAggregates()
+    for symbols, sentiment, confidence, timestamp in records:
+        aggregates.record(symbols, sentiment, confidence, timestamp)
+    for window, resolution in (("15m", 60), ("6h", 60), ("2d", 3600)):
+        seconds = parse_window(window)
+        start = bucket_start(NOW, seconds, resolution) - 1e-9
+        for symbol in ("S0", "S17", "S299"):
+            summary = aggregates.sentiment(symbol, seconds, now=NOW)
+            assert summary["counts"] == reference_counts(records, symbol, start, NOW)
+
+
+def test_movers_agree_with_sentiment(records):
+    aggregates = TickerAggregates()
+    for symbols, sentiment, confidence, timestamp in records:
+        aggregates.record(symbols, sentiment, confidence, timestamp)
+    movers = aggregates.movers(3600 * 6, limit=300, now=NOW)
+    assert movers
+    for mover in movers[:20]:
+        summary = aggregates.sentiment(mover["symbol"], 3600 * 6, now=NOW)
+        assert mover["headlines"] == summary["headlines"]
+        assert mover["score"] == pytest.approx(summary["score"])
+
+
+def test_old_buckets_are_reused():
+    aggregates = TickerAggregates(tiers=((60, 10),))
+    aggregates.record(["AAPL"], "Buy", 0.9, timestamp=NOW - 30)
+    assert aggregates.sentiment("AAPL", 600, now=NOW - 1)["headlines"] == 1
+    # Ten minutes later the same slot holds a new bucket
+    aggregates.record(["MSFT"], "Sell", 0.8, timestamp=NOW + 570)
+    assert aggregates.sentiment("AAPL", 600, now=NOW + 571)["headlines"] == 0
+    assert aggregates.sentiment("MSFT", 600, now=NOW + 571)["headlines"] == 1
+
+
+def test_memory_follows_symbols_recorded():
+    aggregates = TickerAggregates()
+    for i in range(10000):
+        aggregates.record([f"T{i}"], "Hold", 0.5, timestamp=NOW - i % 60)
+    # A dense ring per symbol would take ~500 MB here
+    assert aggregates.stats()["bytes"] < 20 * 1024 * 1024
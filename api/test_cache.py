@@ -0,0 +1,47 @@
+import asyncio
+
+from api.cache import ExplanationCache
+
+
+def test_disk_store_opens_on_open(tmp_path):
+    path = tmp_path / "explanations.sqlite3"
+    cache = ExplanationCache(path=str(path))
+    assert not path.exists()
+    cache.set("a", "memory only")
+    cache.open()
+    cache.set("b", "on disk")
+    assert cache.stats()["disk"]["entries"] == 1
+    cache.close()
+
+
+def test_disk_store_drops_oldest_rows(tmp_path):
+    path = str(tmp_path / "explanations.sqlite3")
+    cache = ExplanationCache(path=path, max_entries=1, max_disk_entries=2)
+    cache.open()
+    for key in "abc":
+        cache.set(key, f"explanation {key}")
+    disk = cache.stats()["disk"]
+    assert disk["entries"] == 2 and disk["evictions"] == 1
+    cache.close()
+
+    reopened = ExplanationCache(path=path, max_disk_entries=2)
+    reopened.open()
+    assert reopened.get("a") is None
+    assert reopened.get("b") == "explanation b"
+    assert reopened.get("c") == "explanation c"
+    reopened.close()
+
+
+def test_async_lookups_reach_disk(tmp_path):
+    path = str(tmp_path / "explanations.sqlite3")
+    cache = ExplanationCache(path=path)
+    cache.open()
+
+    async def roundtrip():
+        await cache.aset("a", "explanation a")
+        cache.memory.clear()
+        return await cache.aget("a")
+
+    assert asyncio.run(roundtrip()) == "explanation a"
+    assert cache.stats()["disk"]["hits"] == 1
+    cache.close()
@@ -0,0 +1,73 @@
+import glob
+import json
+import os
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.capture import CaptureMiddleware, RequestCapture
+
+
+def read_entries(directory):
+    entries = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.jsonl'))):
+        with open(path) as f:
+            entries.extend(json.loads(line) for line in f)
+    return entries
+
+
+def make_app(capture, paths=('/predict',)):
+    app = FastAPI()
+    app.add_middleware(CaptureMiddleware, capture=capture, paths=paths)
+
+    @app.post("/predict")
+    async def predict(body: dict):
+        return {"echo": body}
+
+    @app.get("/health")
+    def health():
+        return {"status": "healthy"}
+
+    return app
+
+
+def test_captures_body_status_and_timings(tmp_path):
+    capture = RequestCapture(str(tmp_path))
+    with TestClient(make_app(capture)) as client:
+        client.post("/predict?explain=none", json={"text": "Apple shares rise"})
+        client.get("/health")
+    capture.close()
+    [entry] = read_entries(str(tmp_path))
+    assert entry["path"] == "/predict" and entry["query"] == "explain=none"
+    assert json.loads(entry["body"]) == {"text": "Apple shares rise"}
+    assert entry["status"] == 200 and not entry["body_truncated"]
+    assert entry["duration_ms"] >= entry["first_byte_ms"] >= 0
+    assert entry["sample_rate"] == 1.0
+    assert capture.stats()["written"] == 1
+
+
+def test_long_bodies_are_truncated(tmp_path):
+    capture = RequestCapture(str(tmp_path), max_body_bytes=16)
+    with TestClient(make_app(capture)) as client:
+        client.post("/predict", json={"text": "x" * 100})
+    capture.close()
+    [entry] = read_entries(str(tmp_path))
+    assert entry["body_truncated"] and len(entry["body"]) == 16
+
+
+def test_rotation_keeps_newest_files(tmp_path):
+    capture = RequestCapture(str(tmp_path), max_bytes=1, max_files=2)
+    for i in range(5):
+        capture.record({"ts": i})
+        capture.close()
+    files = glob.glob(os.path.join(str(tmp_path), '*.jsonl'))
+    assert len(files) == 2
+    assert sorted(entry["ts"] for entry in read_entries(str(tmp_path))) == [3, 4]
+
+
+def test_disabled_capture_records_nothing(tmp_path):
+    capture = RequestCapture(str(tmp_path), sample_rate=0)
+    with TestClient(make_app(capture)) as client:
+        client.post("/predict", json={"text": "Apple shares rise"})
+    assert capture.stats()["captured"] == 0
+    assert glob.glob(os.path.join(str(tmp_path), '*.jsonl')) == []
@@ -0,0 +1,51 @@
+import json
+
+import numpy as np
+import pytest
+
+import api.compact as compact
+
+CLASSES = np.array(['Buy', 'Hold', 'Sell'])
+APPLE = {"symbol": "AAPL", "name": "Apple Inc.", "exchange": "NASDAQ", "sector": "Technology"}
+PAYLOADS = [
+    {"sentiment": "Sell", "probabilities": {"Buy": 0.2, "Hold": 0.2, "Sell": 0.6}, "stocks": [APPLE]},
+    {"sentiment": "Buy", "probabilities": {"Buy": 0.5, "Hold": 0.3, "Sell": 0.2}, "stocks": [APPLE]}
+]
+
+
+def test_compact_results_layout():
+    body = compact.compact_results([0, 2], PAYLOADS, CLASSES, 'v1', explanations=['x', None])
+    assert body["classes"] == ['Buy', 'Hold', 'Sell']
+    assert body["stocks"] == [APPLE]
+    assert [row[0] for row in body["rows"]] == [0, 2]
+    assert [row[1] for row in body["rows"]] == [2, 0]
+    assert [row[3] for row in body["rows"]] == [[0], [0]]
+    assert body["explanations"] == ['x', None]
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_json_encoding_round_trips(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(compact, 'orjson', None)
+    elif compact.orjson is None:
+        pytest.skip("orjson is not installed")
+    body = compact.compact_results([0, 2], PAYLOADS, CLASSES, 'v1')
+    decoded = json.loads(compact.encode(body, compact.JSON_TYPE))
+    assert decoded["rows"][0][2] == pytest.approx([0.2, 0.2, 0.6], abs=1e-7)
+    assert decoded["count"] == 2
+
+
+def test_msgpack_encoding_round_trips():
+    msgpack = pytest.importorskip("msgpack")
+    body = compact.compact_results([0], PAYLOADS[:1], CLASSES, 'v1')
+    decoded = msgpack.unpackb(compact.encode(body, compact.MSGPACK_TYPES[0]))
+    assert decoded["rows"][0][2] == pytest.approx([0.2, 0.2, 0.6], abs=1e-7)
+
+
+def test_negotiate(monkeypatch):
+    assert compact.negotiate(None) == compact.JSON_TYPE
+    assert compact.negotiate('application/json') == compact.JSON_TYPE
+    assert compact.negotiate('text/html') is None
+    monkeypatch.setattr(compact, 'msgpack', None)
+    assert compact.negotiate('application/msgpack') is None
+    assert compact.negotiate('application/msgpack, */*;q=0.1') == compact.JSON_TYPE
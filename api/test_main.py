@@ -0,0 +1,200 @@
+"""API behaviour that spans several modules, through the app with the bundled model"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.circuit_breaker import CircuitBreaker
+from api.documents import sentence_fingerprint
+from api.text import clean_text
+
+# Long enough that a one-word edit stays above the 0.85 word-pair similarity
+HEADLINE = ("Tesla shares rise after the electric carmaker reports record quarterly deliveries, "
+            "raises its full year outlook and says new factories in Texas and Berlin are ahead of plan")
+
+
+@pytest.fixture(scope='module')
+def main():
+    # The app reads its settings on import: keep the explanation cache in memory and skip the model watcher.
+    # The variables are restored afterwards, so other test modules do not see them.
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("EXPLANATION_CACHE_PATH", "")
+        patch.setenv("MODEL_WATCH_INTERVAL", "0")
+        patch.setenv("AGGREGATE_HISTORY_DIR", "")
+        from api import main
+        yield main
+
+
+@pytest.fixture(scope='module')
+def client(main):
+    with TestClient(main.app) as client:
+        yield client
+
+
+def predict(client, text):
+    response = client.post("/predict?explain=none", json={"text": text})
+    assert response.status_code == 200
+    return response.json()
+
+
+def direct_probabilities(main, text):
+    scorer = main.model_registry.active.scorer
+    probabilities = scorer.predict_proba([clean_text(text)])[0]
+    return {str(label): float(prob) for label, prob in zip(scorer.classes, probabilities)}
+
+
+@pytest.mark.parametrize("variant", [
+    HEADLINE.replace("rise", "plunge"),
+    HEADLINE.replace("Tesla shares", "Apple (AAPL) shares")
+])
+def test_near_duplicate_with_changed_vocabulary_word_is_scored(client, main, variant):
+    predict(client, HEADLINE)
+    result = predict(client, variant)
+    assert result["probabilities"] == pytest.approx(direct_probabilities(main, variant), abs=1e-12)
+    if "AAPL" in variant:
+        assert [stock["symbol"] for stock in result["stocks"]] == ["AAPL"]
+
+
+def test_near_duplicate_reuse_uses_its_own_text(client, main):
+    predict(client, HEADLINE)
+    # "automaker" and "carmaker" are both outside the vocabulary, so the features are identical
+    variant = HEADLINE.replace("carmaker", "automaker")
+    assert main.model_registry.active.scorer.same_features(clean_text(HEADLINE), clean_text(variant))
+    hits = main.near_duplicates.hits
+    before = main.ticker_aggregates.sentiment("TSLA", 3600)["headlines"]
+
+    result = predict(client, variant)
+    assert main.near_duplicates.hits == hits + 1
+    assert result["probabilities"] == pytest.approx(direct_probabilities(main, variant), abs=1e-12)
+    assert [stock["symbol"] for stock in result["stocks"]] == ["TSLA"]
+    assert main.prediction_cache.get((main.model_registry.active.version, clean_text(variant)))["text"] == variant
+    assert main.ticker_aggregates.sentiment("TSLA", 3600)["headlines"] == before + 1
+
+
+def test_cached_prediction_is_explained_with_request_text(client, main, monkeypatch):
+    prompted = []
+
+    async def generate_explanation(text, sentiment, confidence, detected_stocks=None):
+        prompted.append(text)
+        return "explained"
+
+    monkeypatch.setattr(main, "generate_explanation", generate_explanation)
+    first = "Nvidia beats earnings estimates"
+    second = "NVIDIA beats earnings estimates!"
+    for text in (first, second):
+        response = client.post("/predict?explain=llm", json={"text": text})
+        assert response.json()["explanation"] == "explained"
+    assert prompted == [first, second]
+
+
+def test_cancelled_half_open_trial_is_released(main, monkeypatch):
+    started = asyncio.Event()
+
+    async def create(**kwargs):
+        started.set()
+        await asyncio.sleep(60)
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    breaker.opened_at -= 61
+    monkeypatch.setattr(main, "get_groq_client", lambda: client)
+    monkeypatch.setattr(main, "groq_breaker", breaker)
+
+    async def cancel_trial():
+        task = asyncio.create_task(main.generate_explanation("Cancelled trial headline", "Buy", 0.9))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_trial())
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+
+
+def test_waiting_for_a_groq_slot_is_bounded(main, monkeypatch):
+    async def create(**kwargs):
+        raise AssertionError("no slot was free")
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    monkeypatch.setattr(main, "get_groq_client", lambda: client)
+    monkeypatch.setattr(main, "groq_breaker", breaker)
+    monkeypatch.setattr(main, "GROQ_TIMEOUT", 0.01)
+
+    async def explain_without_slot():
+        monkeypatch.setattr(main, "groq_semaphore", asyncio.Semaphore(0))
+        return await main.generate_explanation("Headline waiting for a slot", "Buy", 0.9)
+
+    assert asyncio.run(explain_without_slot()) is None
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_requests_do_not_teach_the_boilerplate_filter(client, main):
+    article = ("Shares of the company rose sharply in early trading today. "
+               "This sentence is repeated by a client in every single request.")
+    for _ in range(main.boilerplate_filter.min_documents + 1):
+        response = client.post("/predict?explain=none&document=true", json={"text": article, "source": "wire"})
+        assert response.json()["document"]["boilerplate_sentences"] == 0
+    assert not main.boilerplate_filter.is_boilerplate("wire", sentence_fingerprint(article.split(". ")[1]))
+
+
+def test_stream_keeps_error_lines_in_order(client, main, monkeypatch):
+    # 30 three-byte characters: 30 characters but 90 bytes
+    monkeypatch.setattr(main, "STREAM_MAX_LINE_BYTES", 64)
+    body = '\n'.join([
+        '{"text": "Apple shares rise", "id": "a"}',
+        '{"id": 7}',
+        '"' + '€' * 30 + '"',
+        '"Big Short" investor bets against Tesla',
+        '',
+        '{"text": 5, "id": 8}',
+        'Microsoft raises its dividend'
+    ]).encode('utf-8')
+    response = client.post("/predict/stream?chunk_size=2", content=body)
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["line"] for line in lines] == [1, 2, 3, 4, 6, 7]
+    assert lines[0]["id"] == "a" and "sentiment" in lines[0]
+    assert lines[1] == {"line": 2, "id": 7, "error": "Missing text"}
+    assert lines[2]["error"] == "Line too long"
+    # Starts like JSON but is plain text
+    assert lines[3]["text"] == '"Big Short" investor bets against Tesla' and "sentiment" in lines[3]
+    assert lines[4] == {"line": 6, "id": 8, "error": "text must be a string"}
+    assert "sentiment" in lines[5]
+
+
+def test_stream_lines_split_across_reads(main, monkeypatch):
+    monkeypatch.setattr(main, "STREAM_MAX_LINE_BYTES", 8)
+    # "€" * 4 is 4 characters but 12 bytes
+    encoded = ("é1\n" + "€" * 4 + "\nok\nlast").encode('utf-8')
+
+    async def stream():
+        # One byte at a time splits every multi-byte character
+        for i in range(len(encoded)):
+            yield encoded[i:i + 1]
+
+    async def collect():
+        return [item async for item in main.iter_stream_lines(stream())]
+
+    assert asyncio.run(collect()) == [(1, "é1"), (2, None), (3, "ok"), (4, "last")]
+
+
+def test_batch_explains_only_when_asked(client):
+    texts = ["Nvidia beats revenue estimates", "Oil prices slide on demand worries"]
+    results = client.post("/predict/batch", json={"texts": texts}).json()["results"]
+    assert all("explanation" not in result for result in results)
+    results = client.post("/predict/batch?explain=local", json={"texts": texts}).json()["results"]
+    assert all(result["explanation"] for result in results)
+
+
+def test_page_reports_which_result_a_seen_headline_shares(client):
+    first = client.post("/predict/page", json={"headlines": ["Apple shares rise", "apple shares rise!"]}).json()
+    assert first["already_seen"] == 1 and len(first["results"]) == 1
+    [result] = first["results"]
+    assert first["seen"] == [{"text": "apple shares rise!", "key": result["key"]}]
+
+    later = client.post("/predict/page", json={"headlines": ["APPLE shares rise"], "session": first["session"]}).json()
+    assert later["results"] == [] and later["seen"] == [{"text": "APPLE shares rise", "key": result["key"]}]
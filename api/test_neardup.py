@@ -0,0 +1,44 @@
+import numpy as np
+
+from api.neardup import NearDuplicateIndex, band_keys, band_keys_many, jaccard, near_duplicate_mask
+from api.text import clean_text
+
+HEADLINE = clean_text("Tesla shares rise after record quarterly deliveries beat estimates")
+SYNDICATED = clean_text("Tesla shares rise after record quarterly deliveries beat estimates - Reuters")
+EDITED = clean_text("Tesla shares fall after record quarterly deliveries miss estimates")
+
+
+def test_syndicated_copy_is_found():
+    index = NearDuplicateIndex()
+    index.add(HEADLINE)
+    assert jaccard(HEADLINE, SYNDICATED) >= index.min_similarity
+    assert index.get(SYNDICATED) == HEADLINE
+    assert index.get(EDITED) is None
+
+
+def test_band_keys_many_matches_band_keys():
+    texts = [HEADLINE, SYNDICATED, EDITED, "too short"]
+    keys, valid = band_keys_many(texts)
+    for text, row, ok in zip(texts, keys, valid):
+        expected = band_keys(text)
+        assert ok == (expected is not None)
+        if ok:
+            assert tuple(row.tolist()) == expected
+
+
+def test_eviction_and_expiry():
+    index = NearDuplicateIndex(max_entries=1)
+    index.add(HEADLINE)
+    index.add(EDITED)
+    assert len(index) == 1 and index.evictions == 1
+    assert index.get(HEADLINE) is None
+
+    expiring = NearDuplicateIndex(ttl=0)
+    expiring.add(HEADLINE)
+    assert expiring.get(HEADLINE) is None
+
+
+def test_near_duplicate_mask_keeps_first_of_each_group():
+    texts = [HEADLINE, EDITED, SYNDICATED, HEADLINE]
+    assert near_duplicate_mask(texts).tolist() == [True, True, False, False]
+    assert near_duplicate_mask([]).dtype == np.bool_
@@ -0,0 +1,69 @@
+import os
+import pickle
+
+import pytest
+
+from api.artifacts import export_artifact, prune_versions, read_latest, write_latest
+from api.registry import ModelRegistry
+from api.scorer import SklearnScorer
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'model')
+
+
+@pytest.fixture(scope='module')
+def pipeline():
+    with open(os.path.join(MODEL_DIR, 'vectorizer.pkl'), 'rb') as f:
+        vectorizer = pickle.load(f)
+    with open(os.path.join(MODEL_DIR, 'model.pkl'), 'rb') as f:
+        model = pickle.load(f)
+    return vectorizer, model
+
+
+def test_swap_to_new_version(pipeline, tmp_path):
+    model_dir = str(tmp_path)
+    export_artifact(*pipeline, model_dir, version='v1')
+    swaps = []
+    registry = ModelRegistry(model_dir, on_swap=lambda previous, model: swaps.append((previous, model)))
+    first = registry.load()
+    assert first.version == 'v1' and registry.active is first
+
+    export_artifact(*pipeline, model_dir, version='v2')
+    assert registry.latest_changed()
+    second = registry.load()
+    assert registry.active is second and second.version == 'v2'
+    assert registry.reloads == 1
+    assert swaps == [(None, first), (first, second)]
+    # A request that took the first model keeps a working scorer
+    assert first.scorer.predict_proba(["shares rise"]).shape == (1, len(first.scorer.classes))
+
+
+def test_failed_load_keeps_active_model(pipeline, tmp_path):
+    model_dir = str(tmp_path)
+    export_artifact(*pipeline, model_dir, version='v1')
+    registry = ModelRegistry(model_dir)
+    active = registry.load()
+    os.makedirs(os.path.join(model_dir, 'broken'))
+    write_latest(model_dir, 'broken')
+    with pytest.raises(FileNotFoundError):
+        registry.load()
+    assert registry.active is active
+    assert registry.last_error is not None
+    assert read_latest(model_dir) == 'broken'
+
+
+def test_fallback_without_latest(pipeline, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        ModelRegistry(str(tmp_path)).load()
+    registry = ModelRegistry(str(tmp_path), fallback=lambda: (SklearnScorer(*pipeline), 'pickled'))
+    assert registry.load().version == 'pickled'
+
+
+def test_prune_keeps_newest_and_latest(pipeline, tmp_path):
+    model_dir = str(tmp_path)
+    for age, version in enumerate(['v4', 'v3', 'v2', 'v1']):
+        export_artifact(*pipeline, model_dir, version=version, make_latest=False)
+        manifest = os.path.join(model_dir, version, 'manifest.json')
+        os.utime(manifest, (1e9 - age, 1e9 - age))
+    write_latest(model_dir, 'v1')
+    assert sorted(prune_versions(model_dir, 2)) == ['v2']
+    assert sorted(name for name in os.listdir(model_dir) if name != 'LATEST') == ['v1', 'v3', 'v4']
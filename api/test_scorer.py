@@ -0,0 +1,63 @@
+"""SparseScorer and the exported artifact against the sklearn pipeline they replace"""
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.artifacts import export_artifact, load_artifact
+from api.scorer import SklearnScorer, SparseScorer
+from api.text import clean_text
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_DIR = os.path.join(ROOT, 'model')
+CORPORA = [os.path.join(ROOT, 'data', 'train1.csv'), os.path.join(ROOT, 'data', 'cleaned_output1.csv')]
+
+
+@pytest.fixture(scope='module')
+def pipeline():
+    with open(os.path.join(MODEL_DIR, 'vectorizer.pkl'), 'rb') as f:
+        vectorizer = pickle.load(f)
+    with open(os.path.join(MODEL_DIR, 'model.pkl'), 'rb') as f:
+        model = pickle.load(f)
+    return vectorizer, model
+
+
+@pytest.fixture(scope='module')
+def headlines():
+    texts = pd.concat([pd.read_csv(path)['text'] for path in CORPORA]).dropna().astype(str)
+    return [clean_text(text) for text in texts] + ['', 'zzzz qqqq']
+
+
+@pytest.fixture(scope='module')
+def expected(pipeline, headlines):
+    vectorizer, model = pipeline
+    return model.predict_proba(vectorizer.transform(headlines))
+
+
+def test_sparse_scorer_matches_sklearn(pipeline, headlines, expected):
+    scorer = SparseScorer.from_sklearn(*pipeline)
+    assert np.abs(scorer.predict_proba(headlines) - expected).max() < 1e-9
+    single = np.vstack([scorer.predict_proba_one(text) for text in headlines[:2000]])
+    assert np.abs(single - expected[:2000]).max() < 1e-9
+
+
+def test_exported_artifact_matches_sklearn(pipeline, headlines, expected, tmp_path):
+    version_dir = export_artifact(*pipeline, str(tmp_path), version='test', make_latest=False)
+    scorer, manifest = load_artifact(version_dir)
+    assert manifest['model_version'] == 'test'
+    assert isinstance(scorer.terms, np.memmap)
+    assert np.abs(scorer.predict_proba(headlines) - expected).max() < 1e-9
+    assert list(scorer.classes) == list(pipeline[1].classes_)
+
+
+def test_top_terms_match_sklearn_scorer(pipeline, headlines):
+    compiled = SparseScorer.from_sklearn(*pipeline)
+    fallback = SklearnScorer(*pipeline)
+    for text in headlines[:200]:
+        for class_index in range(len(compiled.classes)):
+            ours = compiled.top_terms(text, class_index, 5)
+            theirs = fallback.top_terms(text, class_index, 5)
+            assert [term for term, _ in ours] == [term for term, _ in theirs]
+            assert np.allclose([weight for _, weight in ours], [weight for _, weight in theirs])
@@ -0,0 +1,87 @@
+"""TickerIndex against the original per-row detect_stocks implementation"""
+import glob
+import os
+import re
+
+import pandas as pd
+import pytest
+
+from api.inference import load_ticker_index
+from api.tickers import COMMON_WORDS, STOCK_CONTEXT_WORDS, STOCK_KEYWORDS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TICKERS_PATH = os.path.join(ROOT, 'data', 'tickers', 'tickers.csv')
+
+
+def reference_detect(text, rows):
+    """The detect_stocks the API used before TickerIndex, returning symbols in order"""
+    symbols = {row['symbol'] for row in rows}
+    text_upper = text.upper()
+    text_lower = text.lower()
+    found = []
+
+    for ticker in re.findall(r'\(([A-Z]{2,5})\)', text_upper):
+        if ticker in symbols and ticker not in found:
+            found.append(ticker)
+
+    for ticker in re.findall(r'\b([A-Z]{2,5})\b', text_upper):
+        if ticker in found or ticker in COMMON_WORDS or ticker not in symbols:
+            continue
+        ticker_pos = text_upper.find(ticker)
+        context = text_upper[max(0, ticker_pos - 20):ticker_pos + len(ticker) + 20]
+        if any(keyword in context for keyword in STOCK_KEYWORDS):
+            found.append(ticker)
+
+    for row in rows:
+        if row['symbol'] in found:
+            continue
+        company_lower = row['name'].lower()
+        if company_lower in text_lower:
+            found.append(row['symbol'])
+            continue
+        name_parts = company_lower.split()
+        base_name = name_parts[0].rstrip('.,!?;:') if name_parts else ''
+        if len(base_name) >= 4 and re.search(r'\b' + re.escape(base_name) + r'\b', text_lower):
+            base_name_pos = text_lower.find(base_name)
+            context = text_lower[max(0, base_name_pos - 50):base_name_pos + len(base_name) + 50]
+            if any(word in context for word in STOCK_CONTEXT_WORDS):
+                found.append(row['symbol'])
+    return found
+
+
+@pytest.fixture(scope='module')
+def texts():
+    frames = [pd.read_csv(os.path.join(ROOT, 'data', name))['text'] for name in ('train1.csv', 'cleaned_output1.csv')]
+    for path in glob.glob(os.path.join(ROOT, 'data', 'collected', '*.csv')):
+        collected = pd.read_csv(path)
+        frames.append(collected['title'] + '. ' + collected['content'].fillna(''))
+    return pd.concat(frames).dropna().astype(str).tolist() + [
+        "Apple (AAPL) shares rise after earnings",
+        "Pineapple prices rise at the market",
+        "TSLA stock falls; Tesla CEO says demand is strong",
+        "MSFT and GOOGL lead trading as the market rallies",
+        "The apple harvest was good this year"
+    ]
+
+
+def test_ticker_index_matches_reference(texts):
+    rows = pd.read_csv(TICKERS_PATH).to_dict('records')
+    index = load_ticker_index(TICKERS_PATH)
+    mismatches = [
+        text for text in texts
+        if [stock['symbol'] for stock in index.detect(text)] != reference_detect(text, rows)
+    ]
+    assert mismatches == []
+
+
+def test_detected_stock_fields():
+    index = load_ticker_index(TICKERS_PATH)
+    [stock] = index.detect("Apple (AAPL) shares rise after earnings")
+    assert stock['symbol'] == 'AAPL'
+    assert set(stock) == {'symbol', 'name', 'exchange', 'sector'}
+
+
+def test_missing_tickers_file_gives_empty_index(tmp_path):
+    index = load_ticker_index(str(tmp_path / 'missing.csv'))
+    assert len(index) == 0
+    assert index.detect("Apple (AAPL) shares rise") == []
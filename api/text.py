@@ -0,0 +1,26 @@
+"""
+Text cleaning shared by training, offline scoring and the API.
+
+Everything that turns a headline into model input goes through here, so the
+model always sees text cleaned the same way it was trained on.
+"""
+import re
+
+# Bump when the cleaning changes, so cached cleaned corpora are rebuilt
+CLEANING_VERSION = 1
+
+# Characters removed by cleaning: anything but ASCII letters, digits and whitespace.
+# Whitespace is spelled out as the characters Python's \s matches, because pandas
+# may run the pattern with pyarrow's RE2, where \s only covers ASCII whitespace.
+WHITESPACE = '\t\n\x0b\x0c\r\x1c-\x1f \x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000'
+STRIP_PATTERN = re.compile(f'[^a-zA-Z0-9{WHITESPACE}]')
+
+
+def clean_text(text):
+    """Clean input text: lowercase and remove punctuation"""
+    return STRIP_PATTERN.sub('', str(text).lower())
+
+
+def clean_series(texts):
+    """clean_text for a whole pandas Series, using vectorized string operations"""
+    return texts.map(str).str.lower().str.replace(STRIP_PATTERN.pattern, '', regex=True)
@@ -0,0 +1,200 @@
+import re
+
+# Words that look like tickers in upper-cased text but almost never are
+COMMON_WORDS = {
+    'THE', 'AND', 'FOR', 'ARE', 'BUT', 'NOT', 'YOU', 'ALL', 'CAN', 'HER', 'WAS', 'ONE', 'OUR', 'OUT',
+    'DAY', 'GET', 'HAS', 'HIM', 'HIS', 'HOW', 'ITS', 'MAY', 'NEW', 'NOW', 'OLD', 'SEE', 'TWO', 'WHO',
+    'WAY', 'USE', 'MAN', 'YEAR', 'YOUR', 'FROM', 'THAT', 'WITH', 'THIS', 'THEY', 'HAVE', 'WILL', 'WHAT',
+    'WHEN', 'WHERE', 'WHICH', 'THERE', 'THESE', 'THEIR', 'WOULD', 'COULD', 'SHOULD', 'INTO', 'UPON',
+    'OVER', 'UNDER', 'ABOUT', 'AFTER', 'BEFORE', 'BETWEEN', 'DURING', 'SINCE', 'UNTIL', 'WHILE',
+    'THROUGH', 'AGAINST', 'AMONG', 'THROUGHOUT', 'DESPITE', 'TOWARD', 'TOWARDS'
+}
+
+# Keywords that must appear near a standalone ticker (upper-cased text)
+STOCK_KEYWORDS = ['STOCK', 'SHARES', 'EQUITY', 'TRADING', 'MARKET', 'PRICE', 'SHARE', 'EQUITIES']
+
+# Keywords that must appear near a base company name (lower-cased text)
+STOCK_CONTEXT_WORDS = [
+    'stock', 'stocks', 'shares', 'equity', 'equities', 'trading', 'market',
+    'price', 'share', 'company', 'corporation', 'inc', 'corp', 'ltd',
+    'earnings', 'revenue', 'profit', 'quarter', 'financial', 'investor',
+    'ceo', 'executive', 'leadership', 'shake-up', 'shakeup', 'departure',
+    'departures', 'exit', 'exits', 'resign', 'resigns', 'resignation',
+    'board', 'director', 'officer', 'management', 'business', 'firm'
+]
+
+PARENTHESES_PATTERN = re.compile(r'\(([A-Z]{2,5})\)')
+STANDALONE_PATTERN = re.compile(r'\b([A-Z]{2,5})\b')
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+def _is_word_boundary(text, pos):
+    """Same rule as regex \\b: a word character on exactly one side of pos"""
+    before = pos > 0 and _is_word_char(text[pos - 1])
+    after = pos < len(text) and _is_word_char(text[pos])
+    return before != after
+
+
+def _build_trie_regex(words):
+    """Compile words into one regex that finds the longest word starting at each position.
+
+    The words are merged into a trie and emitted as nested groups, so the
+    regex engine walks the trie instead of trying every word in turn.
+    The match is wrapped in a lookahead so overlapping occurrences are found.
+    """
+    trie = {}
+    for word in words:
+        if not word:
+            continue
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def to_regex(node):
+        branches = [re.escape(char) + to_regex(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            # Prefer continuing down the trie so the longest word wins
+            return '(?:' + body + ')?'
+        return body
+
+    return re.compile('(?=(' + to_regex(trie) + '))')
+
+
+class TickerIndex:
+    """Precompiled lookup tables for detecting stocks in text.
+
+    Built once from the ticker rows (dicts with symbol, name, exchange and
+    optionally sector). Detection makes one pass over the text per rule:
+    dictionary lookups for ticker symbols, and a single trie regex that
+    finds every full and base company name occurrence at once.
+    """
+
+    def __init__(self, rows):
+        self.rows = []
+        self.symbols = {}
+        # name pattern -> list of (row index, is_full_name)
+        self.name_patterns = {}
+
+        for row in rows:
+            stock = {
+                'symbol': row['symbol'],
+                'name': row['name'],
+                'exchange': row['exchange'],
+                'sector': row.get('sector', 'N/A')
+            }
+            row_index = len(self.rows)
+            self.rows.append(stock)
+            # Keep the first row per symbol, like a lookup by symbol would
+            self.symbols.setdefault(stock['symbol'], stock)
+
+            company_lower = stock['name'].lower()
+            self.name_patterns.setdefault(company_lower, []).append((row_index, True))
+
+            # Base company name (first word, if it's substantial), e.g. "apple" from "apple inc."
+            name_parts = company_lower.split()
+            if name_parts:
+                base_name = name_parts[0].rstrip('.,!?;:')
+                if len(base_name) >= 4:
+                    self.name_patterns.setdefault(base_name, []).append((row_index, False))
+
+        # Every pattern that matches at a position is a prefix of the longest one there
+        self.prefixes = {}
+        for pattern in self.name_patterns:
+            self.prefixes[pattern] = [
+                pattern[:end] for end in range(1, len(pattern))
+                if pattern[:end] in self.name_patterns
+            ]
+
+        self.name_regex = _build_trie_regex(self.name_patterns) if self.name_patterns else None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _scan_names(self, text_lower):
+        """Find the first occurrence of each name pattern and whether any occurrence is a whole word"""
+        first_pos = {}
+        whole_word = set()
+        for match in self.name_regex.finditer(text_lower):
+            pos = match.start()
+            longest = match.group(1)
+            for pattern in [longest] + self.prefixes[longest]:
+                if pattern not in first_pos:
+                    first_pos[pattern] = pos
+                if pattern not in whole_word and _is_word_boundary(text_lower, pos) \
+                        and _is_word_boundary(text_lower, pos + len(pattern)):
+                    whole_word.add(pattern)
+        return first_pos, whole_word
+
+    def detect(self, text):
+        """Detect stock tickers and company names in text"""
+        if not self.rows:
+            return []
+
+        detected_stocks = []
+        text_upper = text.upper()
+        text_lower = text.lower()
+        found_tickers = set()
+
+        # Pattern 1: Tickers in parentheses: (AAPL), (TSLA)
+        for ticker in PARENTHESES_PATTERN.findall(text_upper):
+            stock = self.symbols.get(ticker)
+            if stock is not None and ticker not in found_tickers:
+                found_tickers.add(ticker)
+                detected_stocks.append(dict(stock))
+
+        # Pattern 2: Standalone tickers, only if near stock-related keywords
+        for ticker in STANDALONE_PATTERN.findall(text_upper):
+            if ticker in found_tickers or ticker in COMMON_WORDS:
+                continue
+            stock = self.symbols.get(ticker)
+            if stock is None:
+                continue
+            # Check if ticker appears near stock-related keywords (within 20 characters)
+            ticker_pos = text_upper.find(ticker)
+            context = text_upper[max(0, ticker_pos - 20):ticker_pos + len(ticker) + 20]
+            if any(keyword in context for keyword in STOCK_KEYWORDS):
+                detected_stocks.append(dict(stock))
+                found_tickers.add(ticker)
+
+        # Pattern 3: Company names (e.g., "Apple" -> AAPL), in ticker list order
+        if self.name_regex is None:
+            return detected_stocks
+        first_pos, whole_word = self._scan_names(text_lower)
+        candidates = {}
+        for pattern in first_pos:
+            for row_index, is_full_name in self.name_patterns[pattern]:
+                candidates.setdefault(row_index, []).append((is_full_name, pattern))
+
+        base_name_in_context = {}
+        for row_index in sorted(candidates):
+            stock = self.rows[row_index]
+            if stock['symbol'] in found_tickers:
+                continue
+            matches = candidates[row_index]
+
+            # Full company name anywhere in the text
+            if any(is_full_name for is_full_name, _ in matches):
+                detected_stocks.append(dict(stock))
+                found_tickers.add(stock['symbol'])
+                continue
+
+            # Base name as a whole word, with stock-related words around its first occurrence
+            base_name = matches[0][1]
+            if base_name not in whole_word:
+                continue
+            if base_name not in base_name_in_context:
+                base_name_pos = first_pos[base_name]
+                context = text_lower[max(0, base_name_pos - 50):base_name_pos + len(base_name) + 50]
+                base_name_in_context[base_name] = any(word in context for word in STOCK_CONTEXT_WORDS)
+            if base_name_in_context[base_name]:
+                detected_stocks.append(dict(stock))
+                found_tickers.add(stock['symbol'])
+
+        return detected_stocks
@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the inference API and training
+
+Suites:
+    micro   clean_text, detect_stocks and vectorize+predict at several text
+            lengths and ticker-universe sizes
+    api     /predict and /predict/batch latency percentiles and throughput
+            through an in-process ASGI client, with Groq replaced by a local
+            stub server that adds --groq-delay-ms of latency, plus response
+            bytes and encode time of a 1000-text batch in the full and
+            compact formats
+    load    model load time and peak RSS in a fresh process
+    train   train.py wall time and peak RSS on synthetic corpora
+
+Results are written as JSON. With --baseline, they are compared against a
+stored results file and the run fails if any metric regressed by more than
+--threshold.
+
+Usage:
+    python benchmark.py --output benchmark_results.json
+    python benchmark.py --suites micro,api --quick --baseline benchmark_baseline.json
+    python benchmark.py --results benchmark_results.json --baseline benchmark_baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SUITES = ['micro', 'api', 'load', 'train']
+SAMPLE_DATA = os.path.join(ROOT, 'data', 'train1.csv')
+TICKERS_PATH = os.path.join(ROOT, 'data', 'tickers', 'tickers.csv')
+MODEL_DIR = os.path.join(ROOT, 'model')
+
+TEXT_LENGTHS = [80, 400, 2000]
+UNIVERSE_SIZES = [34, 1000, 10000]
+TRAIN_SIZES = [10000, 100000, 1000000]
+
+
+def metric(results, name, value, unit, better='lower'):
+    results[name] = {"value": float(value), "unit": unit, "better": better}
+
+
+def percentiles(results, prefix, seconds):
+    milliseconds = np.asarray(seconds) * 1000
+    for p in (50, 95, 99):
+        metric(results, f"{prefix}.p{p}_ms", np.percentile(milliseconds, p), "ms")
+
+
+def peak_rss_mb(usage):
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def time_per_call(fn, arg, min_time=0.1, repeats=5):
+    """Median seconds per call of fn(arg), over `repeats` timed loops"""
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn(arg)
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time / repeats:
+            break
+        loops *= 2
+    timings = [elapsed / loops]
+    for _ in range(repeats - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn(arg)
+        timings.append((time.perf_counter() - started) / loops)
+    return float(np.median(timings))
+
+
+def sample_headlines():
+    return pd.read_csv(SAMPLE_DATA)['text'].astype(str).tolist()
+
+
+def text_of_length(headlines, length):
+    """Real headlines joined until the text is `length` characters long"""
+    text = ''
+    i = 0
+    while len(text) < length:
+        text += headlines[i % len(headlines)] + '. '
+        i += 1
+    return text[:length]
+
+
+def ticker_universe(size):
+    """The real tickers, padded with synthetic companies up to size rows"""
+    rows = pd.read_csv(TICKERS_PATH).to_dict('records')
+    rng = np.random.default_rng(0)
+    letters = np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))
+    symbols = {row['symbol'] for row in rows}
+    words = ['Global', 'United', 'First', 'Pacific', 'Atlantic', 'Northern', 'Digital', 'Energy',
+             'Capital', 'Health', 'Systems', 'Networks', 'Foods', 'Motors', 'Materials', 'Bio']
+    while len(rows) < size:
+        symbol = ''.join(rng.choice(letters, rng.integers(2, 6)))
+        if symbol in symbols:
+            continue
+        symbols.add(symbol)
+        name = f"{symbol.title()} {' '.join(rng.choice(words, 2))} Inc."
+        rows.append({"symbol": symbol, "exchange": "NYSE", "name": name,
+                     "sector": "Industrials", "market_cap_b": 1})
+    return rows[:size]
+
+
+def run_micro(results, quick):
+    from api.artifacts import load_latest_artifact
+    from api.text import clean_text
+    from api.tickers import TickerIndex
+
+    headlines = sample_headlines()
+    scorer, _ = load_latest_artifact(MODEL_DIR)
+    lengths = TEXT_LENGTHS[:2] if quick else TEXT_LENGTHS
+    for length in lengths:
+        text = text_of_length(headlines, length)
+        cleaned = clean_text(text)
+        print(f"  micro: {length} chars")
+        metric(results, f"micro.clean_text.chars_{length}", time_per_call(clean_text, text) * 1e6, "us")
+        metric(results, f"micro.predict_one.chars_{length}",
+               time_per_call(scorer.predict_proba_one, cleaned) * 1e6, "us")
+
+    batch = [clean_text(text) for text in headlines[:1000]]
+    metric(results, "micro.predict_batch_1000.per_text",
+           time_per_call(scorer.predict_proba, batch) / len(batch) * 1e6, "us")
+
+    for size in (UNIVERSE_SIZES[:2] if quick else UNIVERSE_SIZES):
+        started = time.perf_counter()
+        index = TickerIndex(ticker_universe(size))
+        metric(results, f"micro.ticker_index_build.universe_{size}", (time.perf_counter() - started) * 1000, "ms")
+        for length in lengths:
+            print(f"  micro: detect_stocks, {size} tickers, {length} chars")
+            text = text_of_length(headlines, length) + ' Apple (AAPL) and Tesla shares rose.'
+            metric(results, f"micro.detect_stocks.universe_{size}.chars_{length}",
+                   time_per_call(index.detect, text) * 1e6, "us")
+
+
+class GroqStubHandler(BaseHTTPRequestHandler):
+    """Answers every chat completion request with a fixed explanation after a delay"""
+    delay = 0.0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.delay)
+        body = json.dumps({
+            "id": "benchmark", "object": "chat.completion", "created": 0, "model": "stub",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "Benchmark explanation."}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_groq_stub(delay):
+    GroqStubHandler.delay = delay
+    server = ThreadingHTTPServer(('127.0.0.1', 0), GroqStubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def measure_requests(client, path, make_body, count, concurrency):
+    """Send count requests with up to `concurrency` in flight; return (latencies, elapsed seconds)"""
+    latencies = []
+    next_index = iter(range(count))
+
+    async def worker():
+        for i in next_index:
+            started = time.perf_counter()
+            response = await client.post(path, json=make_body(i))
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return latencies, time.perf_counter() - started
+
+
+# /predict/batch response formats compared by measure_encodings: (name, query, Accept header)
+ENCODINGS = [
+    ("full", {"explain": "none"}, "application/json"),
+    ("compact_json", {"explain": "none", "format": "compact"}, "application/json"),
+    ("compact_msgpack", {"explain": "none", "format": "compact"}, "application/msgpack"),
+]
+
+
+async def measure_encodings(results, client, texts):
+    """Response bytes and encode time of one /predict/batch call in each format of ENCODINGS"""
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    from api import compact
+    from api.main import build_batch_results, model_registry, score_texts
+
+    model = model_registry.active
+    prefix = f"api.encode_batch_{len(texts)}"
+    for name, params, accept in ENCODINGS:
+        if accept in compact.MSGPACK_TYPES and compact.msgpack is None:
+            print(f"  api: {name} skipped, msgpack is not installed")
+            continue
+        print(f"  api: {name} response for {len(texts)} texts")
+        response = await client.post("/predict/batch", params=params, headers={"accept": accept},
+                                     json={"texts": texts})
+        response.raise_for_status()
+        metric(results, f"{prefix}.{name}.bytes", len(response.content), "bytes")
+
+        # Serialization alone, on results that are already scored: FastAPI's default
+        # encoding for the full format, building the tables and encoding for compact
+        if name == "full":
+            body = {"count": len(texts), "model_version": model.version,
+                    "results": await build_batch_results(texts, model, explain="none")}
+            seconds = time_per_call(lambda body: JSONResponse(jsonable_encoder(body)).body, body)
+        else:
+            payloads = await score_texts(texts, model)
+            positions = list(range(len(texts)))
+            seconds = time_per_call(lambda payloads: compact.encode(
+                compact.compact_results(positions, payloads, model.scorer.classes, model.version),
+                response.headers["content-type"]
+            ), payloads)
+        metric(results, f"{prefix}.{name}.encode_ms", seconds * 1000, "ms")
+
+
+def run_api(results, quick, groq_delay):
+    import httpx
+
+    stub = start_groq_stub(groq_delay)
+    # Configure the app before importing it: explanations go to the stub and are not cached
+    os.environ.update({
+        "GROQ_API_KEY": "benchmark",
+        "GROQ_BASE_URL": f"http://127.0.0.1:{stub.server_address[1]}",
+        "EXPLANATION_CACHE_PATH": "",
+        "EXPLANATION_CACHE_SIZE": "0",
+        "MODEL_WATCH_INTERVAL": "0"
+    })
+    from api.main import app
+
+    headlines = sample_headlines()
+
+    def single(i):
+        # A unique suffix keeps every request out of the prediction cache
+        return {"text": f"{headlines[i % len(headlines)]} {i}"}
+
+    def batch(i):
+        return {"texts": [f"{headlines[(i * 100 + j) % len(headlines)]} {i}" for j in range(100)]}
+
+    scenarios = [
+        ("api.predict.sequential", "/predict", single, 50 if quick else 200, 1),
+        ("api.predict.concurrency_32", "/predict", single, 200 if quick else 1000, 32),
+        ("api.predict_batch.size_100", "/predict/batch", batch, 5 if quick else 20, 1),
+        # Batches are not explained by default, so ask for it to include the Groq stub
+        ("api.predict_batch.size_100_llm", "/predict/batch?explain=llm", batch, 5 if quick else 20, 1),
+    ]
+
+    async def run_scenarios():
+        transport = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60) as client:
+                await client.post("/predict", json={"text": "warm up"})
+                for name, path, make_body, count, concurrency in scenarios:
+                    print(f"  api: {name} ({count} requests)")
+                    latencies, elapsed = await measure_requests(client, path, make_body, count, concurrency)
+                    percentiles(results, name, latencies)
+                    metric(results, f"{name}.requests_per_s", count / elapsed, "req/s", better="higher")
+                await measure_encodings(results, client, [headlines[i % len(headlines)] for i in range(1000)])
+
+    try:
+        asyncio.run(run_scenarios())
+    finally:
+        stub.shutdown()
+    metric(results, "api.groq_stub_delay_ms", groq_delay * 1000, "ms", better="none")
+
+
+def measure_load(kind):
+    """Run in a child process: load the model one way and print time and peak RSS as JSON"""
+    started = time.perf_counter()
+    if kind == 'artifact':
+        from api.artifacts import load_latest_artifact
+        scorer, _ = load_latest_artifact(MODEL_DIR)
+        scorer.predict_proba_one("warm up")
+    elif kind == 'pickle':
+        import pickle
+        with open(os.path.join(MODEL_DIR, 'vectorizer.pkl'), 'rb') as f:
+            vectorizer = pickle.load(f)
+        with open(os.path.join(MODEL_DIR, 'model.pkl'), 'rb') as f:
+            model = pickle.load(f)
+        model.predict_proba(vectorizer.transform(["warm up"]))
+    else:
+        os.environ["MODEL_WATCH_INTERVAL"] = "0"
+        import api.main
+        # What the lifespan hook runs before the first request
+        api.main.load_resources()
+    seconds = time.perf_counter() - started
+    print(json.dumps({"seconds": seconds, "peak_rss_mb": peak_rss_mb(resource.getrusage(resource.RUSAGE_SELF))}))
+
+
+def run_load(results):
+    for kind in ('artifact', 'pickle', 'app'):
+        print(f"  load: {kind}")
+        output = subprocess.run(
+            [sys.executable, __file__, '--measure-load', kind],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        measured = json.loads(output.strip().splitlines()[-1])
+        metric(results, f"load.{kind}.ms", measured["seconds"] * 1000, "ms")
+        metric(results, f"load.{kind}.peak_rss_mb", measured["peak_rss_mb"], "MB")
+
+
+def synthetic_corpus(rows, path):
+    """Write a labeled CSV of `rows` headlines sampled from each class's vocabulary"""
+    sample = pd.read_csv(SAMPLE_DATA).dropna(subset=['text', 'sentiment'])
+    rng = np.random.default_rng(rows)
+    labels = sample['sentiment'].unique()
+    counts = rng.multinomial(rows, sample['sentiment'].value_counts(normalize=True)[labels].to_numpy())
+    frames = []
+    for label, count in zip(labels, counts):
+        pool = np.array(' '.join(sample.loc[sample['sentiment'] == label, 'text'].astype(str)).split())
+        words = pool[rng.integers(len(pool), size=(count, 12))]
+        frames.append(pd.DataFrame({'text': [' '.join(row) for row in words], 'sentiment': label}))
+    pd.concat(frames, ignore_index=True).sample(frac=1, random_state=0).to_csv(path, index=False)
+
+
+def run_train(results, quick, sizes):
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in ([sizes[0]] if quick else sizes):
+            data_path = os.path.join(tmp, f'synthetic_{rows}.csv')
+            synthetic_corpus(rows, data_path)
+            print(f"  train: {rows} rows")
+            started = time.perf_counter()
+            process = subprocess.Popen(
+                [sys.executable, 'train.py', '--data', data_path, '--no-cache',
+                 '--model-dir', os.path.join(tmp, f'model_{rows}')],
+                cwd=ROOT, stdout=subprocess.DEVNULL
+            )
+            _, status, usage = os.wait4(process.pid, 0)
+            if status != 0:
+                raise RuntimeError(f"train.py failed on {rows} rows")
+            metric(results, f"train.rows_{rows}.seconds", time.perf_counter() - started, "s")
+            metric(results, f"train.rows_{rows}.peak_rss_mb", peak_rss_mb(usage), "MB")
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(baseline, current, threshold):
+    """Print each metric against the baseline and return the names that regressed"""
+    regressions = []
+    print(f"\n{'='*60}")
+    print(f"COMPARISON (regression threshold {threshold*100:.0f}%)")
+    print(f"{'='*60}")
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None or result["better"] == "none" or not base["value"]:
+            continue
+        change = result["value"] / base["value"] - 1
+        if result["better"] == "lower":
+            regressed, improved = change > threshold, change < -threshold
+        else:
+            regressed, improved = change < -threshold, change > threshold
+        flag = "REGRESSION" if regressed else "improved" if improved else ""
+        print(f"  {name:<52} {base['value']:>10.2f} -> {result['value']:>10.2f} {result['unit']:<6}"
+              f" {change*100:+6.1f}%  {flag}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the inference API and training")
+    parser.add_argument('--suites', default='micro,api,load,train',
+                        help=f"Comma-separated suites to run: {', '.join(SUITES)}")
+    parser.add_argument('--quick', action='store_true', help="Fewer iterations and sizes, for a fast check")
+    parser.add_argument('--groq-delay-ms', type=float, default=50, help="Latency added by the Groq stub")
+    parser.add_argument('--train-sizes', default=','.join(map(str, TRAIN_SIZES)),
+                        help="Comma-separated synthetic corpus sizes for the train suite")
+    parser.add_argument('--output', default='benchmark_results.json', help="Where to write the results")
+    parser.add_argument('--results', help="Compare an existing results file instead of running the benchmarks")
+    parser.add_argument('--baseline', help="Results file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Relative change that counts as a regression (default 0.2 = 20%%)")
+    parser.add_argument('--measure-load', choices=['artifact', 'pickle', 'app'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure_load:
+        measure_load(args.measure_load)
+        return
+
+    if args.results:
+        with open(args.results) as f:
+            current = json.load(f)
+    else:
+        suites = [suite.strip() for suite in args.suites.split(',') if suite.strip()]
+        unknown = set(suites) - set(SUITES)
+        if unknown:
+            parser.error(f"Unknown suite(s): {', '.join(sorted(unknown))}")
+
+        results = {}
+        for suite in suites:
+            print(f"Running {suite} benchmarks...")
+            if suite == 'micro':
+                run_micro(results, args.quick)
+            elif suite == 'api':
+                run_api(results, args.quick, args.groq_delay_ms / 1000)
+            elif suite == 'load':
+                run_load(results)
+            elif suite == 'train':
+                run_train(results, args.quick, [int(size) for size in args.train_sizes.split(',')])
+
+        current = {
+            "meta": {
+                "created_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+                "git_commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "suites": suites,
+                "quick": args.quick
+            },
+            "results": results
+        }
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f"\n✅ {len(results)} results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} metric(s) regressed")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+
+if __name__ == '__main__':
+    main()
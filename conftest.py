@@ -0,0 +1,2 @@
+# test_model.py and test_groq.py are manual check scripts that run on import, not pytest modules
+collect_ignore = ["test_model.py", "test_groq.py"]
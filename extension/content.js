@@ -1,4 +1,6 @@
-const API_URL = 'http://localhost:8000/predict';
+// Scores all of a page's headlines in one request, returning only those not sent before.
+// The extension only shows the label and confidence, so explanations are skipped
+const PAGE_API_URL = 'http://localhost:8000/predict/page?explain=none';
 
 // State management
 let state = {
@@ -12,7 +14,11 @@ let state = {
         hold: 0,
         sell: 0
     },
-    analyzedElements: new Map() // Track analyzed elements to avoid duplicates
+    analyzedElements: new Map(), // Track analyzed elements to avoid duplicates
+    session: null, // /predict/page session of this page view
+    resultsByKey: new Map(), // Results received in this page view, by the server's key for their cleaned text
+    keyByText: new Map(), // Headline text -> result key; headlines that clean to the same text share a result
+    pageRequest: Promise.resolve() // Page requests run one at a time
 };
 
 // Load settings from storage
@@ -32,24 +38,28 @@ async function saveStats() {
     await chrome.storage.local.set({ stats: state.stats });
 }
 
-// Function to analyze text and return sentiment
-async function analyzeText(text) {
+// Function to analyze a page's headlines in one request
+// Returns results for the headlines this page view has not been given yet
+async function analyzePage(texts) {
     try {
-        const response = await fetch(API_URL, {
+        const response = await fetch(PAGE_API_URL, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ text: text })
+            body: JSON.stringify({ headlines: texts, session: state.session })
         });
         
         if (!response.ok) {
-            return null;
+            return [];
         }
         
         const data = await response.json();
-        return data;
+        if (data.session) {
+            state.session = data.session;
+        }
+        return { results: data.results || [], seen: data.seen || [] };
     } catch (error) {
-        console.error('Error analyzing text:', error);
-        return null;
+        console.error('Error analyzing page:', error);
+        return { results: [], seen: [] };
     }
 }
 
@@ -768,7 +778,8 @@ async function analyzeHeadlines(force = false) {
         }
     });
     
-    // Analyze each headline
+    // Collect the headlines worth analyzing
+    const candidates = [];
     for (const headline of headlines) {
         const text = headline.textContent.trim();
         
@@ -792,16 +803,36 @@ async function analyzeHeadlines(force = false) {
             continue;
         }
         
-        const result = await analyzeText(text);
-        
-        if (result && result.sentiment) {
+        candidates.push({ headline, text });
+    }
+    
+    // Score every headline not seen in this page view with one request; page
+    // requests are queued so overlapping runs do not ask for the same headlines
+    state.pageRequest = state.pageRequest.then(async () => {
+        const newTexts = [...new Set(
+            candidates.map(c => c.text).filter(text => !state.keyByText.has(text))
+        )];
+        if (newTexts.length > 0) {
+            const { results, seen } = await analyzePage(newTexts);
+            for (const result of results) {
+                state.resultsByKey.set(result.key, result);
+                state.keyByText.set(result.text, result.key);
+            }
+            // Headlines the session already has a result for under another spelling
+            for (const { text, key } of seen) {
+                state.keyByText.set(text, key);
+            }
+        }
+    });
+    await state.pageRequest;
+    
+    for (const { headline, text } of candidates) {
+        const result = state.resultsByKey.get(state.keyByText.get(text));
+        if (result && result.sentiment && !state.analyzedElements.has(headline)) {
             state.analyzedElements.set(headline, result);
             addSentimentBadge(headline, result.sentiment, result.confidence, result.probabilities);
             updateStats(result.sentiment);
         }
-        
-        // Small delay to avoid overwhelming the API
-        await new Promise(resolve => setTimeout(resolve, 100));
     }
 }
 
@@ -0,0 +1,299 @@
+"""
+Cross-validated model search, run with `python train.py --search`
+
+Every combination of a TF-IDF configuration and a classifier is scored with
+stratified k-fold cross-validation across a process pool. The fitted TF-IDF
+features of each (vectorizer configuration, fold) pair are cached under
+data/cache/search/, keyed by the dataset contents, so adding or changing a
+classifier never re-vectorizes the corpus, also across runs.
+
+For each candidate we record accuracy, macro F1 and per-class recall. After
+the cross-validation, the fold-0 model of each candidate is timed one
+headline at a time, serially so workers do not compete for the CPU.
+MultinomialNB candidates export to the memory-mapped artifact the API
+serves: they are timed as the compiled SparseScorer and their exported size
+is measured. The linear models (SGDClassifier, LinearSVC) are searched to
+compare their accuracy and Sell recall, but the artifact cannot hold them;
+they are marked `servable: false`, timed through the sklearn pipeline, and
+never recommended. A servable model can then be chosen that fits the latency
+budget and trained with `python train.py --config model/search_results.json`.
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import accuracy_score, f1_score, recall_score
+from sklearn.model_selection import StratifiedKFold
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.svm import LinearSVC
+
+from api.artifacts import export_artifact
+from api.scorer import SparseScorer
+
+CACHE_DIR = os.path.join('data', 'cache', 'search')
+
+VECTORIZER_GRID = [
+    {'max_features': 5000, 'ngram_range': (1, 2)},
+    {'max_features': 5000, 'ngram_range': (1, 1)},
+    {'max_features': 20000, 'ngram_range': (1, 2)},
+    {'max_features': 20000, 'ngram_range': (1, 2), 'sublinear_tf': True},
+    {'max_features': 50000, 'ngram_range': (1, 3), 'sublinear_tf': True, 'min_df': 2},
+]
+
+CLASSIFIERS = {
+    'MultinomialNB': MultinomialNB,
+    'SGDClassifier': SGDClassifier,
+    'LinearSVC': LinearSVC,
+}
+
+# Classifiers SparseScorer.from_sklearn can compile into the API's artifact
+SERVABLE_CLASSIFIERS = {'MultinomialNB'}
+
+CLASSIFIER_GRID = [
+    ('MultinomialNB', {'alpha': 1.0}),
+    ('MultinomialNB', {'alpha': 0.3}),
+    ('MultinomialNB', {'alpha': 0.1}),
+    ('MultinomialNB', {'alpha': 0.03}),
+    ('MultinomialNB', {'alpha': 0.3, 'fit_prior': False}),
+    ('SGDClassifier', {'loss': 'modified_huber', 'alpha': 1e-4, 'random_state': 42}),
+    ('SGDClassifier', {'loss': 'modified_huber', 'alpha': 1e-5, 'class_weight': 'balanced', 'random_state': 42}),
+    ('LinearSVC', {'C': 0.5}),
+    ('LinearSVC', {'C': 0.5, 'class_weight': 'balanced'}),
+]
+
+# Headlines timed one at a time to measure inference latency
+LATENCY_SAMPLES = 200
+
+# Set in each worker process by init_worker
+texts = None
+labels = None
+splits = None
+
+
+def init_worker(worker_texts, worker_labels, worker_splits):
+    global texts, labels, splits
+    texts = worker_texts
+    labels = worker_labels
+    splits = worker_splits
+
+
+def dataset_fingerprint(df):
+    """Hash of the cleaned texts and labels, so cached features follow the data"""
+    hashed = pd.util.hash_pandas_object(df[['text', 'sentiment']], index=False).values
+    return hashlib.sha256(hashed.tobytes()).hexdigest()[:16]
+
+
+def feature_cache_path(fingerprint, vectorizer_params, folds, fold):
+    key = json.dumps([fingerprint, vectorizer_params, folds, fold], sort_keys=True)
+    return os.path.join(CACHE_DIR, hashlib.sha256(key.encode('utf-8')).hexdigest()[:24])
+
+
+def vectorize_fold(cache_path, vectorizer_params, fold):
+    """Fit TF-IDF on a fold's training split and cache both feature matrices"""
+    if os.path.exists(os.path.join(cache_path, 'vectorizer.pkl')):
+        return 0.0, True
+    started = time.perf_counter()
+    train_index, test_index = splits[fold]
+    vectorizer = TfidfVectorizer(**vectorizer_params)
+    X_train = vectorizer.fit_transform(texts[train_index])
+    X_test = vectorizer.transform(texts[test_index])
+
+    os.makedirs(cache_path, exist_ok=True)
+    sparse.save_npz(os.path.join(cache_path, 'train.npz'), X_train)
+    sparse.save_npz(os.path.join(cache_path, 'test.npz'), X_test)
+    # Written last: its presence marks the cache entry as complete
+    with open(os.path.join(cache_path, 'vectorizer.pkl'), 'wb') as f:
+        pickle.dump(vectorizer, f)
+    return time.perf_counter() - started, False
+
+
+def evaluate(cache_path, classifier_name, classifier_params, fold, keep_model):
+    """Fit a classifier on cached fold features and score it on the held-out split"""
+    train_index, test_index = splits[fold]
+    X_train = sparse.load_npz(os.path.join(cache_path, 'train.npz'))
+    X_test = sparse.load_npz(os.path.join(cache_path, 'test.npz'))
+
+    started = time.perf_counter()
+    classifier = CLASSIFIERS[classifier_name](**classifier_params)
+    classifier.fit(X_train, labels[train_index])
+    fit_seconds = time.perf_counter() - started
+
+    y_test = labels[test_index]
+    y_pred = classifier.predict(X_test)
+    classes = np.unique(labels)
+    result = {
+        'accuracy': accuracy_score(y_test, y_pred),
+        'f1_macro': f1_score(y_test, y_pred, average='macro', zero_division=0),
+        'recall': dict(zip(classes.tolist(), recall_score(
+            y_test, y_pred, labels=classes, average=None, zero_division=0
+        ).tolist())),
+        'fit_seconds': fit_seconds
+    }
+
+    if keep_model:
+        # Timed in the parent process once the pool is done
+        result['model'] = classifier
+    return result
+
+
+def measure_serving(cache_path, classifier, sample_texts):
+    """Per-headline latency and exported artifact size of a fold-0 model.
+
+    Servable models are timed as the compiled SparseScorer the API runs; the
+    others through the sklearn pipeline, and have no artifact size.
+    """
+    with open(os.path.join(cache_path, 'vectorizer.pkl'), 'rb') as f:
+        vectorizer = pickle.load(f)
+    servable = type(classifier).__name__ in SERVABLE_CLASSIFIERS
+    if servable:
+        score = SparseScorer.from_sklearn(vectorizer, classifier).predict_proba_one
+    else:
+        def score(text):
+            return classifier.predict(vectorizer.transform([text]))
+    timings = []
+    for text in sample_texts:
+        started = time.perf_counter()
+        score(text)
+        timings.append(time.perf_counter() - started)
+
+    artifact_bytes = None
+    if servable:
+        with tempfile.TemporaryDirectory() as model_dir:
+            version_dir = export_artifact(vectorizer, classifier, model_dir, version='search', make_latest=False)
+            artifact_bytes = sum(
+                os.path.getsize(os.path.join(version_dir, name)) for name in os.listdir(version_dir)
+            )
+    return {
+        'servable': servable,
+        'latency_us_p50': float(np.percentile(timings, 50) * 1e6),
+        'latency_us_p95': float(np.percentile(timings, 95) * 1e6),
+        'artifact_bytes': artifact_bytes
+    }
+
+
+def summarize(vectorizer_params, classifier_name, classifier_params, fold_results, serving):
+    accuracies = [r['accuracy'] for r in fold_results]
+    classes = fold_results[0]['recall'].keys()
+    return {
+        'vectorizer': {k: list(v) if isinstance(v, tuple) else v for k, v in vectorizer_params.items()},
+        'classifier': classifier_name,
+        'classifier_params': classifier_params,
+        'accuracy_mean': float(np.mean(accuracies)),
+        'accuracy_std': float(np.std(accuracies)),
+        'f1_macro_mean': float(np.mean([r['f1_macro'] for r in fold_results])),
+        'recall_mean': {label: float(np.mean([r['recall'][label] for r in fold_results])) for label in classes},
+        'fit_seconds_mean': float(np.mean([r['fit_seconds'] for r in fold_results])),
+        'servable': serving['servable'],
+        'latency_us_p50': serving['latency_us_p50'],
+        'latency_us_p95': serving['latency_us_p95'],
+        'artifact_bytes': serving['artifact_bytes']
+    }
+
+
+def describe(candidate):
+    vectorizer = ', '.join(f"{k}={v}" for k, v in candidate['vectorizer'].items())
+    params = ', '.join(f"{k}={v}" for k, v in candidate['classifier_params'].items() if k != 'random_state')
+    return f"TF-IDF({vectorizer}) + {candidate['classifier']}({params})"
+
+
+def run_search(df, data_files, folds=5, workers=1, output_path='model/search_results.json',
+               latency_budget_us=None):
+    """Cross-validate every vectorizer x classifier candidate and write the results as JSON"""
+    all_texts = df['text'].to_numpy()
+    all_labels = df['sentiment'].to_numpy()
+    splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=42).split(all_texts, all_labels))
+    fingerprint = dataset_fingerprint(df)
+    cache_paths = {
+        (v, fold): feature_cache_path(fingerprint, VECTORIZER_GRID[v], folds, fold)
+        for v in range(len(VECTORIZER_GRID)) for fold in range(folds)
+    }
+
+    print(f"\nSearching {len(VECTORIZER_GRID)} vectorizer x {len(CLASSIFIER_GRID)} classifier "
+          f"candidates with {folds}-fold CV on {workers} worker(s)...")
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(all_texts, all_labels, splits)) as pool:
+        # Stage 1: fit TF-IDF once per (vectorizer, fold), reusing cached features
+        jobs = {
+            key: pool.submit(vectorize_fold, path, VECTORIZER_GRID[key[0]], key[1])
+            for key, path in cache_paths.items()
+        }
+        reused = 0
+        for key, job in jobs.items():
+            seconds, cached = job.result()
+            reused += cached
+        print(f"  - Features: {len(jobs) - reused} fold(s) vectorized, {reused} reused from {CACHE_DIR}")
+
+        # Stage 2: fit and score every classifier on every cached fold
+        jobs = {
+            (v, c, fold): pool.submit(
+                evaluate, cache_paths[(v, fold)], CLASSIFIER_GRID[c][0], CLASSIFIER_GRID[c][1],
+                fold, fold == 0
+            )
+            for v in range(len(VECTORIZER_GRID))
+            for c in range(len(CLASSIFIER_GRID))
+            for fold in range(folds)
+        }
+        fold_results = {key: job.result() for key, job in jobs.items()}
+
+    # Stage 3: time each candidate's fold-0 model as the API would serve it
+    print("  - Timing each candidate's fold-0 model...")
+    sample_texts = all_texts[splits[0][1][:LATENCY_SAMPLES]]
+    candidates = []
+    for v, vectorizer_params in enumerate(VECTORIZER_GRID):
+        for c, (classifier_name, classifier_params) in enumerate(CLASSIFIER_GRID):
+            serving = measure_serving(cache_paths[(v, 0)], fold_results[(v, c, 0)].pop('model'), sample_texts)
+            candidates.append(summarize(
+                vectorizer_params, classifier_name, classifier_params,
+                [fold_results[(v, c, fold)] for fold in range(folds)], serving
+            ))
+    candidates.sort(key=lambda candidate: candidate['accuracy_mean'], reverse=True)
+
+    print(f"\n{'='*60}")
+    print("SEARCH RESULTS (sorted by mean CV accuracy)")
+    print(f"{'='*60}")
+    for candidate in candidates:
+        recall = ', '.join(f"{label}={value:.2f}" for label, value in candidate['recall_mean'].items())
+        print(f"\n  {describe(candidate)}")
+        print(f"    Accuracy: {candidate['accuracy_mean']:.4f} ± {candidate['accuracy_std']:.4f}   "
+              f"Macro F1: {candidate['f1_macro_mean']:.4f}")
+        print(f"    Recall:   {recall}")
+        if candidate['servable']:
+            print(f"    Latency:  p50 {candidate['latency_us_p50']:.0f}us, p95 {candidate['latency_us_p95']:.0f}us   "
+                  f"Size: {candidate['artifact_bytes'] / 1024:.0f} KB")
+        else:
+            print(f"    Latency:  p50 {candidate['latency_us_p50']:.0f}us, p95 {candidate['latency_us_p95']:.0f}us "
+                  f"(sklearn)   Not servable by the API")
+
+    servable = [c for c in candidates if c['servable']]
+    recommended = None
+    if latency_budget_us is not None:
+        within_budget = [c for c in servable if c['latency_us_p50'] <= latency_budget_us]
+        recommended = within_budget[0] if within_budget else None
+        print(f"\nBest servable model within {latency_budget_us:.0f}us p50: "
+              f"{describe(recommended) if recommended else 'no candidate fits the budget'}")
+
+    results = {
+        'data_files': list(data_files),
+        'dataset_fingerprint': fingerprint,
+        'samples': int(len(df)),
+        'folds': folds,
+        'latency_budget_us': latency_budget_us,
+        'recommended': recommended,
+        'candidates': candidates
+    }
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n✅ Search results saved to {output_path}")
+    print(f"   Train the {'recommended' if recommended else 'most accurate servable'} model with: "
+          f"python train.py --config {output_path}")
+    return results
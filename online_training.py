@@ -0,0 +1,246 @@
+"""
+Incremental training, run with `python train.py --online <batch> [<batch> ...]`
+
+Folds new labeled headlines (CSV or NDJSON with text and sentiment columns)
+into the model without another pass over the full corpus. Features come from
+a stateless HashingVectorizer, so there is no vocabulary to refit, and the
+model is Multinomial Naive Bayes, whose state is just per-class term and
+document counts that new batches add to.
+
+The state lives in model/online/:
+
+    state.npz     feature_count (features x classes) and class_count
+    state.json    vectorizer settings, alpha, classes and the ingested batches
+
+Each run updates the state in place and exports a new model/<version>/ that
+the API serves. A batch whose file contents were already ingested is skipped,
+so rerunning a daily job never counts the same rows twice.
+
+A new online model only knows the batches it is given, so it is not started
+over a model directory that already serves a model unless `--init` is passed,
+usually with the training corpus as the first batches. `--keep N` removes all
+but the N newest model versions after exporting.
+"""
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from api.artifacts import export_hashed_artifact, load_artifact, prune_versions, read_latest, write_latest
+from api.scorer import PROBE_TEXTS
+from api.text import clean_series
+from train import file_sha256
+
+STATE_DIR = 'online'
+DEFAULT_CLASSES = ['Buy', 'Hold', 'Sell']
+
+# Raw n-gram counts over 2^18 columns; matched the TF-IDF model's held-out accuracy
+DEFAULT_SETTINGS = {
+    'n_features': 2 ** 18,
+    'ngram_range': [1, 2],
+    'token_pattern': r"(?u)\b\w\w+\b",
+    'lowercase': True,
+    'norm': None,
+    'alpha': 0.3
+}
+
+
+def make_vectorizer(settings):
+    return HashingVectorizer(
+        n_features=settings['n_features'],
+        ngram_range=tuple(settings['ngram_range']),
+        token_pattern=settings['token_pattern'],
+        lowercase=settings['lowercase'],
+        norm=settings['norm'],
+        alternate_sign=False
+    )
+
+
+class OnlineState:
+    """Naive Bayes sufficient statistics, the same counts MultinomialNB.partial_fit accumulates"""
+
+    def __init__(self, settings, classes, feature_count, class_count, batches):
+        self.settings = settings
+        self.classes = np.asarray(classes)
+        self.feature_count = feature_count
+        self.class_count = class_count
+        self.batches = batches
+        self.vectorizer = make_vectorizer(settings)
+
+    @classmethod
+    def new(cls, settings=None, classes=DEFAULT_CLASSES):
+        settings = dict(settings or DEFAULT_SETTINGS)
+        return cls(
+            settings, classes,
+            feature_count=np.zeros((settings['n_features'], len(classes))),
+            class_count=np.zeros(len(classes)),
+            batches=[]
+        )
+
+    @classmethod
+    def load(cls, state_dir):
+        """Load the state in state_dir, or return None if there is none yet"""
+        json_path = os.path.join(state_dir, 'state.json')
+        if not os.path.exists(json_path):
+            return None
+        with open(json_path) as f:
+            meta = json.load(f)
+        with np.load(os.path.join(state_dir, 'state.npz'), allow_pickle=False) as arrays:
+            feature_count = arrays['feature_count']
+            class_count = arrays['class_count']
+        return cls(meta['settings'], meta['classes'], feature_count, class_count, meta['batches'])
+
+    def save(self, state_dir):
+        """Write the state, replacing the previous files atomically"""
+        os.makedirs(state_dir, exist_ok=True)
+        npz_tmp = os.path.join(state_dir, 'state.tmp.npz')
+        np.savez(npz_tmp, feature_count=self.feature_count, class_count=self.class_count)
+        json_tmp = os.path.join(state_dir, 'state.json.tmp')
+        with open(json_tmp, 'w') as f:
+            json.dump({
+                'settings': self.settings,
+                'classes': self.classes.tolist(),
+                'batches': self.batches
+            }, f, indent=2)
+        os.replace(npz_tmp, os.path.join(state_dir, 'state.npz'))
+        os.replace(json_tmp, os.path.join(state_dir, 'state.json'))
+
+    @property
+    def samples_seen(self):
+        return int(self.class_count.sum())
+
+    def has_batch(self, fingerprint):
+        return any(batch['sha256'] == fingerprint for batch in self.batches)
+
+    def partial_fit(self, texts, labels):
+        """Add a batch of cleaned texts and their labels to the counts"""
+        X = self.vectorizer.transform(texts)
+        Y = (np.asarray(labels)[:, np.newaxis] == self.classes[np.newaxis, :]).astype(np.float64)
+        self.feature_count += np.asarray(X.T @ Y)
+        self.class_count += Y.sum(axis=0)
+
+    def feature_log_prob(self):
+        smoothed = self.feature_count + self.settings['alpha']
+        return np.log(smoothed) - np.log(smoothed.sum(axis=0, keepdims=True))
+
+    def class_log_prior(self):
+        return np.log(self.class_count) - np.log(self.class_count.sum())
+
+    def predict_proba(self, texts):
+        """Class probabilities through sklearn's HashingVectorizer, used to check the exported scorer"""
+        jll = self.vectorizer.transform(texts) @ self.feature_log_prob() + self.class_log_prior()
+        jll = jll - jll.max(axis=1, keepdims=True)
+        proba = np.exp(jll)
+        return proba / proba.sum(axis=1, keepdims=True)
+
+
+def load_batch(path, classes):
+    """Cleaned texts and labels from a CSV or NDJSON batch, dropping unusable rows"""
+    if path.endswith(('.ndjson', '.jsonl', '.json')):
+        df = pd.read_json(path, lines=True)
+    else:
+        df = pd.read_csv(path)
+    missing = {'text', 'sentiment'} - set(df.columns)
+    if missing:
+        raise ValueError(f"{path} is missing column(s): {', '.join(sorted(missing))}")
+
+    df = df.dropna(subset=['text', 'sentiment']).drop_duplicates(subset=['text'], keep='first')
+    known = df['sentiment'].isin(classes)
+    if not known.all():
+        print(f"  - Skipping {int((~known).sum())} rows with unknown labels")
+        df = df[known]
+    return clean_series(df['text']).tolist(), df['sentiment'].tolist()
+
+
+def run_online(batch_paths, model_dir='model', init=False, keep=None):
+    """Fold labeled batches into the online state and export a new model version"""
+    state_dir = os.path.join(model_dir, STATE_DIR)
+    state = OnlineState.load(state_dir)
+    if state is None:
+        latest = read_latest(model_dir)
+        if latest is not None and not init:
+            # Otherwise a model trained on just these batches would replace the served one
+            print(f"No online model in {state_dir}/, and {model_dir}/LATEST already serves {latest}.")
+            print("Pass --init to start one, with the training corpus first, e.g.:")
+            print("   python train.py --online data/train1.csv data/cleaned_output1.csv <batch> --init")
+            return None
+        print(f"Starting a new online model in {state_dir}/")
+        state = OnlineState.new()
+    else:
+        print(f"Loaded online model: {state.samples_seen} samples from {len(state.batches)} batch(es)")
+
+    probe_texts = list(PROBE_TEXTS)
+    ingested = 0
+    for path in batch_paths:
+        fingerprint = file_sha256(path)
+        if state.has_batch(fingerprint):
+            print(f"  - {os.path.basename(path)}: already ingested, skipping")
+            continue
+
+        started = time.perf_counter()
+        texts, labels = load_batch(path, state.classes)
+        if not texts:
+            print(f"  - {os.path.basename(path)}: no usable rows")
+            continue
+
+        # Score the batch before learning from it, as a running accuracy estimate
+        accuracy = None
+        if state.samples_seen:
+            predictions = state.classes[state.predict_proba(texts).argmax(axis=1)]
+            accuracy = float(np.mean(predictions == np.asarray(labels)))
+
+        state.partial_fit(texts, labels)
+        state.batches.append({
+            'file': os.path.basename(path),
+            'sha256': fingerprint,
+            'rows': len(texts),
+            'ingested_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'accuracy_before_update': accuracy
+        })
+        probe_texts.extend(texts[:20])
+        ingested += 1
+        accuracy_note = f", accuracy before update {accuracy:.4f}" if accuracy is not None else ""
+        print(f"  - {os.path.basename(path)}: {len(texts)} rows in "
+              f"{time.perf_counter() - started:.2f}s{accuracy_note}")
+
+    if not ingested:
+        print("\nNo new batches, model unchanged.")
+        return None
+
+    metrics = {
+        "online": {
+            "samples_seen": state.samples_seen,
+            "batches": len(state.batches),
+            "class_distribution": {
+                str(label): int(count) for label, count in zip(state.classes, state.class_count)
+            },
+            "last_batch": state.batches[-1]
+        }
+    }
+    vectorizer_settings = {k: state.settings[k] for k in ('ngram_range', 'token_pattern', 'lowercase', 'norm')}
+    version_dir = export_hashed_artifact(
+        state.feature_log_prob(), state.class_log_prior(), state.classes, vectorizer_settings,
+        model_dir, metrics=metrics, make_latest=False
+    )
+
+    # Only serve the new version if it scores exactly like the sklearn featurizer
+    exported, manifest = load_artifact(version_dir)
+    error = float(np.abs(exported.predict_proba(probe_texts) - state.predict_proba(probe_texts)).max())
+    if error > 1e-9:
+        shutil.rmtree(version_dir)
+        raise ValueError(f"Exported online model disagrees with HashingVectorizer (max error {error:.2e})")
+    # Only now record the batches as ingested, so a failed export is retried on the next run
+    state.save(state_dir)
+    write_latest(model_dir, manifest['model_version'])
+
+    print(f"\n✅ Done! Online model now has {state.samples_seen} samples")
+    print(f"   - {state_dir}/ (updated state)")
+    print(f"   - {version_dir}/ (new version, now in {model_dir}/LATEST)")
+    if keep is not None:
+        removed = prune_versions(model_dir, keep)
+        print(f"   - Removed {len(removed)} old version(s), keeping the {keep} newest")
+    return version_dir
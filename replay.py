@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Replay captured API traffic against a running server
+
+Reads the JSONL files written by the API's capture mode (CAPTURE_SAMPLE_RATE,
+see api/capture.py) and sends each request at its recorded offset from the
+first one, compressed so the captured requests arrive at --speed times the
+estimated production rate. With a sample rate of 0.1, the production rate is
+ten times the captured one, so --speed 1 sends the captured requests ten
+times faster than they were recorded and --speed 2 twenty times. --speed 0
+sends as fast as the workers allow. Entries without a sample rate (older
+captures) count as fully sampled.
+--concurrency worker threads send the requests, each over its own keep-alive
+connection. When all workers are busy, requests wait; that wait is reported
+separately from latency.
+
+The report has:
+    - latency percentiles and error rates, overall and per path
+    - status counts
+    - the achieved rate, the recorded rate of the captured requests and the
+      production rate estimated from their sample rates
+    - the server-side durations recorded at capture time, for comparison
+
+With --output it is also written as JSON, to compare runs before and after
+a change.
+
+Usage:
+    CAPTURE_SAMPLE_RATE=1 uvicorn api.main:app     # record traffic
+    python replay.py --url http://localhost:8000
+    python replay.py data/capture/requests-20261017-101500.jsonl --speed 4 --concurrency 16
+"""
+import argparse
+import glob
+import http.client
+import json
+import queue
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+
+def load_entries(paths, limit=None):
+    """Captured requests from paths, oldest first; those with truncated bodies cannot be replayed and are skipped"""
+    entries = []
+    skipped = 0
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry.get("body_truncated"):
+                    skipped += 1
+                    continue
+                entries.append(entry)
+    entries.sort(key=lambda entry: entry["ts"])
+    if limit:
+        entries = entries[:limit]
+    return entries, skipped
+
+
+def sampling_factor(entries):
+    """Production requests per captured one: the mean of 1 / sample_rate over the entries"""
+    return sum(1 / entry.get("sample_rate", 1.0) for entry in entries) / len(entries)
+
+
+def connect(url, timeout):
+    parts = urlsplit(url)
+    connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    return connection_class(parts.hostname, parts.port, timeout=timeout)
+
+
+def send(connection, entry):
+    """Send one captured request and read the whole response; returns the status code"""
+    target = entry["path"] + (f"?{entry['query']}" if entry.get("query") else '')
+    headers = {}
+    if entry.get("content_type"):
+        headers["Content-Type"] = entry["content_type"]
+    if entry.get("accept"):
+        headers["Accept"] = entry["accept"]
+    body = entry["body"].encode('utf-8') if entry.get("body") else None
+    connection.request(entry["method"], target, body=body, headers=headers)
+    response = connection.getresponse()
+    response.read()
+    return response.status
+
+
+def worker(jobs, results, url, timeout):
+    connection = connect(url, timeout)
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        due, entry = job
+        started = time.perf_counter()
+        try:
+            status = send(connection, entry)
+        except (OSError, http.client.HTTPException) as e:
+            status = type(e).__name__
+            connection.close()
+            connection = connect(url, timeout)
+        results.append((entry["path"], status, time.perf_counter() - started, max(0.0, started - due)))
+    connection.close()
+
+
+def replay(entries, url, speed=1.0, concurrency=8, timeout=30.0):
+    """Send entries at speed times the estimated production rate; returns (path, status, latency, wait) per request
+    and the run time"""
+    jobs = queue.Queue()
+    results = []
+    threads = [
+        threading.Thread(target=worker, args=(jobs, results, url, timeout), daemon=True)
+        for _ in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+
+    first = entries[0]["ts"]
+    # Recorded offsets are divided by this, so the sampled requests stand in for the unsampled ones
+    compression = speed * sampling_factor(entries)
+    started = time.perf_counter()
+    for entry in entries:
+        due = time.perf_counter()
+        if speed > 0:
+            due = started + (entry["ts"] - first) / compression
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        jobs.put((due, entry))
+    for _ in threads:
+        jobs.put(None)
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def summarize(seconds):
+    milliseconds = np.asarray(seconds, dtype=float) * 1000
+    if not len(milliseconds):
+        return {}
+    summary = {f"p{p}": round(float(np.percentile(milliseconds, p)), 3) for p in (50, 90, 99)}
+    summary["max"] = round(float(milliseconds.max()), 3)
+    summary["mean"] = round(float(milliseconds.mean()), 3)
+    return summary
+
+
+def is_error(status):
+    return not isinstance(status, int) or status >= 400
+
+
+def build_report(entries, results, elapsed):
+    recorded_span = entries[-1]["ts"] - entries[0]["ts"]
+    statuses = {}
+    for _, status, _, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = sum(is_error(status) for _, status, _, _ in results)
+    recorded_rate = len(entries) / recorded_span if recorded_span > 0 else None
+    report = {
+        "requests": len(results),
+        "elapsed_s": round(elapsed, 3),
+        "rate_per_s": round(len(results) / elapsed, 2) if elapsed > 0 else None,
+        "recorded_rate_per_s": round(recorded_rate, 2) if recorded_rate is not None else None,
+        "estimated_production_rate_per_s": round(recorded_rate * sampling_factor(entries), 2)
+        if recorded_rate is not None else None,
+        "errors": errors,
+        "error_rate": round(errors / len(results), 4) if results else 0.0,
+        "statuses": statuses,
+        "latency_ms": summarize([latency for _, _, latency, _ in results]),
+        "wait_ms": summarize([wait for _, _, _, wait in results]),
+        "recorded_server_ms": summarize(
+            [entry["duration_ms"] / 1000 for entry in entries if entry.get("duration_ms") is not None]
+        ),
+        "paths": {}
+    }
+    for path in sorted({path for path, _, _, _ in results}):
+        path_results = [result for result in results if result[0] == path]
+        path_errors = sum(is_error(status) for _, status, _, _ in path_results)
+        report["paths"][path] = {
+            "requests": len(path_results),
+            "error_rate": round(path_errors / len(path_results), 4),
+            "latency_ms": summarize([latency for _, _, latency, _ in path_results]),
+            "recorded_server_ms": summarize(
+                [entry["duration_ms"] / 1000 for entry in entries
+                 if entry["path"] == path and entry.get("duration_ms") is not None]
+            )
+        }
+    return report
+
+
+def print_report(report):
+    print(f"\n{report['requests']} requests in {report['elapsed_s']:.2f}s "
+          f"({report['rate_per_s']} req/s, recorded {report['recorded_rate_per_s']} req/s, "
+          f"estimated production {report['estimated_production_rate_per_s']} req/s)")
+    print(f"Errors: {report['errors']} ({report['error_rate']:.2%})  Statuses: {report['statuses']}")
+    print(f"\n{'path':<24} {'requests':>8} {'errors':>7} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+          f"{'server p50':>10}")
+    for path, stats in [("all", report)] + list(report["paths"].items()):
+        latency = stats["latency_ms"]
+        print(f"{path:<24} {stats['requests']:>8} {stats['error_rate']:>7.2%} {latency['p50']:>8.2f} "
+              f"{latency['p90']:>8.2f} {latency['p99']:>8.2f} {latency['max']:>8.2f} "
+              f"{stats['recorded_server_ms'].get('p50', float('nan')):>10.2f}")
+    print(f"\nWaiting for a free worker: p50 {report['wait_ms']['p50']:.2f}ms, p99 {report['wait_ms']['p99']:.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured API traffic against a running server")
+    parser.add_argument('files', nargs='*', help="Capture files (default: data/capture/*.jsonl)")
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="Multiple of the estimated production request rate; 0 sends as fast as possible")
+    parser.add_argument('--concurrency', type=int, default=8, help="Requests in flight at most")
+    parser.add_argument('--limit', type=int, help="Replay only the first N captured requests")
+    parser.add_argument('--timeout', type=float, default=30.0, help="Seconds before a request counts as failed")
+    parser.add_argument('--output', help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob('data/capture/*.jsonl'))
+    if not files:
+        print("No capture files found. Start the API with CAPTURE_SAMPLE_RATE=1 to record traffic.")
+        return
+    entries, skipped = load_entries(files, args.limit)
+    if not entries:
+        print("No replayable requests in the capture files.")
+        return
+
+    print(f"Replaying {len(entries)} requests from {len(files)} file(s) against {args.url} "
+          f"at {f'{args.speed}x the production rate' if args.speed else 'max speed'} "
+          f"({sampling_factor(entries):g} production requests per captured one) with concurrency {args.concurrency}"
+          + (f" ({skipped} with truncated bodies skipped)" if skipped else ''))
+    results, elapsed = replay(entries, args.url, args.speed, args.concurrency, args.timeout)
+    report = build_report(entries, results, elapsed)
+    report["settings"] = {"url": args.url, "speed": args.speed, "concurrency": args.concurrency, "files": files}
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
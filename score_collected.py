@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Score collected news articles with the saved model
+
+Reads data/collected/<name>.csv (title, content, url, timestamp, source) in
+chunks, builds `text` from title + content, and scores it across a process
+pool. Results go to data/processed/processed_<name>.csv and a Parquet copy
+next to it. Runs are incremental: URLs that already have a sentiment in the
+processed output are skipped, so daily reruns only score new rows.
+
+With --document, article bodies are scored like /predict?document=true:
+sentences each source repeats across articles are dropped (the fingerprints
+are kept in data/cache/boilerplate.json between runs) and only the first
+--max-tokens tokens are scored; --sentences also scores sentence by sentence.
+
+Usage:
+    python score_collected.py
+    python score_collected.py data/collected/reuters_2025-11-19.csv --workers 4
+    python score_collected.py --document --sentences
+"""
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from api.artifacts import load_latest_artifact
+from api.documents import BoilerplateFilter, prepare_document, score_sentences
+from api.inference import load_ticker_index
+from api.text import clean_text
+
+PROCESSED_COLUMNS = ['title', 'content', 'url', 'timestamp', 'source', 'text', 'sentiment', 'confidence', 'stocks']
+
+# Set in each worker process by init_worker
+scorer = None
+ticker_index = None
+
+
+def init_worker(model_dir, tickers_path):
+    """Load the model and ticker index once per worker process"""
+    global scorer, ticker_index
+    scorer, _ = load_latest_artifact(model_dir)
+    # Read as the API reads it, so detected stocks match what /predict returns
+    ticker_index = load_ticker_index(tickers_path)
+
+
+def score_shard(texts, sentences=False):
+    """Return (sentiment, confidence, stocks) for each text
+
+    With sentences, each text is a list of sentences scored one by one and averaged.
+    """
+    if sentences:
+        probabilities = np.array([score_sentences(scorer, document) for document in texts])
+        texts = [' '.join(document) for document in texts]
+    else:
+        probabilities = scorer.predict_proba([clean_text(text) for text in texts])
+    predictions = scorer.classes[probabilities.argmax(axis=1)]
+    return [
+        (str(prediction), float(probs.max()), ' '.join(s['symbol'] for s in ticker_index.detect(text)))
+        for text, prediction, probs in zip(texts, predictions, probabilities)
+    ]
+
+
+def build_text(chunk):
+    """Text to score: the title followed by the article content"""
+    title = chunk['title'].fillna('').astype(str)
+    content = chunk['content'].fillna('').astype(str)
+    return (title + '. ' + content).where(content != '', title)
+
+
+def processed_path_for(collected_path, processed_dir):
+    name = os.path.splitext(os.path.basename(collected_path))[0]
+    return os.path.join(processed_dir, f'processed_{name}.csv')
+
+
+def load_done_urls(processed_path):
+    """URLs already scored in processed_path; rows without a sentiment are dropped so they get rescored"""
+    if not os.path.exists(processed_path) or os.path.getsize(processed_path) == 0:
+        return set()
+    processed = pd.read_csv(processed_path)
+    scored = processed['sentiment'].notna()
+    if not scored.all() or list(processed.columns) != PROCESSED_COLUMNS:
+        # Rewrite in the current column layout so new rows can be appended
+        if not scored.all():
+            print(f"  - Rescoring {int((~scored).sum())} rows without a sentiment")
+        processed = processed[scored]
+        processed.reindex(columns=PROCESSED_COLUMNS).to_csv(processed_path, index=False)
+    return set(processed['url'].dropna())
+
+
+def prepare_documents(chunk, boilerplate, max_tokens):
+    """Sentences of each row's text without its source's boilerplate, up to max_tokens tokens"""
+    sources = chunk['source'].fillna('').astype(str) if 'source' in chunk.columns else [''] * len(chunk)
+    return [
+        prepare_document(text, boilerplate, source, max_tokens)[0]
+        for text, source in zip(chunk['text'], sources)
+    ]
+
+
+def score_file(collected_path, processed_dir, pool, workers, chunk_size,
+               boilerplate=None, max_tokens=None, sentences=False):
+    """Score the new rows of collected_path; with a BoilerplateFilter, as long documents"""
+    processed_path = processed_path_for(collected_path, processed_dir)
+    print(f"\n{collected_path} -> {processed_path}")
+    done_urls = load_done_urls(processed_path)
+    write_header = not os.path.exists(processed_path) or os.path.getsize(processed_path) == 0
+
+    scored_rows = 0
+    skipped_rows = 0
+    for chunk in pd.read_csv(collected_path, chunksize=chunk_size):
+        new_rows = ~chunk['url'].isin(done_urls)
+        skipped_rows += int((~new_rows).sum())
+        chunk = chunk[new_rows].drop_duplicates(subset=['url'], keep='first')
+        if chunk.empty:
+            continue
+        done_urls.update(chunk['url'].dropna())
+
+        chunk = chunk.copy()
+        chunk['text'] = build_text(chunk)
+        texts = chunk['text'].tolist()
+        if boilerplate is not None:
+            # In this process, so boilerplate is learned in row order across all workers' shards
+            texts = prepare_documents(chunk, boilerplate, max_tokens)
+            if not sentences:
+                texts = [' '.join(document) for document in texts]
+        shard_size = max(1, -(-len(texts) // workers))
+        shards = [texts[i:i + shard_size] for i in range(0, len(texts), shard_size)]
+        results = [row for shard in pool.map(score_shard, shards, [sentences] * len(shards)) for row in shard]
+        chunk['sentiment'] = [sentiment for sentiment, _, _ in results]
+        chunk['confidence'] = [confidence for _, confidence, _ in results]
+        chunk['stocks'] = [stocks for _, _, stocks in results]
+
+        chunk.reindex(columns=PROCESSED_COLUMNS).to_csv(
+            processed_path, mode='w' if write_header else 'a', header=write_header, index=False
+        )
+        write_header = False
+        scored_rows += len(chunk)
+
+    print(f"  - Scored {scored_rows} new rows, skipped {skipped_rows} already processed")
+    return processed_path, scored_rows > 0
+
+
+def write_parquet(processed_path, changed):
+    """Write a Parquet copy of the processed CSV next to it, if it is missing or out of date"""
+    parquet_path = os.path.splitext(processed_path)[0] + '.parquet'
+    if not os.path.exists(processed_path) or (not changed and os.path.exists(parquet_path)):
+        return
+    try:
+        pd.read_csv(processed_path).to_parquet(parquet_path, index=False)
+        print(f"  - Wrote {parquet_path}")
+    except ImportError:
+        print("  - pyarrow is not installed, skipping Parquet output")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score collected news articles with the saved model")
+    parser.add_argument('files', nargs='*', help="Collected CSV files (default: data/collected/*.csv)")
+    parser.add_argument('--processed-dir', default='data/processed')
+    parser.add_argument('--model-dir', default='model')
+    parser.add_argument('--tickers', default='data/tickers/tickers.csv')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=5000, help="Rows read and scored at a time")
+    parser.add_argument('--no-parquet', action='store_true', help="Only write the CSV output")
+    parser.add_argument('--document', action='store_true',
+                        help="Drop boilerplate sentences and score at most --max-tokens tokens per article")
+    parser.add_argument('--sentences', action='store_true',
+                        help="Score each sentence and average them (implies --document)")
+    parser.add_argument('--max-tokens', type=int, default=512, help="Tokens scored per article with --document")
+    parser.add_argument('--min-documents', type=int, default=3,
+                        help="Articles of a source a sentence must appear in to count as boilerplate")
+    parser.add_argument('--boilerplate', default='data/cache/boilerplate.json',
+                        help="Where learned boilerplate fingerprints are loaded from and saved")
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob('data/collected/*.csv'))
+    if not files:
+        print("No collected files found.")
+        return
+    os.makedirs(args.processed_dir, exist_ok=True)
+
+    boilerplate = None
+    if args.document or args.sentences:
+        boilerplate = BoilerplateFilter(min_documents=args.min_documents)
+        if os.path.exists(args.boilerplate):
+            print(f"Loaded {boilerplate.load(args.boilerplate)} boilerplate sentences from {args.boilerplate}")
+
+    print(f"Scoring {len(files)} file(s) with {args.workers} worker(s)...")
+    with ProcessPoolExecutor(
+        max_workers=args.workers, initializer=init_worker, initargs=(args.model_dir, args.tickers)
+    ) as pool:
+        for collected_path in files:
+            processed_path, changed = score_file(
+                collected_path, args.processed_dir, pool, args.workers, args.chunk_size,
+                boilerplate, args.max_tokens, args.sentences
+            )
+            if not args.no_parquet:
+                write_parquet(processed_path, changed)
+
+    if boilerplate is not None:
+        boilerplate.save(args.boilerplate)
+        stats = boilerplate.stats()
+        print(f"\nRemoved {stats['removed_sentences']} boilerplate sentences; "
+              f"{stats['boilerplate_sentences']} known across {stats['sources']} source(s), saved to {args.boilerplate}")
+
+    print("\n✅ Done!")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,19 +2,29 @@
 """
 Quick test script to verify the model works
 """
+import os
 import pickle
-import re
+import sys
 
-def clean_text(text):
-    text = str(text).lower()
-    return re.sub(r'[^a-zA-Z0-9\s]', '', text)
+from api.artifacts import load_latest_artifact
+from api.scorer import SklearnScorer
+from api.text import clean_text
 
-# Load model
+# Load the exported artifact, or the pickles train.py saves next to it
 print("Loading model...")
-with open('model/vectorizer.pkl', 'rb') as f:
-    vectorizer = pickle.load(f)
-with open('model/model.pkl', 'rb') as f:
-    model = pickle.load(f)
+try:
+    scorer, manifest = load_latest_artifact('model')
+    print(f"Model version: {manifest['model_version']}")
+except FileNotFoundError:
+    if not (os.path.exists('model/vectorizer.pkl') and os.path.exists('model/model.pkl')):
+        print("No model found in model/. Run train.py to train one and export an artifact.")
+        sys.exit(1)
+    with open('model/vectorizer.pkl', 'rb') as f:
+        vectorizer = pickle.load(f)
+    with open('model/model.pkl', 'rb') as f:
+        model = pickle.load(f)
+    scorer = SklearnScorer(vectorizer, model)
+    print("No exported artifact (model/LATEST), using the pickled model. Run train.py to export one.")
 
 # Test cases
 test_cases = [
@@ -29,9 +39,8 @@ print("="*60 + "\n")
 
 for text in test_cases:
     cleaned = clean_text(text)
-    text_tfidf = vectorizer.transform([cleaned])
-    prediction = model.predict(text_tfidf)[0]
-    probabilities = model.predict_proba(text_tfidf)[0]
+    probabilities = scorer.predict_proba_one(cleaned)
+    prediction = scorer.classes[probabilities.argmax()]
     confidence = max(probabilities)
     
     print(f"Text: {text}")
@@ -1,160 +1,302 @@
 import pandas as pd
-import re
 from sklearn.model_selection import train_test_split
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix, precision_score, recall_score, f1_score
+import argparse
+import hashlib
 import pickle
 import os
 import json
 import numpy as np
+from api.artifacts import export_artifact, prune_versions
+from api.neardup import near_duplicate_mask
+from api.text import CLEANING_VERSION, clean_series
 
-# Load data from multiple sources
-print("Loading data...")
-df1 = pd.read_csv('data/training_data.csv')
-df2 = pd.read_csv('data/train1.csv')
-df3 = pd.read_csv('data/cleaned_output1.csv')
-
-# Combine all datasets
-print(f"  - training_data.csv: {len(df1)} rows")
-print(f"  - train1.csv: {len(df2)} rows")
-print(f"  - cleaned_output1.csv: {len(df3)} rows")
-df = pd.concat([df1, df2, df3], ignore_index=True)
-
-# Remove duplicates if any
-initial_len = len(df)
-df = df.drop_duplicates(subset=['text'], keep='first')
-if len(df) < initial_len:
-    print(f"  - Removed {initial_len - len(df)} duplicate rows")
-
-print(f"  - Total combined dataset: {len(df)} rows")
-
-# Clean text (simple: lowercase, remove punctuation)
-def clean_text(text):
-    text = str(text).lower()
-    text = re.sub(r'[^a-zA-Z0-9\s]', '', text)
-    return text
-
-print("Cleaning text...")
-df['text'] = df['text'].apply(clean_text)
-
-# Split data
-print("Splitting data...")
-X_train, X_test, y_train, y_test = train_test_split(
-    df['text'], df['sentiment'], 
-    test_size=0.2, random_state=42,
-    stratify=df['sentiment']
-)
-
-# TF-IDF Vectorization
-print("Creating TF-IDF features...")
-vectorizer = TfidfVectorizer(max_features=5000, ngram_range=(1, 2))
-X_train_tfidf = vectorizer.fit_transform(X_train)
-X_test_tfidf = vectorizer.transform(X_test)
-
-# Train Naive Bayes
-print("Training Naive Bayes model...")
-model = MultinomialNB()
-model.fit(X_train_tfidf, y_train)
-
-# Evaluate
-print("\nEvaluating model...")
-y_pred = model.predict(X_test_tfidf)
-accuracy = accuracy_score(y_test, y_pred)
-
-# Calculate additional metrics
-precision = precision_score(y_test, y_pred, average='weighted', zero_division=0)
-recall = recall_score(y_test, y_pred, average='weighted', zero_division=0)
-f1 = f1_score(y_test, y_pred, average='weighted', zero_division=0)
-
-# Per-class metrics
-precision_per_class = precision_score(y_test, y_pred, average=None, zero_division=0)
-recall_per_class = recall_score(y_test, y_pred, average=None, zero_division=0)
-f1_per_class = f1_score(y_test, y_pred, average=None, zero_division=0)
-
-# Confusion matrix
-cm = confusion_matrix(y_test, y_pred)
-
-# Print detailed metrics
-print(f"\n{'='*60}")
-print("PERFORMANCE METRICS")
-print(f"{'='*60}")
-print(f"\nOverall Metrics:")
-print(f"  Accuracy:  {accuracy:.4f} ({accuracy*100:.2f}%)")
-print(f"  Precision: {precision:.4f} ({precision*100:.2f}%)")
-print(f"  Recall:    {recall:.4f} ({recall*100:.2f}%)")
-print(f"  F1-Score:  {f1:.4f} ({f1*100:.2f}%)")
-
-print(f"\nPer-Class Metrics:")
-for i, label in enumerate(model.classes_):
-    print(f"\n  {label}:")
-    print(f"    Precision: {precision_per_class[i]:.4f} ({precision_per_class[i]*100:.2f}%)")
-    print(f"    Recall:    {recall_per_class[i]:.4f} ({recall_per_class[i]*100:.2f}%)")
-    print(f"    F1-Score:  {f1_per_class[i]:.4f} ({f1_per_class[i]*100:.2f}%)")
-
-# Confusion Matrix with labels
-print(f"\n{'='*60}")
-print("Confusion Matrix:")
-print(f"{'='*60}")
-print(f"{'':>12}", end='')
-for label in model.classes_:
-    print(f"{label:>12}", end='')
-print()
-for i, label in enumerate(model.classes_):
-    print(f"{label:>12}", end='')
-    for j in range(len(model.classes_)):
-        print(f"{cm[i][j]:>12}", end='')
+DEFAULT_DATA_FILES = ['data/training_data.csv', 'data/train1.csv', 'data/cleaned_output1.csv']
+
+# Cleaned, deduplicated corpora, keyed by the contents of the input files
+CORPUS_CACHE_DIR = os.path.join('data', 'cache', 'corpus')
+
+# Rows whose cleaned text is at least this similar to an earlier row are dropped, so
+# syndicated copies of a story cannot end up on both sides of the train/test split
+NEAR_DUPLICATE_SIMILARITY = 0.85
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def corpus_cache_path(paths, near_duplicate_similarity=None):
+    """Cache file for the cleaned corpus built from paths, in order"""
+    key = json.dumps([CLEANING_VERSION, [file_sha256(path) for path in paths], near_duplicate_similarity])
+    return os.path.join(CORPUS_CACHE_DIR, hashlib.sha256(key.encode('utf-8')).hexdigest()[:24] + '.parquet')
+
+def load_data(paths, use_cache=True, near_duplicate_similarity=NEAR_DUPLICATE_SIMILARITY):
+    """Load, combine, deduplicate and clean the labeled datasets
+
+    With near_duplicate_similarity set, rows that are near duplicates of an
+    earlier row (see api/neardup.py) are dropped as well.
+    """
+    cache_path = corpus_cache_path(paths, near_duplicate_similarity) if use_cache else None
+    if cache_path is not None and os.path.exists(cache_path):
+        df = pd.read_parquet(cache_path)
+        print(f"Loaded cleaned corpus from cache: {len(df)} rows ({cache_path})")
+        return df
+
+    # Load data from multiple sources
+    print("Loading data...")
+    frames = []
+    for path in paths:
+        frame = pd.read_csv(path)
+        print(f"  - {os.path.basename(path)}: {len(frame)} rows")
+        frames.append(frame)
+
+    # Combine all datasets
+    df = pd.concat(frames, ignore_index=True)
+
+    # Remove duplicates if any
+    initial_len = len(df)
+    df = df.drop_duplicates(subset=['text'], keep='first')
+    if len(df) < initial_len:
+        print(f"  - Removed {initial_len - len(df)} duplicate rows")
+
+    print(f"  - Total combined dataset: {len(df)} rows")
+
+    print("Cleaning text...")
+    df['text'] = clean_series(df['text'])
+
+    if near_duplicate_similarity is not None:
+        keep = near_duplicate_mask(df['text'].tolist(), min_similarity=near_duplicate_similarity)
+        if not keep.all():
+            print(f"  - Removed {int((~keep).sum())} near-duplicate rows")
+            df = df[keep]
+
+    if cache_path is not None:
+        try:
+            os.makedirs(CORPUS_CACHE_DIR, exist_ok=True)
+            df.to_parquet(cache_path, index=False)
+        except ImportError:
+            print("  - pyarrow is not installed, not caching the cleaned corpus")
+    return df
+
+# The configuration train() uses unless one is picked from the search results
+DEFAULT_CONFIG = {
+    'vectorizer': {'max_features': 5000, 'ngram_range': (1, 2)},
+    'classifier': 'MultinomialNB',
+    'classifier_params': {}
+}
+
+def load_config(path, candidate=None):
+    """A model configuration from the search results at path (see model_search.py)
+
+    By default the recommended candidate, or the most accurate servable one if
+    none was recommended; candidate picks another by its position in the
+    results. Raises ValueError for candidates the API cannot serve.
+    """
+    with open(path) as f:
+        results = json.load(f)
+    if candidate is not None:
+        config = results['candidates'][candidate]
+    else:
+        servable = [c for c in results['candidates'] if c.get('servable', True)]
+        config = results.get('recommended') or (servable[0] if servable else None)
+        if config is None:
+            raise ValueError(f"{path} has no candidate the API can serve")
+    if not config.get('servable', True) or config['classifier'] != 'MultinomialNB':
+        raise ValueError(f"{config['classifier']} is not servable: the API's artifact only holds MultinomialNB")
+    vectorizer = {k: tuple(v) if k == 'ngram_range' else v for k, v in config['vectorizer'].items()}
+    return {'vectorizer': vectorizer, 'classifier': config['classifier'],
+            'classifier_params': config['classifier_params']}
+
+def train(df, model_dir='model', config=DEFAULT_CONFIG, keep=None):
+    """Train, evaluate and save the TF-IDF + Naive Bayes model"""
+    # Split data
+    print("Splitting data...")
+    X_train, X_test, y_train, y_test = train_test_split(
+        df['text'], df['sentiment'],
+        test_size=0.2, random_state=42,
+        stratify=df['sentiment']
+    )
+
+    # TF-IDF Vectorization
+    print("Creating TF-IDF features...")
+    vectorizer = TfidfVectorizer(**config['vectorizer'])
+    X_train_tfidf = vectorizer.fit_transform(X_train)
+    X_test_tfidf = vectorizer.transform(X_test)
+
+    # Train Naive Bayes
+    print("Training Naive Bayes model...")
+    model = MultinomialNB(**config['classifier_params'])
+    model.fit(X_train_tfidf, y_train)
+
+    # Evaluate
+    print("\nEvaluating model...")
+    y_pred = model.predict(X_test_tfidf)
+    accuracy = accuracy_score(y_test, y_pred)
+
+    # Calculate additional metrics
+    precision = precision_score(y_test, y_pred, average='weighted', zero_division=0)
+    recall = recall_score(y_test, y_pred, average='weighted', zero_division=0)
+    f1 = f1_score(y_test, y_pred, average='weighted', zero_division=0)
+
+    # Per-class metrics
+    precision_per_class = precision_score(y_test, y_pred, average=None, zero_division=0)
+    recall_per_class = recall_score(y_test, y_pred, average=None, zero_division=0)
+    f1_per_class = f1_score(y_test, y_pred, average=None, zero_division=0)
+
+    # Confusion matrix
+    cm = confusion_matrix(y_test, y_pred)
+
+    # Print detailed metrics
+    print(f"\n{'='*60}")
+    print("PERFORMANCE METRICS")
+    print(f"{'='*60}")
+    print(f"\nOverall Metrics:")
+    print(f"  Accuracy:  {accuracy:.4f} ({accuracy*100:.2f}%)")
+    print(f"  Precision: {precision:.4f} ({precision*100:.2f}%)")
+    print(f"  Recall:    {recall:.4f} ({recall*100:.2f}%)")
+    print(f"  F1-Score:  {f1:.4f} ({f1*100:.2f}%)")
+
+    print(f"\nPer-Class Metrics:")
+    for i, label in enumerate(model.classes_):
+        print(f"\n  {label}:")
+        print(f"    Precision: {precision_per_class[i]:.4f} ({precision_per_class[i]*100:.2f}%)")
+        print(f"    Recall:    {recall_per_class[i]:.4f} ({recall_per_class[i]*100:.2f}%)")
+        print(f"    F1-Score:  {f1_per_class[i]:.4f} ({f1_per_class[i]*100:.2f}%)")
+
+    # Confusion Matrix with labels
+    print(f"\n{'='*60}")
+    print("Confusion Matrix:")
+    print(f"{'='*60}")
+    print(f"{'':>12}", end='')
+    for label in model.classes_:
+        print(f"{label:>12}", end='')
     print()
+    for i, label in enumerate(model.classes_):
+        print(f"{label:>12}", end='')
+        for j in range(len(model.classes_)):
+            print(f"{cm[i][j]:>12}", end='')
+        print()
 
-print(f"\n{'='*60}")
-print("Classification Report:")
-print(f"{'='*60}")
-print(classification_report(y_test, y_pred))
-
-# Save model and vectorizer
-print("\nSaving model...")
-os.makedirs('model', exist_ok=True)
-with open('model/vectorizer.pkl', 'wb') as f:
-    pickle.dump(vectorizer, f)
-with open('model/model.pkl', 'wb') as f:
-    pickle.dump(model, f)
-
-# Save metrics to JSON file
-metrics = {
-    "overall": {
-        "accuracy": float(accuracy),
-        "precision": float(precision),
-        "recall": float(recall),
-        "f1_score": float(f1)
-    },
-    "per_class": {
-        label: {
-            "precision": float(prec),
-            "recall": float(rec),
-            "f1_score": float(f1_val)
-        }
-        for label, prec, rec, f1_val in zip(model.classes_, precision_per_class, recall_per_class, f1_per_class)
-    },
-    "confusion_matrix": {
-        "labels": model.classes_.tolist(),
-        "matrix": cm.tolist()
-    },
-    "dataset_info": {
-        "total_samples": int(len(df)),
-        "train_samples": int(len(X_train)),
-        "test_samples": int(len(X_test)),
-        "classes": model.classes_.tolist(),
-        "class_distribution": {
-            label: int(count) for label, count in zip(*np.unique(y_train, return_counts=True))
+    print(f"\n{'='*60}")
+    print("Classification Report:")
+    print(f"{'='*60}")
+    print(classification_report(y_test, y_pred))
+
+    # Save model and vectorizer
+    print("\nSaving model...")
+    os.makedirs(model_dir, exist_ok=True)
+    with open(os.path.join(model_dir, 'vectorizer.pkl'), 'wb') as f:
+        pickle.dump(vectorizer, f)
+    with open(os.path.join(model_dir, 'model.pkl'), 'wb') as f:
+        pickle.dump(model, f)
+
+    # Save metrics to JSON file
+    metrics = {
+        "overall": {
+            "accuracy": float(accuracy),
+            "precision": float(precision),
+            "recall": float(recall),
+            "f1_score": float(f1)
+        },
+        "per_class": {
+            label: {
+                "precision": float(prec),
+                "recall": float(rec),
+                "f1_score": float(f1_val)
+            }
+            for label, prec, rec, f1_val in zip(model.classes_, precision_per_class, recall_per_class, f1_per_class)
+        },
+        "confusion_matrix": {
+            "labels": model.classes_.tolist(),
+            "matrix": cm.tolist()
+        },
+        "config": {
+            "vectorizer": {k: list(v) if isinstance(v, tuple) else v for k, v in config['vectorizer'].items()},
+            "classifier": config['classifier'],
+            "classifier_params": config['classifier_params']
+        },
+        "dataset_info": {
+            "total_samples": int(len(df)),
+            "train_samples": int(len(X_train)),
+            "test_samples": int(len(X_test)),
+            "classes": model.classes_.tolist(),
+            "class_distribution": {
+                label: int(count) for label, count in zip(*np.unique(y_train, return_counts=True))
+            }
         }
     }
-}
 
-with open('model/metrics.json', 'w') as f:
-    json.dump(metrics, f, indent=2)
+    with open(os.path.join(model_dir, 'metrics.json'), 'w') as f:
+        json.dump(metrics, f, indent=2)
+
+    # Export the versioned, pickle-free artifact that the API serves
+    version_dir = export_artifact(vectorizer, model, model_dir, metrics=metrics)
+
+    print(f"\n✅ Done! Model and metrics saved to {model_dir}/ folder")
+    print(f"   - {model_dir}/vectorizer.pkl")
+    print(f"   - {model_dir}/model.pkl")
+    print(f"   - {model_dir}/metrics.json")
+    print(f"   - {version_dir}/ (memory-mapped artifact, now in {model_dir}/LATEST)")
+    if keep is not None:
+        removed = prune_versions(model_dir, keep)
+        print(f"   - Removed {len(removed)} old version(s), keeping the {keep} newest")
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the stock news sentiment model")
+    parser.add_argument('--data', nargs='+', default=DEFAULT_DATA_FILES,
+                        help="Labeled CSV files with text and sentiment columns")
+    parser.add_argument('--model-dir', default='model', help="Where to save the trained model")
+    parser.add_argument('--search', action='store_true',
+                        help="Cross-validate candidate models instead of training the default one")
+    parser.add_argument('--folds', type=int, default=5, help="Cross-validation folds for --search")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Worker processes for --search")
+    parser.add_argument('--config', metavar='SEARCH_RESULTS',
+                        help="Train the recommended (or most accurate) candidate of a --search results file")
+    parser.add_argument('--candidate', type=int, default=None,
+                        help="With --config, train the candidate at this position in the results instead")
+    parser.add_argument('--latency-budget-us', type=float, default=None,
+                        help="With --search, recommend the most accurate model under this p50 latency")
+    parser.add_argument('--online', nargs='+', metavar='BATCH',
+                        help="Fold new labeled CSV/NDJSON batches into the online model instead of retraining")
+    parser.add_argument('--init', action='store_true',
+                        help="With --online, start a new online model even if the model directory already has one to serve")
+    parser.add_argument('--keep', type=int, default=None, metavar='N',
+                        help="After exporting, delete all but the N newest model versions (LATEST is always kept)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Re-read and re-clean the data instead of using the cached corpus")
+    parser.add_argument('--keep-near-duplicates', action='store_true',
+                        help="Only drop rows with exactly the same text, not near duplicates")
+    args = parser.parse_args()
+
+    if args.online:
+        from online_training import run_online
+        run_online(args.online, args.model_dir, init=args.init, keep=args.keep)
+        return
+
+    df = load_data(
+        args.data, use_cache=not args.no_cache,
+        near_duplicate_similarity=None if args.keep_near_duplicates else NEAR_DUPLICATE_SIMILARITY
+    )
 
-print("\n✅ Done! Model and metrics saved to model/ folder")
-print(f"   - model/vectorizer.pkl")
-print(f"   - model/model.pkl")
-print(f"   - model/metrics.json")
+    if args.search:
+        from model_search import run_search
+        run_search(
+            df, args.data, folds=args.folds, workers=args.workers,
+            output_path=os.path.join(args.model_dir, 'search_results.json'),
+            latency_budget_us=args.latency_budget_us
+        )
+    else:
+        try:
+            config = load_config(args.config, args.candidate) if args.config else DEFAULT_CONFIG
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Model: TF-IDF({config['vectorizer']}) + {config['classifier']}({config['classifier_params']})")
+        train(df, args.model_dir, config, keep=args.keep)
 
+if __name__ == '__main__':
+    main()